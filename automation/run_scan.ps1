@@ -14,8 +14,14 @@ if (Test-Path "requirements.txt") {
     pip install -r requirements.txt
 }
 
-# Run the scan
-python src/main.py
+# Run the scan, continuing the last run if it was cut off (e.g. by the task's ExecutionTimeLimit)
+$checkpoint = Get-ChildItem "reports\checkpoints" -Directory -ErrorAction SilentlyContinue | Sort-Object Name | Select-Object -Last 1
+if ($checkpoint) {
+    Write-Host "Resuming interrupted run $($checkpoint.Name)" -ForegroundColor Yellow
+    python src/main.py --resume $checkpoint.Name
+} else {
+    python src/main.py
+}
 
 # Check for reports
  = Get-ChildItem "reports\*.json" | Sort-Object LastWriteTime | Select-Object -Last 1
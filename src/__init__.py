@@ -8,6 +8,7 @@ __description__ = "SOC-grade defensive network exposure assessment platform"
 
 from .banner import display_banner
 from .scanner import DefenderSafeScanner, scan_host
+from .async_scanner import AsyncScanner
 from .risk_engine import SOCRiskEngine, assess_risk
 from .reporter import SOCReporter, write_reports
 
@@ -15,6 +16,7 @@ __all__ = [
     'display_banner',
     'DefenderSafeScanner',
     'scan_host',
+    'AsyncScanner',
     'SOCRiskEngine',
     'assess_risk',
     'SOCReporter',
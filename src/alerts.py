@@ -0,0 +1,349 @@
+﻿"""
+Early alerts.
+Pushes HIGH and CRITICAL exposures to webhook, syslog, file or SIEM sinks while the sweep is still running.
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import socket
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import requests
+
+try:
+    from .risk_engine import MITRE_ATTACK_MAP, SOCRiskEngine
+    from .siem_forwarder import SIEMForwarder, create_forwarder, siem_event
+except ImportError:
+    from risk_engine import MITRE_ATTACK_MAP, SOCRiskEngine
+    from siem_forwarder import SIEMForwarder, create_forwarder, siem_event
+
+logger = logging.getLogger(__name__)
+
+RISK_RANK = {'LOW': 1, 'MEDIUM': 2, 'HIGH': 3, 'CRITICAL': 4}
+
+_STOP = object()
+
+
+# ======================================================
+# Sinks
+# ======================================================
+
+class AlertSink:
+    """Destination for batches of alerts. send() raises when a batch could not be delivered.
+
+    An alert is the finding's assessment plus an `alert_reason`; sinks
+    that serialise it use siem_event(), so alerts and forwarded findings
+    share one schema.
+    """
+
+    name = "sink"
+
+    def send(self, alerts: List[Dict]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class WebhookSink(AlertSink):
+    """POSTs each batch as JSON ({"source": ..., "alerts": [...]}) to a webhook URL."""
+
+    name = "webhook"
+
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 5.0,
+                 retries: int = 2, session: Optional[requests.Session] = None):
+        self.url = url
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.timeout = timeout
+        self.retries = retries
+        self.session = session or requests.Session()
+
+    def send(self, alerts: List[Dict]) -> None:
+        body = json.dumps({"source": "SentinelSweep-SOC", "alerts": [siem_event(a) for a in alerts]},
+                          default=str, separators=(",", ":"))
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(self.url, data=body, headers=self.headers, timeout=self.timeout)
+                if response.status_code < 300:
+                    return
+                error = f"HTTP {response.status_code}"
+                if response.status_code < 500 and response.status_code != 429:
+                    break  # The receiver will not accept this batch however often it is sent
+            except requests.RequestException as e:
+                error = str(e)
+            if attempt < self.retries:
+                time.sleep(0.5 * 2 ** attempt)
+        raise RuntimeError(f"webhook {self.url}: {error}")
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class SyslogSink(AlertSink):
+    """One syslog message per alert: a short summary followed by the JSON event.
+
+    `address` is "host:port" (UDP) or the path of a local socket such as /dev/log.
+    """
+
+    name = "syslog"
+
+    def __init__(self, address: str = "localhost:514", facility: str = "local0"):
+        if ":" in address and not address.startswith("/"):
+            host, port = address.rsplit(":", 1)
+            target = (host, int(port))
+        else:
+            target = address
+        self.handler = logging.handlers.SysLogHandler(
+            address=target, facility=logging.handlers.SysLogHandler.facility_names[facility],
+            socktype=socket.SOCK_DGRAM)
+        self.handler.ident = "sentinelsweep: "
+
+    def send(self, alerts: List[Dict]) -> None:
+        for alert in alerts:
+            event = siem_event(alert)
+            level = logging.CRITICAL if event["risk_level"] == 'CRITICAL' else logging.ERROR
+            summary = (f"{event['risk_level']} {event['ip']} ports={','.join(map(str, event['open_ports']))} "
+                       f"{event.get('alert_reason', '')}")
+            record = logging.makeLogRecord({
+                "name": "sentinelsweep", "levelno": level, "levelname": logging.getLevelName(level),
+                "msg": f"{summary} {json.dumps(event, default=str, separators=(',', ':'))}",
+            })
+            self.handler.emit(record)
+
+    def close(self) -> None:
+        self.handler.close()
+
+
+class FileSink(AlertSink):
+    """Appends alerts as NDJSON events, flushed after every batch (for tail -f or a log shipper)."""
+
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def send(self, alerts: List[Dict]) -> None:
+        for alert in alerts:
+            self._file.write(json.dumps(siem_event(alert), default=str, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class SIEMSink(AlertSink):
+    """Hands alerts to a SIEMForwarder, which batches, retries and spools them like findings."""
+
+    name = "siem"
+
+    def __init__(self, forwarder: SIEMForwarder):
+        self.forwarder = forwarder
+
+    def send(self, alerts: List[Dict]) -> None:
+        for alert in alerts:
+            self.forwarder.write(alert)
+
+    def close(self) -> None:
+        self.forwarder.close()
+
+
+# ======================================================
+# Alert channel
+# ======================================================
+
+class AlertChannel:
+    """Turns findings into alerts as they are produced and delivers them from a background thread.
+
+    observe() is called with every finding. Findings at or above
+    `min_risk` raise an alert at once. Because the sweep assesses each
+    (host, port) on its own, the channel also correlates the open ports
+    of each host: when their combined assessment ranks above every single
+    finding on the host, such as RDP plus SMB ("Both RDP and SMB exposed"),
+    a correlated CRITICAL alert is raised. Ports whose finding triage
+    lowered to LOW are left out of the correlation.
+
+    Alerts are de-duplicated on (host, ports, risk) for `dedup_ttl`
+    seconds, so a re-dispatched unit or a retried push does not page
+    twice. They are sent to every sink in batches of up to `batch_size`,
+    at most `flush_interval` seconds after the first alert of the batch.
+    A sink that fails loses only its copy of that batch.
+    """
+
+    def __init__(self, sinks: List[AlertSink], min_risk: str = 'HIGH', batch_size: int = 20,
+                 flush_interval: float = 1.0, dedup_ttl: float = 3600.0, max_keys: int = 100000,
+                 queue_size: int = 10000, risk_engine: Optional[SOCRiskEngine] = None):
+        if min_risk not in RISK_RANK:
+            raise ValueError(f"Unknown risk level: {min_risk!r}")
+        self.sinks = sinks
+        self.min_rank = RISK_RANK[min_risk]
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dedup_ttl = dedup_ttl
+        self.max_keys = max_keys
+        self.risk_engine = risk_engine or SOCRiskEngine()
+        self.stats = {'findings_seen': 0, 'alerts': 0, 'correlated': 0, 'duplicates': 0, 'dropped': 0,
+                      'batches_sent': 0, 'send_failures': 0}
+        self._lock = threading.Lock()
+        self._seen: 'OrderedDict[Tuple, float]' = OrderedDict()  # Dedup key -> expiry
+        self._hosts: Dict[str, Tuple[Set[int], int]] = {}  # ip -> (correlated ports, highest single rank)
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="alerts", daemon=True)
+        self._thread.start()
+
+    # ======================================================
+    # Producer side (sweep callbacks)
+    # ======================================================
+
+    def observe(self, assessment: Dict) -> None:
+        """Raise the alerts a new finding calls for. Never blocks the sweep."""
+        with self._lock:
+            self.stats['findings_seen'] += 1
+            risk = assessment.get('true_risk')
+            rank = RISK_RANK.get(risk, 0)
+            if rank >= self.min_rank:
+                reason = assessment.get('adjustment_reason') or f"{risk} exposure"
+                self._raise(assessment, reason, (assessment['ip'], tuple(assessment['open_ports']), risk))
+            self._correlate(assessment, rank)
+
+    def _correlate(self, assessment: Dict, rank: int) -> None:
+        ports = {port for port in assessment.get('open_ports', []) if port in MITRE_ATTACK_MAP}
+        if not ports or rank < RISK_RANK['MEDIUM']:
+            return
+        ip = assessment['ip']
+        known, best = self._hosts.get(ip, (set(), 0))
+        if ports <= known:
+            return
+        known = known | ports
+        best = max(best, rank)
+        self._hosts[ip] = (known, best)
+        if len(known) < 2:
+            return
+        combined = self.risk_engine.assess_exposure(ip, sorted(known))
+        combined_rank = RISK_RANK.get(combined['true_risk'], 0)
+        if combined_rank <= best or combined_rank < self.min_rank:
+            return
+        escalations = [r for r in combined['recommendations'] if r.startswith(f"{combined['true_risk']}:")]
+        reason = escalations[0] if escalations else (
+            f"{combined['true_risk']}: ports {', '.join(map(str, sorted(known)))} exposed together")
+        if self._raise(combined, reason, (ip, 'correlated', combined['true_risk'])):
+            self.stats['correlated'] += 1
+
+    def _raise(self, assessment: Dict, reason: str, key: Tuple) -> bool:
+        now = time.monotonic()
+        while self._seen and next(iter(self._seen.values())) <= now:
+            self._seen.popitem(last=False)
+        if key in self._seen:
+            self.stats['duplicates'] += 1
+            return False
+        self._seen[key] = now + self.dedup_ttl
+        if len(self._seen) > self.max_keys:
+            self._seen.popitem(last=False)
+
+        try:
+            self._queue.put_nowait(dict(assessment, alert_reason=reason))
+        except queue.Full:
+            self.stats['dropped'] += 1
+            logger.warning(f"Alert queue full; dropped alert for {assessment['ip']}")
+            return False
+        self.stats['alerts'] += 1
+        return True
+
+    def close(self) -> Dict:
+        """Send what is queued, close the sinks and return the stats."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+            for sink in self.sinks:
+                try:
+                    sink.close()
+                except Exception as e:
+                    logger.warning(f"Closing alert sink {sink.name} failed: {e}")
+        return self.get_stats()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return self.stats.copy()
+
+    def __enter__(self) -> 'AlertChannel':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ======================================================
+    # Sender thread
+    # ======================================================
+
+    def _run(self) -> None:
+        batch: List[Dict] = []
+        deadline: Optional[float] = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None  # flush_interval elapsed
+            if item is _STOP:
+                break
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size and time.monotonic() < deadline:
+                    continue
+            self._send(batch)
+            batch, deadline = [], None
+        if batch:
+            self._send(batch)
+
+    def _send(self, batch: List[Dict]) -> None:
+        for sink in self.sinks:
+            try:
+                sink.send(batch)
+                with self._lock:
+                    self.stats['batches_sent'] += 1
+            except Exception as e:
+                with self._lock:
+                    self.stats['send_failures'] += 1
+                logger.error(f"Alert sink {sink.name} failed for {len(batch)} alerts: {e}")
+
+
+def create_alert_channel(sinks: str, min_risk: str = 'HIGH', webhook_url: Optional[str] = None,
+                         syslog_address: Optional[str] = None, alert_file: Optional[str] = None,
+                         siem_options: Optional[Dict] = None, **options) -> AlertChannel:
+    """Alert channel for an ALERT_SINKS list (webhook, syslog, file, siem) from config values.
+
+    The siem sink gets its own forwarder, built with create_forwarder(**siem_options) and a
+    one-second flush interval, so alerts do not wait behind the findings stream. It spools
+    under an `alerts` subdirectory of spool_dir, so it never replays the main forwarder's files.
+    """
+    built: List[AlertSink] = []
+    for name in (part.strip().lower() for part in sinks.split(",") if part.strip()):
+        if name == "webhook":
+            if not webhook_url:
+                raise ValueError("ALERT_WEBHOOK_URL is not set")
+            built.append(WebhookSink(webhook_url))
+        elif name == "syslog":
+            built.append(SyslogSink(syslog_address or "localhost:514"))
+        elif name == "file":
+            built.append(FileSink(alert_file or "reports/alerts.ndjson"))
+        elif name == "siem":
+            siem = dict(siem_options or {})
+            if siem.get('spool_dir'):
+                siem['spool_dir'] = str(Path(siem['spool_dir']) / "alerts")
+            built.append(SIEMSink(create_forwarder(flush_interval=1.0, **siem)))
+        else:
+            raise ValueError(f"Unknown alert sink: {name!r} (expected webhook, syslog, file or siem)")
+    if not built:
+        raise ValueError("ALERT_SINKS is empty")
+    return AlertChannel(built, min_risk=min_risk, **options)
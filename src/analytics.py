@@ -0,0 +1,56 @@
+﻿"""
+Optional analytics helpers.
+pandas is only needed here; reporting and scanning never import it.
+"""
+
+from typing import Dict, Iterable
+
+
+def _require_pandas():
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError("Analytics features need pandas: pip install 'pandas>=2.0.0'")
+    return pd
+
+
+def findings_dataframe(assessments: Iterable[Dict]):
+    """One row per assessment with the CSV report's columns, as a pandas DataFrame.
+
+    A FindingStore is converted from its columns without building dicts.
+    """
+    pd = _require_pandas()
+    try:
+        from .report_writers import CSV_COLUMNS, csv_row
+    except ImportError:
+        from report_writers import CSV_COLUMNS, csv_row
+
+    if hasattr(assessments, "as_numpy"):
+        store, columns = assessments, assessments.as_numpy()
+        offsets, rows = store.port_offsets, range(len(store))
+
+        def techniques(row):
+            codes = store.techniques[offsets[row]:offsets[row + 1]]
+            return ";".join([store.technique_ids[c] for c in codes if c][:5])
+
+        return pd.DataFrame({
+            "ip": [store.ip_of(row) for row in rows],
+            "ports": [";".join(map(str, store.ports_of(row))) for row in rows],
+            "initial_risk": [store.risk_labels[code] for code in columns["initial_risk"]],
+            "final_risk": [store.risk_labels[code] for code in columns["true_risk"]],
+            "risk_score": columns["risk_score"],
+            "risk_adjusted": columns["adjusted"].astype(bool),
+            "network_segment": [store.segments[code] for code in columns["segment"]],
+            "mitre_techniques": [techniques(row) for row in rows],
+        }, columns=CSV_COLUMNS)
+    return pd.DataFrame([csv_row(a) for a in assessments], columns=CSV_COLUMNS)
+
+
+def risk_trend(history, port=None, risk=None, cidr=None):
+    """ScanHistory.port_trend as a DataFrame indexed by run start time."""
+    pd = _require_pandas()
+    frame = pd.DataFrame(history.port_trend(port=port, risk=risk, cidr=cidr))
+    if frame.empty:
+        return frame
+    frame["started_at"] = pd.to_datetime(frame["started_at"])
+    return frame.set_index("started_at")
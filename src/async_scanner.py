@@ -0,0 +1,250 @@
+﻿"""
+Asyncio TCP connect scanner for large sweeps.
+Non-blocking sockets with one global concurrency limit instead of per-host thread pools.
+"""
+
+import asyncio
+import socket
+import logging
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .scanner import DefenderSafeScanner
+    from .rate_limiter import ProbePacer
+    from .rtt import RTTEstimator
+except ImportError:
+    from scanner import DefenderSafeScanner
+    from rate_limiter import ProbePacer
+    from rtt import RTTEstimator
+
+logger = logging.getLogger(__name__)
+
+# Errors that simply mean "not open" and are not worth a warning
+_CLOSED_ERRORS = (ConnectionRefusedError, ConnectionResetError, TimeoutError)
+
+
+def raise_fd_limit(wanted: int) -> int:
+    """Raise the soft open-file limit towards `wanted` (POSIX only). Returns the new soft limit."""
+    try:
+        import resource
+    except ImportError:
+        return wanted
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY or soft >= wanted:
+        return wanted
+    target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        return target
+    except (ValueError, OSError):
+        return soft
+
+
+class AsyncScanner(DefenderSafeScanner):
+    """Defender-safe TCP connect scanner driven by asyncio.
+
+    All probes, across every host, share a single semaphore so the number of
+    in-flight connects is bounded globally rather than per host.
+    """
+
+    def __init__(self, timeout: float = 1.5, max_concurrency: int = 10000,
+                 pacer: Optional[ProbePacer] = None, rtt: Optional[RTTEstimator] = None):
+        super().__init__(timeout=timeout, max_workers=max_concurrency, pacer=pacer, rtt=rtt)
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Return the global semaphore, recreating it if the event loop changed."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            # Leave headroom for stdio, log files and report writers
+            limit = raise_fd_limit(self.max_concurrency + 256) - 256
+            if limit < self.max_concurrency:
+                logger.warning(f"Open-file limit caps concurrency at {max(limit, 1)} "
+                               f"(requested {self.max_concurrency})")
+            self._semaphore = asyncio.Semaphore(max(1, min(limit, self.max_concurrency)))
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _dial(self, ip: str, port: int,
+                    pacer: Optional[ProbePacer] = None) -> Tuple[Optional[socket.socket], bool]:
+        """Non-blocking TCP connect, paced by the shared token buckets.
+
+        Returns (connected socket or None, whether the host answered at all:
+        a SYN-ACK or an RST). With an RTTEstimator the deadline comes from the
+        subnet's measured RTTs and a timed-out connect is retransmitted.
+        `pacer` replaces the scanner's own ProbePacer for this probe.
+        """
+        pacer = pacer or self.pacer
+        loop = asyncio.get_running_loop()
+        family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+        deadline = self.rtt.deadline(ip) if self.rtt else self.timeout
+        attempt = 0
+        while True:
+            await pacer.acquire_async(ip)
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), deadline)
+                if self.rtt:
+                    self.rtt.observe(ip, time.monotonic() - started, attempt)
+                return sock, True
+            except asyncio.TimeoutError:
+                sock.close()
+                if self.rtt is None:
+                    return None, False
+                attempt += 1
+                deadline = self.rtt.on_timeout(ip, attempt, deadline)
+                if deadline is None:
+                    return None, False
+                continue
+            except ConnectionRefusedError:
+                if self.rtt:
+                    self.rtt.observe(ip, time.monotonic() - started, attempt)
+                sock.close()
+                return None, True
+            except _CLOSED_ERRORS:
+                pass
+            except OSError as e:
+                logger.warning(f"Socket error on {ip}:{port} - {e}")
+            except BaseException:
+                sock.close()
+                raise
+            sock.close()
+            return None, False
+
+    async def _open(self, ip: str, port: int, pacer: Optional[ProbePacer] = None) -> Optional[socket.socket]:
+        """Connected socket if the port is open, otherwise None."""
+        sock, _ = await self._dial(ip, port, pacer)
+        return sock
+
+    async def _connect(self, ip: str, port: int, pacer: Optional[ProbePacer] = None) -> bool:
+        sock = await self._open(ip, port, pacer)
+        if sock is None:
+            return False
+        sock.close()
+        return True
+
+    def _record(self, ip: str, port: int, is_open: bool) -> None:
+        self.scan_stats['ports_checked'] += 1
+        if is_open:
+            self.scan_stats['open_ports_found'] += 1
+            logger.debug(f"Port {port} open on {ip}")
+
+    async def probe(self, ip: str, port: int, pacer: Optional[ProbePacer] = None) -> Tuple[int, bool]:
+        """Probe one port, holding a slot of the global semaphore."""
+        async with self._get_semaphore():
+            is_open = await self._connect(ip, port, pacer)
+        self._record(ip, port, is_open)
+        return port, is_open
+
+    async def ping(self, ip: str, port: int) -> Optional[bool]:
+        """TCP ping: True if the port is open, False if the host refused it (alive), None if nothing answered."""
+        async with self._get_semaphore():
+            sock, answered = await self._dial(ip, port)
+        if sock is not None:
+            sock.close()
+            return True
+        return False if answered else None
+
+    async def probe_connection(self, ip: str, port: int) -> Optional[socket.socket]:
+        """Probe one port and keep the connection if it is open.
+
+        The caller owns the returned non-blocking socket, typically passing it
+        to TriageEngine.grab_banner_async so triage does not reconnect.
+        """
+        async with self._get_semaphore():
+            sock = await self._open(ip, port)
+        self._record(ip, port, sock is not None)
+        return sock
+
+    async def scan_host_async(self, ip: str, ports: List[int], delay: Optional[float] = None) -> List[int]:
+        """Scan a single host; probes run concurrently under the global limit.
+
+        An explicit `delay` (legacy seconds between probes) overrides the
+        scanner's ProbePacer with an equivalent per-host rate, as in DefenderSafeScanner.
+        """
+        pacer = ProbePacer.from_delay(delay) if delay is not None else None
+        results = await asyncio.gather(*(self.probe(ip, port, pacer) for port in ports))
+        self.scan_stats['hosts_scanned'] += 1
+        return sorted(port for port, is_open in results if is_open)
+
+    async def scan_hosts(self, hosts: Iterable[str], ports: List[int]) -> AsyncIterator[Tuple[str, List[int]]]:
+        """Scan many hosts at once, yielding (ip, open_ports) as each host completes.
+
+        `hosts` is consumed lazily: a slot is acquired before each probe task is
+        created, so at most `max_concurrency` probes (and their bookkeeping)
+        exist at any time regardless of the size of the range.
+        """
+        sem = self._get_semaphore()
+        done: asyncio.Queue = asyncio.Queue(maxsize=1024)
+        in_flight: Dict[str, list] = {}
+        tasks = set()
+
+        async def run_probe(ip: str, port: int) -> None:
+            try:
+                is_open = await self._connect(ip, port)
+            finally:
+                sem.release()
+            self._record(ip, port, is_open)
+            state = in_flight[ip]
+            if is_open:
+                state[1].append(port)
+            state[0] -= 1
+            if state[0] == 0:
+                del in_flight[ip]
+                self.scan_stats['hosts_scanned'] += 1
+                await done.put((ip, sorted(state[1])))
+
+        async def produce() -> None:
+            try:
+                for ip in hosts:
+                    if not ports:
+                        self.scan_stats['hosts_scanned'] += 1
+                        await done.put((ip, []))
+                        continue
+                    in_flight[ip] = [len(ports), []]
+                    for port in ports:
+                        await sem.acquire()
+                        task = asyncio.create_task(run_probe(ip, port))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                if tasks:
+                    await asyncio.gather(*list(tasks))
+            finally:
+                try:
+                    done.put_nowait(None)
+                except asyncio.QueueFull:
+                    await done.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await done.get()
+                if item is None:
+                    break
+                yield item
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+                for task in list(tasks):
+                    task.cancel()
+
+    def scan_host(self, ip: str, ports: List[int], delay: Optional[float] = None) -> List[int]:
+        """Blocking wrapper around scan_host_async for drop-in use; `delay` paces as in DefenderSafeScanner."""
+        return asyncio.run(self.scan_host_async(ip, ports, delay))
+
+    def scan_network(self, hosts: Iterable[str], ports: List[int]) -> Dict[str, List[int]]:
+        """Blocking sweep of many hosts. Returns only hosts with at least one open port."""
+        async def collect() -> Dict[str, List[int]]:
+            found = {}
+            async for ip, open_ports in self.scan_hosts(hosts, ports):
+                if open_ports:
+                    found[ip] = open_ports
+            return found
+
+        return asyncio.run(collect())
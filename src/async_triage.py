@@ -0,0 +1,127 @@
+﻿"""
+Async triage engine.
+Runs per-protocol probe modules concurrently on one event loop, bounded by a single semaphore.
+"""
+
+import asyncio
+import logging
+import socket
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .triage_engine import TriageEngine
+    from .probes import ProbeConnection, ProbeError, ProtocolProbe, default_probes, probes_by_port
+except ImportError:
+    from triage_engine import TriageEngine
+    from probes import ProbeConnection, ProbeError, ProtocolProbe, default_probes, probes_by_port
+
+logger = logging.getLogger(__name__)
+
+# A misbehaving service surfaces as one of these; anything else is a bug in the probe
+_PROBE_ERRORS = (ProbeError, asyncio.TimeoutError, OSError, struct.error, ValueError, IndexError)
+
+
+class AsyncTriageEngine(TriageEngine):
+    """TriageEngine whose checks are protocol probes rather than one banner read.
+
+    Each open service is matched to a probe module by port (SSH, HTTP, TLS,
+    SMB, RDP, FTP, SMTP, MySQL, PostgreSQL, MongoDB). The probe's structured
+    facts land in the result's `details` and its verdict sets `final_risk`.
+    Ports without a probe fall back to the banner rules of TriageEngine.
+    """
+
+    def __init__(self, config: Optional[Dict] = None, probes: Optional[Iterable[ProtocolProbe]] = None,
+                 max_concurrency: int = 500, timeout: float = 1.5):
+        super().__init__(config)
+        self.probes = probes_by_port(default_probes() if probes is None else probes)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout  # Connect timeout when no socket is handed over
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+        self.stats.update({'protocol_probes': 0, 'probe_failures': 0})
+
+    def register(self, probe: ProtocolProbe) -> None:
+        """Add or replace the probe for each of `probe.ports`."""
+        for port in probe.ports:
+            self.probes[port] = probe
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _connect(self, ip: str, port: int) -> Optional[socket.socket]:
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET6 if ':' in ip else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), self.timeout)
+            return sock
+        except (asyncio.TimeoutError, OSError):
+            sock.close()
+            return None
+        except BaseException:
+            sock.close()
+            raise
+
+    # ======================================================
+    # Triage
+    # ======================================================
+
+    async def triage_service_async(self, ip: str, port: int, sock: Optional[socket.socket] = None) -> Dict:
+        """Triage one service; same result shape as TriageEngine.triage_service.
+
+        `sock` is a connected non-blocking socket handed over by the scanner
+        (it is always closed); without one the engine connects itself.
+        """
+        self.stats['services_triaged'] += 1
+        result = self._new_result(ip, port)
+        try:
+            async with self._get_semaphore():
+                if sock is None:
+                    sock = await self._connect(ip, port)
+                    if sock is None:
+                        result['checks_failed'].append('connect')
+                        return result
+                probe = self.probes.get(port)
+                if probe is None:
+                    self._apply_banner(result, await self.grab_banner_async(sock, port))
+                else:
+                    await self._run_probe(probe, ProbeConnection(sock, probe.deadline), result)
+        finally:
+            if sock is not None:
+                sock.close()
+        return result
+
+    async def _run_probe(self, probe: ProtocolProbe, conn: ProbeConnection, result: Dict) -> None:
+        ip, port = result['ip'], result['port']
+        try:
+            facts = await probe.run(conn, ip, port)
+        except _PROBE_ERRORS as e:
+            self.stats['probe_failures'] += 1
+            result['checks_failed'].append(f'{probe.name} probe')
+            result['details'] = {'probe': probe.name, 'error': str(e) or type(e).__name__}
+            logger.debug(f"{probe.name} probe failed on {ip}:{port} - {e}")
+            return
+
+        self.stats['protocol_probes'] += 1
+        result['service_guess'] = probe.name
+        result['details'] = facts
+        result['checks_passed'].append(f'{probe.name} probe')
+        result['verification'] = f'{probe.name} protocol probe'
+        result['reliability'] = 'HIGH'
+        if facts.get('banner'):
+            result['banner'] = facts['banner']
+            self.stats['banners_grabbed'] += 1
+
+        verdict = probe.assess(facts, result['network_context'])
+        if verdict:
+            result['final_risk'], result['adjustment_reason'] = verdict
+            self.stats['risks_adjusted'] += 1
+
+    async def triage_many(self, services: Iterable[Tuple]) -> List[Dict]:
+        """Triage (ip, port) or (ip, port, sock) tuples concurrently, preserving order."""
+        return await asyncio.gather(*(self.triage_service_async(*service) for service in services))
@@ -0,0 +1,230 @@
+﻿"""
+Scan checkpoints.
+Periodically persists the sweep's progress and findings so an interrupted run can resume where it stopped.
+"""
+
+import json
+import logging
+import os
+import random
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "state.json"
+FINDINGS_FILE = "findings.ndjson"
+
+
+class ScanCheckpoint:
+    """Progress of one run, saved every `interval` seconds.
+
+    Work is tracked per host index in the (seeded, so reproducible) target
+    order: `next_host` is the first host with unfinished ports, and the few
+    hosts above it that are partly or fully done keep their finished ports.
+    A sweep made of several port passes (scheduler.probe_passes) counts
+    positions through pass after pass, so pass n of host i is position
+    n * total_hosts + i.
+    A (host, port) counts as finished once it was found closed or its
+    finding was recorded. Findings are appended to findings.ndjson; each
+    save fsyncs it and records how many lines belong to the saved progress,
+    so a resumed run neither loses nor duplicates a finding.
+    """
+
+    def __init__(self, directory: str, run_id: str, network: str, ports: List[int],
+                 exclude: Optional[str] = None, shuffle: bool = True, seed: Optional[int] = None,
+                 interval: float = 30.0, shard: Optional[Tuple[int, int]] = None,
+                 passes: Optional[List[List[int]]] = None):
+        self.path = Path(directory) / run_id
+        self.run_id = run_id
+        self.network = network
+        self.ports = list(ports)
+        self.exclude = exclude
+        self.shuffle = shuffle
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.interval = interval
+        self.shard = tuple(shard) if shard else None  # (index, count) of a sharded run's worker
+        self.passes = [list(p) for p in passes] if passes else [self.ports]  # Port groups swept one after another
+        self.created_at = datetime.now(timezone.utc).isoformat()
+
+        self.next_host = 0
+        self.total_hosts: Optional[int] = None
+        self.findings = 0
+        self._done: Dict[int, Set[int]] = {}     # Finished ports of hosts at or above next_host
+        self._remaining: Dict[int, int] = {}     # Unfinished port count of hosts handed to the sweep
+        self._inflight: Dict[Tuple[str, int], int] = {}
+        self._findings_file = None
+        self._last_save = time.monotonic()
+        self.stats = {'saves': 0, 'restored_findings': 0, 'skipped_work': 0}
+
+    # ======================================================
+    # Creating and loading
+    # ======================================================
+
+    @classmethod
+    def create(cls, directory: str, run_id: str, network: str, ports: List[int], **options) -> 'ScanCheckpoint':
+        checkpoint = cls(directory, run_id, network, ports, **options)
+        checkpoint.path.mkdir(parents=True, exist_ok=True)
+        checkpoint._findings_file = open(checkpoint.path / FINDINGS_FILE, "w", encoding="utf-8")
+        checkpoint.save()
+        return checkpoint
+
+    @classmethod
+    def load(cls, directory: str, run_id: str, interval: float = 30.0) -> 'ScanCheckpoint':
+        """Checkpoint of an interrupted run. Raises FileNotFoundError when there is none."""
+        path = Path(directory) / run_id / STATE_FILE
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        checkpoint = cls(directory, run_id, state["network"], state["ports"], exclude=state.get("exclude"),
+                         shuffle=state["shuffle"], seed=state["seed"], interval=interval,
+                         shard=state.get("shard"), passes=state.get("passes"))
+        checkpoint.created_at = state["created_at"]
+        checkpoint.next_host = state["next_host"]
+        checkpoint.total_hosts = state.get("total_hosts")
+        checkpoint.findings = state["findings"]
+        checkpoint._done = {int(index): set(ports) for index, ports in state["done"].items()}
+        passes = f" x {len(checkpoint.passes)} passes" if len(checkpoint.passes) > 1 else ""
+        logger.info(f"Resuming {run_id} at host {checkpoint.next_host}/{checkpoint.total_hosts}{passes} "
+                    f"with {checkpoint.findings} findings")
+        return checkpoint
+
+    @property
+    def timestamp(self) -> str:
+        """The reporter timestamp of the run, so resumed reports keep the original names."""
+        return self.run_id[len("sentinel_"):] if self.run_id.startswith("sentinel_") else self.run_id
+
+    def targets(self, scanner) -> Sequence[str]:
+        """The run's hosts in the same order as when it started."""
+        hosts = scanner.validate_cidr(self.network, exclude=self.exclude)
+        if hosts and self.shard:
+            hosts = hosts.shard(*self.shard)
+        if hosts and self.shuffle:
+            hosts = hosts.permuted(self.seed)
+        self.total_hosts = len(hosts)
+        return hosts
+
+    def restore(self, store) -> int:
+        """Load the saved findings into `store` and drop any written after the last save."""
+        path = self.path / FINDINGS_FILE
+        kept = 0
+        with open(path, "r+", encoding="utf-8") as f:
+            while kept < self.findings:
+                line = f.readline()
+                if not line.endswith("\n"):
+                    break
+                store.add_assessment(json.loads(line))
+                kept += 1
+            f.truncate(f.tell())
+        if kept < self.findings:
+            logger.warning(f"Checkpoint {self.run_id}: only {kept} of {self.findings} findings could be restored")
+            self.findings = kept
+        self._findings_file = open(path, "a", encoding="utf-8")
+        self.stats['restored_findings'] = kept
+        return kept
+
+    # ======================================================
+    # Progress (called by the pipeline, on the event loop)
+    # ======================================================
+
+    def work(self, hosts: Sequence[str], ports: List[int], stage: int = 0) -> Iterator[Tuple[int, str, List[int]]]:
+        """(host index, host, ports still to probe) of pass `stage` from the resume point on.
+
+        Finished work is skipped.
+        """
+        base = stage * len(hosts)
+        for index in range(max(self.next_host, base), base + len(hosts)):
+            host = hosts[index - base]
+            done = self._done.get(index, ())
+            todo = [port for port in ports if port not in done]
+            self.stats['skipped_work'] += len(ports) - len(todo)
+            self._remaining[index] = len(todo)
+            for port in todo:
+                self._inflight[(host, port)] = index
+            if not todo:
+                self._advance()
+            yield index - base, host, todo
+
+    def finished(self, host: str, port: int, finding: Optional[Dict] = None) -> None:
+        """Mark (host, port) done, with its finding if the port was open."""
+        index = self._inflight.pop((host, port), None)
+        if index is None:
+            return
+        if finding is not None:
+            self._findings_file.write(json.dumps(finding, default=str, separators=(",", ":")) + "\n")
+            self.findings += 1
+        self._done.setdefault(index, set()).add(port)
+        self._remaining[index] -= 1
+        if index == self.next_host:
+            self._advance()
+        if time.monotonic() - self._last_save >= self.interval:
+            self.save()
+
+    def _advance(self) -> None:
+        while self._remaining.get(self.next_host) == 0:
+            del self._remaining[self.next_host]
+            self._done.pop(self.next_host, None)
+            self.next_host += 1
+
+    # ======================================================
+    # Persistence
+    # ======================================================
+
+    def save(self, complete: bool = False) -> None:
+        if self._findings_file is not None:
+            self._findings_file.flush()
+            os.fsync(self._findings_file.fileno())
+        state = {
+            "run_id": self.run_id,
+            "created_at": self.created_at,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "network": self.network,
+            "exclude": self.exclude,
+            "ports": self.ports,
+            "passes": self.passes,
+            "shuffle": self.shuffle,
+            "seed": self.seed,
+            "shard": self.shard,
+            "total_hosts": self.total_hosts,
+            "next_host": self.next_host,
+            "done": {str(index): sorted(ports) for index, ports in self._done.items() if ports},
+            "findings": self.findings,
+            "complete": complete,
+        }
+        tmp = self.path / (STATE_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path / STATE_FILE)
+        self._last_save = time.monotonic()
+        self.stats['saves'] += 1
+
+    def close(self) -> None:
+        """Save and release the findings file; the checkpoint stays resumable."""
+        if self._findings_file is not None:
+            self.save()
+            self._findings_file.close()
+            self._findings_file = None
+
+    def finish(self) -> None:
+        """The run completed: its checkpoint is no longer needed."""
+        if self._findings_file is not None:
+            self._findings_file.close()
+            self._findings_file = None
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def get_stats(self) -> Dict:
+        stats = self.stats.copy()
+        stats.update(next_host=self.next_host, total_hosts=self.total_hosts, findings=self.findings)
+        return stats
+
+
+def open_checkpoint(directory: str, resume: Optional[str], timestamp: str, network: str, ports: List[int],
+                    **options) -> ScanCheckpoint:
+    """Checkpoint of the run named by --resume, or a new one for a run starting at `timestamp`."""
+    if resume:
+        return ScanCheckpoint.load(directory, resume, interval=options.get('interval', 30.0))
+    return ScanCheckpoint.create(directory, f"sentinel_{timestamp}", network, ports, **options)
@@ -0,0 +1,247 @@
+﻿"""
+Seekable compressed report files.
+Reports are written as a series of independently compressed chunks with a sidecar index of byte offsets and IP ranges.
+"""
+
+import csv
+import gzip
+import io
+import ipaddress
+import json
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    from .targets import ip_to_int
+except ImportError:
+    from targets import ip_to_int
+
+logger = logging.getLogger(__name__)
+
+CODECS = {"gzip": ".gz", "zstd": ".zst"}
+INDEX_VERSION = 1
+
+
+def normalise_codec(codec: Optional[str]) -> Optional[str]:
+    """REPORT_COMPRESSION value to a codec name, or None for plain files."""
+    name = (codec or "").strip().lower()
+    if name in ("", "none", "off", "false"):
+        return None
+    if name == "gz":
+        name = "gzip"
+    if name not in CODECS:
+        raise ValueError(f"Unknown report compression: {codec!r} (expected one of {', '.join(CODECS)} or none)")
+    if name == "zstd":
+        _zstandard()
+    return name
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd report compression needs the optional 'zstandard' package")
+    return zstandard
+
+
+def _compressor(codec: str, level: Optional[int]) -> Callable[[bytes], bytes]:
+    if codec == "gzip":
+        # mtime=0 keeps output reproducible; each call produces one complete gzip member
+        return lambda data: gzip.compress(data, compresslevel=6 if level is None else level, mtime=0)
+    return _zstandard().ZstdCompressor(level=3 if level is None else level).compress
+
+
+def _decompressor(codec: str) -> Callable[[bytes], bytes]:
+    if codec == "gzip":
+        return gzip.decompress
+    return _zstandard().ZstdDecompressor().decompress
+
+
+def compressed_path(path: Path, codec: Optional[str]) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + CODECS[codec]) if codec else path
+
+
+def index_path(path: Path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + ".idx.json")
+
+
+def _ip_key(ip: Union[str, int]) -> int:
+    return ip if isinstance(ip, int) else ip_to_int(ip)
+
+
+class ChunkedTextSink:
+    """Write-only text file that stores its content as independent compressed chunks.
+
+    Concatenated gzip members (and zstd frames) are themselves a valid
+    stream, so `gzip -dc` or gzip.open read the whole file as usual. The
+    index records where each chunk starts and which address range its
+    records cover, so a reader can decompress only the chunks it needs.
+    Chunks are cut between records once `chunk_size` bytes of text are
+    buffered, or explicitly with cut().
+    """
+
+    def __init__(self, path: Path, codec: str, chunk_size: int = 1 << 20,
+                 min_flush: int = 64 << 10, level: Optional[int] = None, fmt: Optional[str] = None):
+        self.path = Path(path)
+        self.codec = codec
+        self.chunk_size = chunk_size
+        self.min_flush = min_flush
+        self.format = fmt
+        self.chunks: List[Dict] = []
+        self._compress = _compressor(codec, level)
+        self._file = open(self.path, "wb")
+        self._offset = 0
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._records = 0
+        self._low: Optional[Tuple[int, str]] = None
+        self._high: Optional[Tuple[int, str]] = None
+
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8")
+        self._buffer.append(data)
+        self._buffered += len(data)
+        return len(text)
+
+    def note(self, ip: Optional[str]) -> None:
+        """Count one complete record (whose text has been written) for the current chunk."""
+        self._records += 1
+        if ip:
+            key = (_ip_key(ip), ip)
+            if self._low is None or key < self._low:
+                self._low = key
+            if self._high is None or key > self._high:
+                self._high = key
+        if self._buffered >= self.chunk_size:
+            self.cut()
+
+    def cut(self) -> None:
+        """Compress everything buffered as one chunk."""
+        if not self._buffered:
+            return
+        raw = b"".join(self._buffer)
+        data = self._compress(raw)
+        self._file.write(data)
+        chunk = {"offset": self._offset, "length": len(data), "raw_length": len(raw), "records": self._records}
+        if self._low is not None:
+            chunk["min_ip"], chunk["max_ip"] = self._low[1], self._high[1]
+        self.chunks.append(chunk)
+        self._offset += len(data)
+        self._buffer, self._buffered, self._records = [], 0, 0
+        self._low = self._high = None
+
+    def flush(self) -> None:
+        # Small chunks compress poorly; tailing readers see data once a reasonable chunk has built up
+        if self._buffered >= self.min_flush:
+            self.cut()
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self.cut()
+        self._file.close()
+        index = {
+            "index_version": INDEX_VERSION,
+            "codec": self.codec,
+            "format": self.format,
+            "file": self.path.name,
+            "record_count": sum(c["records"] for c in self.chunks),
+            "chunks": self.chunks,
+        }
+        with open(index_path(self.path), "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
+
+
+# ======================================================
+# Reading
+# ======================================================
+
+def load_index(path: Path) -> Dict:
+    with open(index_path(path), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _bounds(cidr: Optional[str], start: Union[str, int, None],
+            end: Union[str, int, None]) -> Tuple[Optional[int], Optional[int]]:
+    if cidr:
+        network = ipaddress.ip_network(cidr, strict=False)
+        return int(network.network_address), int(network.broadcast_address)
+    return (None if start is None else _ip_key(start)), (None if end is None else _ip_key(end))
+
+
+def _overlaps(chunk: Dict, low: Optional[int], high: Optional[int]) -> bool:
+    if "min_ip" not in chunk:
+        return low is None and high is None
+    return ((high is None or _ip_key(chunk["min_ip"]) <= high) and
+            (low is None or _ip_key(chunk["max_ip"]) >= low))
+
+
+def read_chunks(path: Path, cidr: Optional[str] = None, start: Union[str, int, None] = None,
+                end: Union[str, int, None] = None, index: Optional[Dict] = None) -> Iterator[str]:
+    """Decompressed text of the record chunks whose address range overlaps the filter.
+
+    Only the matching chunks are read from disk. Without a filter every
+    record chunk is returned; framing chunks (JSON preamble, CSV header,
+    trailer) are never returned.
+    """
+    index = index or load_index(path)
+    decompress = _decompressor(index["codec"])
+    low, high = _bounds(cidr, start, end)
+    with open(path, "rb") as f:
+        for chunk in index["chunks"]:
+            if not chunk["records"] or not _overlaps(chunk, low, high):
+                continue
+            f.seek(chunk["offset"])
+            yield decompress(f.read(chunk["length"])).decode("utf-8")
+
+
+def _csv_header(path: Path, index: Dict) -> List[str]:
+    decompress = _decompressor(index["codec"])
+    first = index["chunks"][0]
+    with open(path, "rb") as f:
+        f.seek(first["offset"])
+        text = decompress(f.read(first["length"])).decode("utf-8")
+    return next(csv.reader(io.StringIO(text)))
+
+
+def _json_records(text: str) -> Iterator[Dict]:
+    decoder = json.JSONDecoder()
+    pos, size = 0, len(text)
+    while True:
+        while pos < size and text[pos] in ", \t\r\n":
+            pos += 1
+        if pos >= size:
+            return
+        record, pos = decoder.raw_decode(text, pos)
+        yield record
+
+
+def iter_records(path: Path, cidr: Optional[str] = None, start: Union[str, int, None] = None,
+                 end: Union[str, int, None] = None) -> Iterator[Dict]:
+    """Records of a chunked report within an address range, decompressing only the chunks involved.
+
+    JSON and NDJSON chunks yield assessment dicts; CSV chunks yield one
+    dict per row keyed by the header.
+    """
+    path = Path(path)
+    index = load_index(path)
+    low, high = _bounds(cidr, start, end)
+    fmt = index.get("format")
+    header = _csv_header(path, index) if fmt == "csv" else None
+
+    for text in read_chunks(path, index=index, start=low, end=high):
+        if fmt == "ndjson":
+            records = (json.loads(line) for line in text.splitlines() if line)
+        elif fmt == "csv":
+            records = (dict(zip(header, row)) for row in csv.reader(io.StringIO(text)))
+        else:
+            records = _json_records(text)
+        for record in records:
+            ip = record.get("ip")
+            if ip and ((low is not None and _ip_key(ip) < low) or (high is not None and _ip_key(ip) > high)):
+                continue
+            yield record
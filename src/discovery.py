@@ -0,0 +1,108 @@
+﻿"""
+Host discovery.
+TCP-ping pre-pass that tells live hosts from empty addresses before the full port scan.
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+try:
+    from .async_scanner import AsyncScanner
+except ImportError:
+    from async_scanner import AsyncScanner
+
+# Ports most likely to answer on Windows and Linux hosts, servers and workstations alike
+DISCOVERY_PORTS = [445, 80, 443, 22, 3389]
+
+
+class HostDiscovery:
+    """Decides whether an address is a live host by TCP-pinging a few high-yield ports.
+
+    The ping ports are connected to at once; the first answer ends the
+    check. An open port and an RST both prove the host exists; only a host
+    that answers on none of them is treated as dead. Ports that answered
+    with an RST are known to be closed, so the full scan can skip them.
+    Hosts that drop everything on the ping ports but serve another scanned
+    port are missed, which is why discovery is optional.
+
+    For a sweep in several port passes, remember() keeps one verdict byte
+    per host index (plus the answers of live hosts), so each host is
+    pinged once however many passes visit it.
+    """
+
+    def __init__(self, scanner: AsyncScanner, ports: Optional[List[int]] = None):
+        self.scanner = scanner
+        self.ports = list(ports or DISCOVERY_PORTS)
+        self.stats = {'hosts_pinged': 0, 'hosts_alive': 0, 'hosts_dead': 0, 'ping_probes': 0,
+                      'alive_by_rst': 0, 'probes_skipped': 0}
+        self._verdicts: Optional[bytearray] = None  # Per host index: 0 unchecked, 1 dead, 2 alive
+        self._answers: Dict[int, Dict[int, bool]] = {}  # Ping answers of live hosts, by host index
+        self._checking: Dict[int, asyncio.Future] = {}
+
+    def remember(self, hosts: int) -> None:
+        """Keep the verdicts on `hosts` host indexes for later passes of the same sweep."""
+        self._verdicts = bytearray(hosts)
+        self._answers.clear()
+
+    async def check(self, ip: str, index: Optional[int] = None) -> Dict[int, bool]:
+        """Ports that answered: {port: True if open, False if closed}. Empty means the host looks dead.
+
+        With remember() and the host's `index`, an earlier verdict is reused.
+        """
+        if self._verdicts is None or index is None:
+            return await self._ping(ip)
+        if self._verdicts[index]:
+            return self._answers.get(index, {})
+        pending = self._checking.get(index)
+        if pending is not None:  # An earlier pass is pinging this host right now
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._checking[index] = future
+        try:
+            answers = await self._ping(ip)
+            self._verdicts[index] = 2 if answers else 1
+            if answers:
+                self._answers[index] = answers
+            future.set_result(answers)
+            return answers
+        finally:
+            del self._checking[index]
+            if not future.done():
+                future.cancel()
+
+    async def _ping(self, ip: str) -> Dict[int, bool]:
+        tasks = {asyncio.create_task(self.scanner.ping(ip, port)): port for port in self.ports}
+        answers: Dict[int, bool] = {}
+        pending = set(tasks)
+        try:
+            while pending and not answers:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result is not None:
+                        answers[tasks[task]] = result
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        self.stats['hosts_pinged'] += 1
+        self.stats['ping_probes'] += len(tasks) - len(pending)
+        if answers:
+            self.stats['hosts_alive'] += 1
+            if not any(answers.values()):
+                self.stats['alive_by_rst'] += 1
+        else:
+            self.stats['hosts_dead'] += 1
+        return answers
+
+    def skipped(self, count: int = 1) -> None:
+        """Count scan probes saved by discovery."""
+        self.stats['probes_skipped'] += count
+
+    def get_stats(self) -> Dict:
+        stats = self.stats.copy()
+        stats['discovery_ports'] = self.ports
+        return stats
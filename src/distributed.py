@@ -0,0 +1,554 @@
+﻿"""
+Distributed scanning.
+A coordinator leases work units of a scan plan to scanner nodes over HTTP; workers sweep them and push findings back.
+"""
+
+import argparse
+import asyncio
+import hmac
+import json
+import logging
+import math
+import os
+import secrets
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+try:
+    from .finding_store import FindingStore
+    from .pipeline import SweepPipeline
+    from .risk_engine import SOCRiskEngine
+    from .scheduler import probe_passes
+    from .sharding import DEFAULT_OPTIONS, build_discovery, build_engines
+    from .targets import TargetSpace
+except ImportError:
+    from finding_store import FindingStore
+    from pipeline import SweepPipeline
+    from risk_engine import SOCRiskEngine
+    from scheduler import probe_passes
+    from sharding import DEFAULT_OPTIONS, build_discovery, build_engines
+    from targets import TargetSpace
+
+logger = logging.getLogger(__name__)
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+
+def build_plan(network: str, ports: List[int], exclude: Optional[str] = None, unit_hosts: int = 256) -> List[Dict]:
+    """Split each target spec into work units of about `unit_hosts` addresses.
+
+    A unit is shard i of n of one spec (TargetSpace.shard), so units hold
+    whole /24s and one subnet is only ever swept by one worker at a time.
+    """
+    units = []
+    for spec in filter(None, (part.strip() for part in network.split(','))):
+        size = TargetSpace(spec, exclude=exclude).size
+        if not size:
+            continue
+        count = max(1, math.ceil(size / unit_hosts))
+        for index in range(count):
+            units.append({"id": f"u{len(units)}", "network": spec, "exclude": exclude,
+                          "shard": [index, count], "ports": list(ports)})
+    return units
+
+
+def _covers(networks: List[str], spec: str) -> bool:
+    """True when every address of `spec` is inside one of `networks`."""
+    allowed = TargetSpace(networks).ranges
+    for start, end in TargetSpace(spec).ranges:
+        if not any(a_start <= start and end <= a_end for a_start, a_end in allowed):
+            return False
+    return True
+
+
+# ======================================================
+# Coordinator
+# ======================================================
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        logger.debug(format % args)
+
+    def do_GET(self) -> None:
+        if not self._authorised():
+            return
+        if self.path.split("?")[0] == "/status":
+            self._reply(200, self.server.coordinator.status())
+        else:
+            self._reply(404, {"error": "unknown endpoint"})
+
+    def do_POST(self) -> None:
+        if not self._authorised():
+            return
+        coordinator: 'Coordinator' = self.server.coordinator
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            self._reply(400, {"error": "invalid JSON"})
+            return
+        path = self.path.split("?")[0]
+        if path == "/lease":
+            status, payload = coordinator.lease(request.get("worker", "unknown"), request.get("networks"))
+        elif path == "/findings":
+            status, payload = coordinator.renew(request.get("lease"), request.get("findings", []))
+        elif path == "/complete":
+            status, payload = coordinator.complete(request.get("lease"), request.get("findings", []),
+                                                   request.get("stats"))
+        elif path == "/fail":
+            status, payload = coordinator.fail(request.get("lease"), request.get("error", ""))
+        else:
+            status, payload = 404, {"error": "unknown endpoint"}
+        self._reply(status, payload)
+
+    def _authorised(self) -> bool:
+        token = self.server.coordinator.token
+        if token and not hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {token}"):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self._reply(401, {"error": "invalid token"})
+            return False
+        return True
+
+    def _reply(self, status: int, payload: Dict) -> None:
+        data = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class Coordinator:
+    """Hands out the units of a scan plan to workers under expiring leases.
+
+    A worker leases a unit (POST /lease), pushes findings while it sweeps
+    (POST /findings, which also renews the lease) and finally completes it
+    (POST /complete). A lease not renewed within `lease_ttl` seconds is
+    taken back and the unit re-dispatched, up to `max_attempts` times.
+    Findings are buffered per lease and only committed to the store on
+    completion, so a unit swept twice never yields duplicates.
+    `on_received` sees every finding as soon as it is pushed, before its
+    unit completes (for early alerts, which de-duplicate themselves).
+    """
+
+    def __init__(self, units: List[Dict], settings: Optional[Dict] = None, host: str = "127.0.0.1",
+                 port: int = 8470, token: Optional[str] = None, lease_ttl: float = 60.0, max_attempts: int = 3,
+                 store: Optional[FindingStore] = None, on_finding: Optional[Callable[[Dict], None]] = None,
+                 on_received: Optional[Callable[[Dict], None]] = None):
+        self.settings = dict(DEFAULT_OPTIONS, **(settings or {}))
+        self.token = token
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max_attempts
+        self.store = store if store is not None else FindingStore()
+        self.on_finding = on_finding
+        self.on_received = on_received
+        self.units = {unit["id"]: {"unit": unit, "state": PENDING, "lease": None, "worker": None,
+                                   "expires": 0.0, "attempts": 0, "findings": [], "stats": None}
+                      for unit in units}
+        self._leases: Dict[str, str] = {}  # Live lease id -> unit id
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.workers: Dict[str, float] = {}  # Worker id -> last contact
+        self.stats = {'leases': 0, 'redispatched': 0, 'findings': 0, 'stale_requests': 0}
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.coordinator = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'Coordinator':
+        self._thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05},
+                                        name="coordinator", daemon=True)
+        self._thread.start()
+        logger.info(f"Coordinator on {self.url} with {len(self.units)} work units")
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'Coordinator':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ======================================================
+    # Lease protocol (called from the HTTP handler threads)
+    # ======================================================
+
+    def lease(self, worker: str, networks: Optional[List[str]] = None):
+        with self._lock:
+            now = time.monotonic()
+            self.workers[worker] = now
+            self._reclaim(now)
+            for entry in self.units.values():
+                if entry["state"] != PENDING or (networks and not _covers(networks, entry["unit"]["network"])):
+                    continue
+                lease = secrets.token_hex(8)
+                entry.update(state=LEASED, lease=lease, worker=worker, expires=now + self.lease_ttl, findings=[])
+                entry["attempts"] += 1
+                self._leases[lease] = entry["unit"]["id"]
+                self.stats['leases'] += 1
+                return 200, {"lease": lease, "ttl": self.lease_ttl, "unit": entry["unit"],
+                             "settings": self.settings}
+            if self._finished():
+                return 410, {"done": True}
+            return 200, {"lease": None, "retry_after": min(5.0, self.lease_ttl / 4)}
+
+    def renew(self, lease: str, findings: List[Dict]):
+        with self._lock:
+            entry = self._live(lease)
+            if entry is None:
+                return 409, {"error": "lease lost"}
+            entry["expires"] = time.monotonic() + self.lease_ttl
+            self._receive(entry, findings)
+            return 200, {"ttl": self.lease_ttl}
+
+    def complete(self, lease: str, findings: List[Dict], stats: Optional[Dict] = None):
+        with self._lock:
+            entry = self._live(lease)
+            if entry is None:
+                return 409, {"error": "lease lost"}
+            self._receive(entry, findings)
+            for assessment in entry["findings"]:
+                self.store.add_assessment(assessment)
+                if self.on_finding:
+                    self.on_finding(assessment)
+            self.stats['findings'] += len(entry["findings"])
+            entry.update(state=DONE, findings=[], stats=stats)
+            del self._leases[lease]
+            self._changed.notify_all()
+            return 200, {"done": self._finished()}
+
+    def fail(self, lease: str, error: str):
+        with self._lock:
+            entry = self._live(lease)
+            if entry is None:
+                return 409, {"error": "lease lost"}
+            logger.warning(f"Worker {entry['worker']} failed unit {entry['unit']['id']}: {error}")
+            self._release(entry)
+            return 200, {}
+
+    def _receive(self, entry: Dict, findings: List[Dict]) -> None:
+        entry["findings"].extend(findings)
+        if self.on_received:
+            for assessment in findings:
+                self.on_received(assessment)
+
+    def _live(self, lease: Optional[str]) -> Optional[Dict]:
+        """Unit held under `lease`; an expired lease stays valid until the unit is reclaimed."""
+        entry = self.units.get(self._leases.get(lease)) if lease else None
+        if entry is None:
+            self.stats['stale_requests'] += 1
+            return None
+        self.workers[entry["worker"]] = time.monotonic()
+        return entry
+
+    def _reclaim(self, now: float) -> None:
+        for entry in self.units.values():
+            if entry["state"] == LEASED and entry["expires"] < now:
+                logger.warning(f"Lease of unit {entry['unit']['id']} by {entry['worker']} expired")
+                self._release(entry)
+
+    def _release(self, entry: Dict) -> None:
+        self._leases.pop(entry["lease"], None)
+        if entry["attempts"] >= self.max_attempts:
+            logger.error(f"Unit {entry['unit']['id']} ({entry['unit']['network']}) failed "
+                         f"after {entry['attempts']} attempts")
+            entry.update(state=FAILED, lease=None, findings=[])
+        else:
+            entry.update(state=PENDING, lease=None, findings=[])
+            self.stats['redispatched'] += 1
+        self._changed.notify_all()
+
+    def _finished(self) -> bool:
+        return all(entry["state"] in (DONE, FAILED) for entry in self.units.values())
+
+    # ======================================================
+    # Progress
+    # ======================================================
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every unit is done or failed. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while not self._finished():
+                self._reclaim(time.monotonic())
+                remaining = 1.0 if deadline is None else min(1.0, deadline - time.monotonic())
+                if remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+            return True
+
+    def status(self) -> Dict:
+        with self._lock:
+            states = {state: 0 for state in (PENDING, LEASED, DONE, FAILED)}
+            for entry in self.units.values():
+                states[entry["state"]] += 1
+            return dict(self.stats, units=states, workers=sorted(self.workers), finished=self._finished())
+
+    def get_stats(self) -> Dict:
+        return self.status()
+
+
+# ======================================================
+# Worker
+# ======================================================
+
+class ScanWorker:
+    """Scanner node: leases units from a coordinator, sweeps them and pushes findings back.
+
+    `networks` restricts the worker to units inside the segments it can
+    reach. Findings are pushed every `push_interval` seconds, which keeps
+    the lease alive; if the coordinator reports the lease lost, the unit's
+    sweep is cancelled.
+    """
+
+    def __init__(self, coordinator_url: str, worker_id: Optional[str] = None, token: Optional[str] = None,
+                 networks: Optional[List[str]] = None, push_interval: float = 5.0, timeout: float = 10.0,
+                 give_up_after: float = 300.0):
+        self.url = coordinator_url.rstrip("/")
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.networks = networks
+        self.push_interval = push_interval
+        self.timeout = timeout
+        self.give_up_after = give_up_after
+        self.session = requests.Session()
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        self.stats = {'units_completed': 0, 'units_lost': 0, 'units_failed': 0, 'findings_sent': 0,
+                      'ports_checked': 0}
+
+    def _post(self, path: str, payload: Dict) -> requests.Response:
+        data = json.dumps(payload, default=str)
+        return self.session.post(f"{self.url}{path}", data=data, timeout=self.timeout,
+                                 headers={"Content-Type": "application/json"})
+
+    def run(self, max_units: Optional[int] = None) -> Dict:
+        """Work until the plan is finished (or `max_units` are done). Returns the worker's stats."""
+        unreachable_since = None
+        done = 0
+        while max_units is None or done < max_units:
+            try:
+                response = self._post("/lease", {"worker": self.worker_id, "networks": self.networks})
+            except requests.RequestException as e:
+                unreachable_since = unreachable_since or time.monotonic()
+                if time.monotonic() - unreachable_since > self.give_up_after:
+                    raise ConnectionError(f"Coordinator {self.url} unreachable: {e}")
+                time.sleep(min(5.0, self.push_interval))
+                continue
+            unreachable_since = None
+            if response.status_code == 410:
+                break
+            response.raise_for_status()
+            lease = response.json()
+            if lease["lease"] is None:
+                time.sleep(lease["retry_after"])
+                continue
+            self._work(lease)
+            done += 1
+        return self.get_stats()
+
+    def _work(self, lease: Dict) -> None:
+        unit, settings = lease["unit"], lease["settings"]
+        pending: List[Dict] = []
+        pending_lock = threading.Lock()
+        stop = threading.Event()
+        lost = threading.Event()
+        loop_task = {}
+
+        def take() -> List[Dict]:
+            nonlocal pending
+            with pending_lock:
+                batch, pending = pending, []
+            return batch
+
+        def heartbeat() -> None:
+            interval = min(self.push_interval, lease["ttl"] / 3)
+            while not stop.wait(interval):
+                batch = take()
+                try:
+                    response = self._post("/findings", {"lease": lease["lease"], "findings": batch})
+                except requests.RequestException as e:
+                    logger.warning(f"Could not reach coordinator: {e}")
+                    with pending_lock:
+                        pending[:0] = batch
+                    continue
+                self.stats['findings_sent'] += len(batch)
+                if response.status_code == 409:
+                    logger.warning(f"Lease on unit {unit['id']} lost; abandoning it")
+                    lost.set()
+                    loop, task = loop_task.get("loop"), loop_task.get("task")
+                    if loop is not None:
+                        loop.call_soon_threadsafe(task.cancel)
+                    return
+
+        def on_finding(assessment: Dict) -> None:
+            with pending_lock:
+                pending.append(assessment)
+
+        scanner, triage_engine = build_engines(settings)
+        pipeline = SweepPipeline(scanner, SOCRiskEngine(), triage_engine,
+                                 triage_workers=triage_engine.max_concurrency,
+                                 triage_ports=settings.get('triage_ports'), on_finding=on_finding, collect=False,
+                                 discovery=build_discovery(settings, scanner),
+                                 passes=probe_passes(unit["ports"]) if settings.get('port_priority') else None)
+        hosts = scanner.validate_cidr(unit["network"], exclude=unit["exclude"])
+        if hosts:
+            hosts = hosts.shard(*unit["shard"])
+
+        async def sweep() -> None:
+            loop_task["task"] = asyncio.current_task()
+            loop_task["loop"] = asyncio.get_running_loop()
+            await pipeline.run_async(hosts, unit["ports"])
+
+        pusher = threading.Thread(target=heartbeat, name="lease-heartbeat", daemon=True)
+        pusher.start()
+        try:
+            asyncio.run(sweep())
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            stop.set()
+            self.stats['units_failed'] += 1
+            logger.error(f"Unit {unit['id']} failed: {e}")
+            try:
+                self._post("/fail", {"lease": lease["lease"], "error": str(e)})
+            except requests.RequestException:
+                pass  # The lease expires and the unit is re-dispatched anyway
+            return
+        finally:
+            stop.set()
+            pusher.join()
+            self.stats['ports_checked'] += scanner.scan_stats['ports_checked']
+
+        if lost.is_set():
+            self.stats['units_lost'] += 1
+            return
+        batch = take()
+        response = self._post("/complete", {"lease": lease["lease"], "findings": batch,
+                                            "stats": pipeline.get_stats()})
+        if response.status_code == 409:
+            self.stats['units_lost'] += 1
+            logger.warning(f"Unit {unit['id']} was re-dispatched before it completed")
+            return
+        response.raise_for_status()
+        self.stats['findings_sent'] += len(batch)
+        self.stats['units_completed'] += 1
+
+    def get_stats(self) -> Dict:
+        return self.stats.copy()
+
+
+def run_worker(coordinator_url: str, **options) -> Dict:
+    """Run a ScanWorker to completion (usable as a multiprocessing target)."""
+    return ScanWorker(coordinator_url, **options).run()
+
+
+# ======================================================
+# Command line
+# ======================================================
+
+def _settings_from_env() -> Dict:
+    timeout = float(os.getenv('TIMEOUT', '1.5'))
+    return {
+        'timeout': timeout,
+        'max_concurrency': int(os.getenv('MAX_CONCURRENCY', '2000')),
+        'rate': float(os.getenv('SCAN_RATE', '0')),
+        'host_rate': float(os.getenv('HOST_RATE', '4')),
+        'subnet_rate': float(os.getenv('SUBNET_RATE', '0')),
+        'adaptive_timeout': os.getenv('ADAPTIVE_TIMEOUT', 'true').lower() == 'true',
+        'min_timeout': min(float(os.getenv('TIMEOUT_MIN', '0.05')), timeout),
+        'triage_concurrency': int(os.getenv('TRIAGE_CONCURRENCY', '500')),
+        'discovery_ports': _discovery_ports(),
+        'port_priority': os.getenv('PORT_PRIORITY', 'true').lower() == 'true',
+    }
+
+
+def _discovery_ports() -> Optional[List[int]]:
+    if os.getenv('DISCOVERY', 'false').lower() != 'true':
+        return None
+    return [int(p) for p in os.getenv('DISCOVERY_PORTS', '445,80,443,22,3389').split(',') if p.strip()]
+
+
+def main() -> None:
+    """python src/distributed.py coordinator | worker --coordinator URL [--networks CIDR,...]"""
+    from dotenv import load_dotenv
+    try:
+        from .alerts import create_alert_channel
+        from .reporter import SOCReporter
+    except ImportError:
+        from alerts import create_alert_channel
+        from reporter import SOCReporter
+
+    load_dotenv('config.env')
+    parser = argparse.ArgumentParser(description="Distributed SentinelSweep scanning")
+    roles = parser.add_subparsers(dest="role", required=True)
+    coordinator_args = roles.add_parser("coordinator", help="split the scan plan and collect findings")
+    coordinator_args.add_argument("--host", default=os.getenv('COORDINATOR_HOST', '127.0.0.1'))
+    coordinator_args.add_argument("--port", type=int, default=int(os.getenv('COORDINATOR_PORT', '8470')))
+    worker_args = roles.add_parser("worker", help="lease and sweep work units")
+    worker_args.add_argument("--coordinator", default=os.getenv('COORDINATOR_URL', 'http://127.0.0.1:8470'))
+    worker_args.add_argument("--networks", help="only take units inside these CIDRs (the segments this node reaches)")
+    worker_args.add_argument("--id", help="worker name (default: hostname-pid)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    token = os.getenv('DISTRIBUTED_TOKEN') or None
+
+    if args.role == "worker":
+        networks = [part.strip() for part in args.networks.split(',')] if args.networks else None
+        stats = run_worker(args.coordinator, worker_id=args.id, token=token, networks=networks)
+        print(f"Worker finished: {stats}")
+        return
+
+    ports = list(map(int, os.getenv('PORTS', '22,80,443,3389').split(',')))
+    units = build_plan(os.getenv('NETWORK_CIDR', '192.168.1.0/24'), ports, exclude=os.getenv('EXCLUDE_TARGETS'),
+                       unit_hosts=int(os.getenv('UNIT_HOSTS', '256')))
+    reporter = SOCReporter(formats=os.getenv('REPORT_FORMAT'), compression=os.getenv('REPORT_COMPRESSION'))
+    stream = reporter.open_stream()
+    alerts = None
+    if os.getenv('ALERTS_ENABLED', 'false').lower() == 'true':
+        # Alerts fire as workers push findings, not when their units complete
+        alerts = create_alert_channel(os.getenv('ALERT_SINKS', 'file'),
+                                      min_risk=os.getenv('ALERT_MIN_RISK', 'HIGH'),
+                                      webhook_url=os.getenv('ALERT_WEBHOOK_URL'),
+                                      syslog_address=os.getenv('ALERT_SYSLOG_ADDRESS'),
+                                      alert_file=os.getenv('ALERT_FILE'),
+                                      siem_options=dict(siem_type=os.getenv('SIEM_TYPE', 'elastic'),
+                                                        endpoint=os.getenv('SIEM_ENDPOINT'),
+                                                        api_key=os.getenv('SIEM_API_KEY'),
+                                                        workspace_id=os.getenv('SIEM_WORKSPACE_ID'),
+                                                        spool_dir=os.getenv('SIEM_SPOOL_DIR', 'reports/spool')))
+    with Coordinator(units, _settings_from_env(), host=args.host, port=args.port, token=token,
+                     lease_ttl=float(os.getenv('LEASE_TTL', '60')), on_finding=stream.write,
+                     on_received=alerts.observe if alerts else None) as coordinator:
+        print(f"Coordinator on {coordinator.url}: {len(units)} work units")
+        coordinator.wait()
+        status = coordinator.status()
+    if alerts:
+        alert_stats = alerts.close()
+        print(f"Alerts: {alert_stats['alerts']} raised ({alert_stats['correlated']} correlated)")
+    print(f"Plan finished: {status['units']} ({status['redispatched']} re-dispatched, "
+          f"workers: {', '.join(status['workers'])})")
+    if coordinator.store:
+        summary = SOCRiskEngine().generate_executive_summary(coordinator.store)
+        paths = reporter.generate_reports(coordinator.store, summary, stream=stream)
+        print(f"Reports: {', '.join(str(p) for p in paths.values())}")
+    else:
+        stream.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+﻿"""
+Columnar, integer-backed store for scan findings.
+Holds one row per assessment in typed arrays; assessment dicts are built on demand.
+"""
+
+import datetime
+import heapq
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .risk_engine import MITRE_ATTACK_MAP, RISK_LEVELS, mitre_findings_for, recommendations_for
+    from .targets import int_to_ip, ip_to_int
+except ImportError:
+    from risk_engine import MITRE_ATTACK_MAP, RISK_LEVELS, mitre_findings_for, recommendations_for
+    from targets import int_to_ip, ip_to_int
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class StringTable:
+    """Interns repeated strings (segments, risk labels, reasons) as small integer ids."""
+
+    def __init__(self, seed: Optional[List[str]] = None):
+        self.values: List[str] = []
+        self._ids: Dict[str, int] = {}
+        for value in seed or []:
+            self.intern(value)
+
+    def intern(self, value: str) -> int:
+        key = self._ids.get(value)
+        if key is None:
+            key = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return key
+
+    def __getitem__(self, key: int) -> str:
+        return self.values[key]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def _to_micros(timestamp: Optional[str]) -> int:
+    if not timestamp:
+        moment = datetime.datetime.utcnow()
+    else:
+        moment = datetime.datetime.fromisoformat(timestamp.rstrip('Z'))
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    delta = moment - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _from_micros(micros: int) -> str:
+    return (_EPOCH + datetime.timedelta(microseconds=micros)).isoformat() + 'Z'
+
+
+class FindingStore:
+    """Array-backed findings: ip (uint32), ports (uint16), risks (uint8), score, segment, technique.
+
+    Ports of a row live in one flat column addressed by an offsets column, so a
+    row holding one open port costs a few dozen bytes instead of a nested dict.
+    Iterating or indexing returns the same dict shape as
+    SOCRiskEngine.assess_exposure. IPv6 addresses do not fit the uint32 column;
+    they are kept in a sparse side table and their `ip` cell is 0.
+    """
+
+    def __init__(self):
+        self.ip = array('I')
+        self.port_offsets = array('I', [0])
+        self.ports = array('H')
+        self.techniques = array('B')  # Parallel to `ports`; 0 = unmapped port
+        self.initial_risk = array('B')
+        self.true_risk = array('B')
+        self.risk_score = array('H')
+        self.segment = array('H')
+        self.adjusted = array('B')
+        self.reliability = array('B')
+        self.verification = array('I')
+        self.reason = array('I')
+        self.timestamp = array('q')  # Microseconds since the epoch, UTC
+
+        self.risk_labels = StringTable(RISK_LEVELS)
+        self.segments = StringTable()
+        self.technique_ids = StringTable([''])
+        self.reliabilities = StringTable()
+        self.strings = StringTable([''])
+        self.details: Dict[int, Dict] = {}  # Sparse: only rows with triage details
+        self.ipv6: Dict[int, int] = {}  # Sparse: 128-bit address of each IPv6 row
+
+    # ======================================================
+    # Writing
+    # ======================================================
+
+    def append(self, ip: str, open_ports: List[int], initial_risk: str, true_risk: str, risk_score: int,
+               network_segment: str, risk_adjusted: bool = False,
+               verification: str = 'Standard port detection', reliability: str = 'MEDIUM',
+               adjustment_reason: Optional[str] = None, details: Optional[Dict] = None,
+               timestamp: Optional[str] = None) -> int:
+        """Append one assessment row. Returns its row index."""
+        row = len(self.ip)
+        address = ip_to_int(ip)
+        if ':' in ip:
+            self.ipv6[row] = address
+            address = 0
+        self.ip.append(address)
+        for port in open_ports:
+            self.ports.append(port)
+            mapped = MITRE_ATTACK_MAP.get(port)
+            self.techniques.append(self.technique_ids.intern(mapped['technique']) if mapped else 0)
+        self.port_offsets.append(len(self.ports))
+        self.initial_risk.append(self.risk_labels.intern(initial_risk))
+        self.true_risk.append(self.risk_labels.intern(true_risk))
+        self.risk_score.append(risk_score)
+        self.segment.append(self.segments.intern(network_segment))
+        self.adjusted.append(1 if risk_adjusted else 0)
+        self.reliability.append(self.reliabilities.intern(reliability))
+        self.verification.append(self.strings.intern(verification))
+        self.reason.append(self.strings.intern(adjustment_reason) if adjustment_reason else 0)
+        self.timestamp.append(_to_micros(timestamp))
+        if details:
+            self.details[row] = details
+        return row
+
+    def add_assessment(self, assessment: Dict) -> int:
+        """Append an assessment dict as produced by assess_exposure."""
+        context = assessment.get('context', {})
+        return self.append(
+            assessment['ip'], assessment.get('open_ports', []),
+            assessment['initial_risk'], assessment.get('true_risk', assessment['initial_risk']),
+            assessment.get('risk_score', 0), context.get('network_segment', 'General_Network'),
+            risk_adjusted=assessment.get('risk_adjusted', False),
+            verification=assessment.get('verification', 'Standard port detection'),
+            reliability=assessment.get('reliability', 'MEDIUM'),
+            adjustment_reason=assessment.get('adjustment_reason'),
+            details=context.get('triage_details'),
+            timestamp=assessment.get('timestamp'),
+        )
+
+    def extend_columns(self, ip, ports, counts, risk_levels, scores, segment_labels: List[str],
+                       segment_codes, timestamp: Optional[str] = None,
+                       ipv6: Optional[Dict[int, int]] = None) -> range:
+        """Bulk-append untriaged rows from NumPy arrays, as produced by SOCRiskEngine.assess_batch.
+
+        `ports` is the flat port column for the new rows and `counts` the number
+        of ports per row; `risk_levels` index RISK_LEVELS and `segment_codes`
+        index `segment_labels`. `ipv6` maps batch positions to the 128-bit
+        addresses of IPv6 rows (whose `ip` entry is 0). Returns the range of new row indices.
+        """
+        import numpy as np
+
+        first, n = len(self), len(ip)
+        ports = np.asarray(ports, dtype=np.uint16)
+        self.ip.frombytes(np.asarray(ip, dtype=np.uint32).tobytes())
+        for position, address in (ipv6 or {}).items():
+            self.ipv6[first + position] = address
+        offsets = len(self.ports) + np.cumsum(np.asarray(counts, dtype=np.int64))
+        self.port_offsets.frombytes(offsets.astype(np.uint32).tobytes())
+        self.ports.frombytes(ports.tobytes())
+
+        unique_ports = np.unique(ports)
+        technique_of = np.array([self.technique_ids.intern(MITRE_ATTACK_MAP[p]['technique'])
+                                 if p in MITRE_ATTACK_MAP else 0 for p in unique_ports.tolist()], dtype=np.uint8)
+        if len(ports):
+            self.techniques.frombytes(technique_of[np.searchsorted(unique_ports, ports)].tobytes())
+
+        # risk_labels is seeded with RISK_LEVELS, so level indices are already label ids
+        levels = np.asarray(risk_levels, dtype=np.uint8).tobytes()
+        self.initial_risk.frombytes(levels)
+        self.true_risk.frombytes(levels)
+        self.risk_score.frombytes(np.asarray(scores, dtype=np.uint16).tobytes())
+        segment_ids = np.array([self.segments.intern(label) for label in segment_labels], dtype=np.uint16)
+        self.segment.frombytes(segment_ids[np.asarray(segment_codes)].tobytes())
+
+        self.adjusted.frombytes(bytes(n))
+        self.reliability.extend(array('B', [self.reliabilities.intern('MEDIUM')]) * n)
+        self.verification.extend(array('I', [self.strings.intern('Standard port detection')]) * n)
+        self.reason.extend(array('I', [0]) * n)
+        self.timestamp.extend(array('q', [_to_micros(timestamp)]) * n)
+        return range(first, first + n)
+
+    def extend(self, assessments) -> None:
+        for assessment in assessments:
+            self.add_assessment(assessment)
+
+    # ======================================================
+    # Reading
+    # ======================================================
+
+    def __len__(self) -> int:
+        return len(self.ip)
+
+    def ports_of(self, row: int) -> List[int]:
+        return self.ports[self.port_offsets[row]:self.port_offsets[row + 1]].tolist()
+
+    def ip_of(self, row: int) -> str:
+        if self.ipv6 and row in self.ipv6:
+            return int_to_ip(self.ipv6[row], 6)
+        return int_to_ip(self.ip[row])
+
+    def __getitem__(self, row: int) -> Dict:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("finding index out of range")
+
+        open_ports = self.ports_of(row)
+        initial_risk = self.risk_labels[self.initial_risk[row]]
+        finding = {
+            'ip': self.ip_of(row),
+            'open_ports': open_ports,
+            'initial_risk': initial_risk,
+            'risk_score': self.risk_score[row],
+            'verification': self.strings[self.verification[row]],
+            'reliability': self.reliabilities[self.reliability[row]],
+            'context': {
+                'mitre_findings': mitre_findings_for(open_ports),
+                'asset_owner': 'Unknown',
+                'network_segment': self.segments[self.segment[row]],
+                'triage_details': self.details.get(row, {})
+            },
+            'transferable_data': {
+                'siem_ready': True,
+                'ticket_fields': {
+                    'priority': initial_risk,
+                    'assignment_group': 'Network-Security'
+                }
+            },
+            'recommendations': recommendations_for(open_ports),
+            'timestamp': _from_micros(self.timestamp[row]),
+            'true_risk': self.risk_labels[self.true_risk[row]],
+            'risk_adjusted': bool(self.adjusted[row]),
+        }
+        if self.adjusted[row]:
+            finding['adjustment_reason'] = self.strings[self.reason[row]]
+        return finding
+
+    def __iter__(self) -> Iterator[Dict]:
+        for row in range(len(self)):
+            yield self[row]
+
+    def in_ip_order(self) -> Iterator[Dict]:
+        """Rows as dicts sorted by address, IPv4 before IPv6; only the row order is materialised."""
+        ip, v6 = self.ip, self.ipv6
+
+        def address(row: int) -> Tuple[int, int]:
+            return (1, v6[row]) if row in v6 else (0, ip[row])
+
+        for row in sorted(range(len(self)), key=address if v6 else ip.__getitem__):
+            yield self[row]
+
+    def port_risks(self) -> Iterator[Tuple[str, int, str]]:
+        """(ip, port, true_risk) for every open port, without building assessment dicts."""
+        offsets, labels = self.port_offsets, self.risk_labels
+        for row in range(len(self)):
+            ip, risk = self.ip_of(row), labels[self.true_risk[row]]
+            for port in self.ports[offsets[row]:offsets[row + 1]]:
+                yield ip, port, risk
+
+    def top(self, n: int) -> List[Dict]:
+        """Highest risk_score rows as dicts, without building the others."""
+        rows = heapq.nlargest(n, range(len(self)), key=self.risk_score.__getitem__)
+        return [self[row] for row in rows]
+
+    def executive_summary(self) -> Dict:
+        """Same keys as SOCRiskEngine.generate_executive_summary, computed from the columns."""
+        level_counts = [0] * len(self.risk_labels)
+        for code in self.true_risk:
+            level_counts[code] += 1
+
+        port_counts: Dict[int, int] = {}
+        for port in self.ports:
+            port_counts[port] = port_counts.get(port, 0) + 1
+
+        offsets = self.port_offsets
+        exposed = sum(1 for row in range(len(self)) if offsets[row + 1] > offsets[row])
+
+        return {
+            'total_hosts': len(self),
+            'hosts_with_exposure': exposed,
+            'critical_hosts': level_counts[RISK_LEVELS.index('CRITICAL')],
+            'high_hosts': level_counts[RISK_LEVELS.index('HIGH')],
+            'medium_hosts': level_counts[RISK_LEVELS.index('MEDIUM')],
+            'low_hosts': level_counts[RISK_LEVELS.index('LOW')],
+            'adjusted_risks': sum(self.adjusted),
+            'total_open_ports': len(self.ports),
+            'common_ports': dict(sorted(port_counts.items(), key=lambda x: x[1], reverse=True)[:5]),
+            'top_risks': []
+        }
+
+    def as_numpy(self) -> Dict:
+        """NumPy copies of the fixed-width columns (requires numpy).
+
+        Copies rather than views, since a live buffer export would stop the
+        arrays from growing on the next append. IPv6 rows read 0 in `ip`.
+        """
+        import numpy as np
+
+        def column(values, dtype):
+            return np.frombuffer(values, dtype=dtype).copy() if len(values) else np.zeros(0, dtype=dtype)
+
+        return {
+            'ip': column(self.ip, np.uint32),
+            'port_offsets': column(self.port_offsets, np.uint32),
+            'ports': column(self.ports, np.uint16),
+            'techniques': column(self.techniques, np.uint8),
+            'initial_risk': column(self.initial_risk, np.uint8),
+            'true_risk': column(self.true_risk, np.uint8),
+            'risk_score': column(self.risk_score, np.uint16),
+            'segment': column(self.segment, np.uint16),
+            'adjusted': column(self.adjusted, np.uint8),
+        }
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns."""
+        columns = (self.ip, self.port_offsets, self.ports, self.techniques, self.initial_risk,
+                   self.true_risk, self.risk_score, self.segment, self.adjusted, self.reliability,
+                   self.verification, self.reason, self.timestamp)
+        return sum(c.itemsize * len(c) for c in columns) + 16 * len(self.ipv6)
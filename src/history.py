@@ -0,0 +1,261 @@
+﻿"""
+Persistent scan history.
+SQLite-backed store of runs, hosts, open ports and findings with indexed queries for trend analysis.
+"""
+
+import ipaddress
+import json
+import logging
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .risk_engine import RISK_LEVELS
+except ImportError:
+    from risk_engine import RISK_LEVELS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT UNIQUE NOT NULL,
+    started_at TEXT NOT NULL,
+    tool_version TEXT,
+    host_count INTEGER NOT NULL DEFAULT 0,
+    finding_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS hosts (
+    id INTEGER PRIMARY KEY,
+    ip TEXT UNIQUE NOT NULL,
+    ip_int INTEGER,                 -- IPv4 only; NULL for IPv6
+    segment TEXT
+);
+CREATE TABLE IF NOT EXISTS ports (
+    run INTEGER NOT NULL REFERENCES runs(id),
+    host INTEGER NOT NULL REFERENCES hosts(id),
+    port INTEGER NOT NULL,
+    risk TEXT NOT NULL,
+    PRIMARY KEY (run, host, port)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS findings (
+    id INTEGER PRIMARY KEY,
+    run INTEGER NOT NULL REFERENCES runs(id),
+    host INTEGER NOT NULL REFERENCES hosts(id),
+    ports TEXT NOT NULL,            -- JSON list
+    initial_risk TEXT,
+    true_risk TEXT,
+    risk_score INTEGER,
+    risk_adjusted INTEGER,
+    adjustment_reason TEXT,
+    verification TEXT,
+    reliability TEXT,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started_at);
+CREATE INDEX IF NOT EXISTS idx_hosts_ip_int ON hosts(ip_int);
+CREATE INDEX IF NOT EXISTS idx_ports_port_run ON ports(port, run);
+CREATE INDEX IF NOT EXISTS idx_ports_host_port ON ports(host, port);
+CREATE INDEX IF NOT EXISTS idx_ports_risk ON ports(risk, run);
+CREATE INDEX IF NOT EXISTS idx_findings_run ON findings(run);
+CREATE INDEX IF NOT EXISTS idx_findings_host ON findings(host);
+CREATE INDEX IF NOT EXISTS idx_findings_risk ON findings(true_risk, run);
+"""
+
+
+def _ip_int(ip: str) -> Optional[int]:
+    address = ipaddress.ip_address(ip)
+    return int(address) if address.version == 4 else None
+
+
+def _severity(risk: Optional[str]) -> int:
+    return RISK_LEVELS.index(risk) if risk in RISK_LEVELS else -1
+
+
+def _cidr_bounds(cidr: str) -> Tuple[int, int]:
+    network = ipaddress.ip_network(cidr, strict=False)
+    if network.version != 4:
+        raise ValueError("CIDR filters support IPv4 networks only")
+    return int(network.network_address), int(network.broadcast_address)
+
+
+class ScanHistory:
+    """History of every scan run in one SQLite file.
+
+    Each run is written in a single transaction with bulk inserts. Open ports
+    are kept per (run, host, port), so questions such as "when did 3389 first
+    open on 10.0.5.0/24?" are answered from indexes instead of old reports.
+    """
+
+    def __init__(self, path: str = "reports/history.db"):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> 'ScanHistory':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ======================================================
+    # Writing
+    # ======================================================
+
+    def record_run(self, assessments: Iterable[Dict], run_id: Optional[str] = None,
+                   started_at: Optional[str] = None, tool_version: Optional[str] = None) -> int:
+        """Store one run's assessments. Returns the internal run id.
+
+        Re-recording an existing run_id replaces that run.
+        """
+        started_at = started_at or datetime.now(timezone.utc).isoformat()
+        run_id = run_id or f"run_{started_at}"
+
+        with self.conn:
+            existing = self.conn.execute("SELECT id FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if existing:
+                self._delete_run(existing["id"])
+            run = self.conn.execute(
+                "INSERT INTO runs (run_id, started_at, tool_version) VALUES (?, ?, ?)",
+                (run_id, started_at, tool_version)).lastrowid
+
+            host_ids: Dict[str, int] = {}
+            port_rows: Dict[Tuple[int, int], str] = {}
+            finding_rows = []
+            for a in assessments:
+                ip = a["ip"]
+                host = host_ids.get(ip)
+                if host is None:
+                    host = host_ids[ip] = self._host_id(ip, a.get("context", {}).get("network_segment"))
+                risk = a.get("true_risk", a.get("initial_risk"))
+                for port in a.get("open_ports", []):
+                    # Several assessments may cover one port; keep the most severe, as the baseline index does
+                    previous = port_rows.get((host, port))
+                    if previous is None or _severity(risk) > _severity(previous):
+                        port_rows[(host, port)] = risk
+                finding_rows.append((
+                    run, host, json.dumps(a.get("open_ports", [])), a.get("initial_risk"), risk,
+                    a.get("risk_score", 0), int(bool(a.get("risk_adjusted"))), a.get("adjustment_reason"),
+                    a.get("verification"), a.get("reliability"), a.get("timestamp"),
+                ))
+
+            self.conn.executemany(
+                "INSERT INTO ports (run, host, port, risk) VALUES (?, ?, ?, ?)",
+                ((run, host, port, risk) for (host, port), risk in port_rows.items()))
+            self.conn.executemany(
+                "INSERT INTO findings (run, host, ports, initial_risk, true_risk, risk_score, risk_adjusted, "
+                "adjustment_reason, verification, reliability, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                finding_rows)
+            self.conn.execute("UPDATE runs SET host_count = ?, finding_count = ? WHERE id = ?",
+                              (len(host_ids), len(finding_rows), run))
+
+        logger.info(f"Recorded run {run_id}: {len(host_ids)} hosts, {len(finding_rows)} findings")
+        return run
+
+    def _host_id(self, ip: str, segment: Optional[str]) -> int:
+        row = self.conn.execute("SELECT id FROM hosts WHERE ip = ?", (ip,)).fetchone()
+        if row:
+            if segment:
+                self.conn.execute("UPDATE hosts SET segment = ? WHERE id = ? AND segment IS NOT ?",
+                                  (segment, row["id"], segment))
+            return row["id"]
+        return self.conn.execute("INSERT INTO hosts (ip, ip_int, segment) VALUES (?, ?, ?)",
+                                 (ip, _ip_int(ip), segment)).lastrowid
+
+    def _delete_run(self, run: int) -> None:
+        self.conn.execute("DELETE FROM ports WHERE run = ?", (run,))
+        self.conn.execute("DELETE FROM findings WHERE run = ?", (run,))
+        self.conn.execute("DELETE FROM runs WHERE id = ?", (run,))
+
+    # ======================================================
+    # Queries
+    # ======================================================
+
+    def _scope(self, cidr: Optional[str], params: List) -> str:
+        if not cidr:
+            return ""
+        params.extend(_cidr_bounds(cidr))
+        return " AND h.ip_int BETWEEN ? AND ?"
+
+    def runs(self) -> List[Dict]:
+        """All runs, oldest first."""
+        rows = self.conn.execute("SELECT * FROM runs ORDER BY started_at, id").fetchall()
+        return [dict(row) for row in rows]
+
+    def first_open(self, port: int, cidr: Optional[str] = None) -> Optional[Dict]:
+        """Earliest run in which `port` was open (optionally within `cidr`), and on which host.
+
+        Runs are ordered by start time, not by insertion, so re-recorded or backfilled runs count from when they ran.
+        """
+        params: List = [port]
+        row = self.conn.execute(
+            "SELECT h.ip, r.run_id, r.started_at, p.risk FROM ports p "
+            "JOIN hosts h ON h.id = p.host JOIN runs r ON r.id = p.run "
+            "WHERE p.port = ?" + self._scope(cidr, params) + " ORDER BY r.started_at, r.id, h.ip_int, h.ip LIMIT 1",
+            params).fetchone()
+        return dict(row) if row else None
+
+    def open_ports(self, run_id: Optional[str] = None, port: Optional[int] = None,
+                   risk: Optional[str] = None, cidr: Optional[str] = None) -> List[Dict]:
+        """Open (ip, port, risk) rows of one run (the latest by default), optionally filtered."""
+        run = self._run_key(run_id)
+        if run is None:
+            return []
+        params: List = [run]
+        sql = ("SELECT h.ip, p.port, p.risk FROM ports p JOIN hosts h ON h.id = p.host WHERE p.run = ?")
+        if port is not None:
+            sql += " AND p.port = ?"
+            params.append(port)
+        if risk is not None:
+            sql += " AND p.risk = ?"
+            params.append(risk)
+        sql += self._scope(cidr, params) + " ORDER BY h.ip_int, h.ip, p.port"
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def port_trend(self, port: Optional[int] = None, risk: Optional[str] = None,
+                   cidr: Optional[str] = None) -> List[Dict]:
+        """Per run: number of open (host, port) pairs matching the filters."""
+        params: List = []
+        conditions = ""
+        if port is not None:
+            conditions += " AND p.port = ?"
+            params.append(port)
+        if risk is not None:
+            conditions += " AND p.risk = ?"
+            params.append(risk)
+        conditions += self._scope(cidr, params)
+        rows = self.conn.execute(
+            "SELECT r.run_id, r.started_at, "
+            "(SELECT COUNT(*) FROM ports p JOIN hosts h ON h.id = p.host WHERE p.run = r.id" + conditions + ") "
+            "AS open_count FROM runs r ORDER BY r.started_at, r.id", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def host_history(self, ip: str) -> List[Dict]:
+        """Open ports and risks of one host in every run, oldest first (empty list when closed)."""
+        host = self.conn.execute("SELECT id FROM hosts WHERE ip = ?", (ip,)).fetchone()
+        history = [{"run_id": r["run_id"], "started_at": r["started_at"], "ports": {}} for r in self.runs()]
+        if host is None:
+            return history
+        by_run = {entry["run_id"]: entry for entry in history}
+        for row in self.conn.execute(
+                "SELECT r.run_id, p.port, p.risk FROM ports p JOIN runs r ON r.id = p.run "
+                "WHERE p.host = ? ORDER BY p.run, p.port", (host["id"],)):
+            by_run[row["run_id"]]["ports"][row["port"]] = row["risk"]
+        return history
+
+    def _run_key(self, run_id: Optional[str]) -> Optional[int]:
+        if run_id is None:
+            row = self.conn.execute("SELECT id FROM runs ORDER BY started_at DESC, id DESC LIMIT 1").fetchone()
+        else:
+            row = self.conn.execute("SELECT id FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return row["id"] if row else None
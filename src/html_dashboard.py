@@ -0,0 +1,327 @@
+﻿"""
+Self-contained HTML dashboard.
+All findings are embedded as compact columnar JSON and shown in a client-side virtualised table,
+so one file scales to hundreds of thousands of findings without a huge DOM.
+"""
+
+import heapq
+import html
+import json
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .risk_engine import RISK_LEVELS
+except ImportError:
+    from risk_engine import RISK_LEVELS
+
+Row = Tuple[str, str, str, int, str, bool]  # ip, ports, true_risk, score, segment, adjusted
+
+_CHUNK = 2000  # Rows per json.dumps call when writing the data block
+RISK_COLORS = {"CRITICAL": "#d9363e", "HIGH": "#f08c00", "MEDIUM": "#f5c518", "LOW": "#37b24d"}
+
+
+def dashboard_rows(assessments: Iterable[Dict]) -> Iterator[Row]:
+    """Table rows; read straight from the columns of a FindingStore."""
+    if hasattr(assessments, "port_offsets"):
+        store = assessments
+        labels, segments = store.risk_labels, store.segments
+        for row in range(len(store)):
+            yield (store.ip_of(row), ";".join(map(str, store.ports_of(row))), labels[store.true_risk[row]],
+                   store.risk_score[row], segments[store.segment[row]], bool(store.adjusted[row]))
+        return
+    for a in assessments:
+        yield (str(a.get("ip")), ";".join(map(str, a.get("open_ports", []))), a.get("true_risk") or "",
+               a.get("risk_score", 0), (a.get("context") or {}).get("network_segment") or "",
+               bool(a.get("risk_adjusted")))
+
+
+def _json_for_script(obj) -> str:
+    # "</" would end the <script> element early
+    return json.dumps(obj, separators=(",", ":")).replace("</", "<\\/")
+
+
+def _bar(width: float, color: str, title: str) -> str:
+    return f'<span class="bar" style="width:{width:.2f}%;background:{color}" title="{html.escape(title)}"></span>'
+
+
+def render_charts(by_segment: Dict[str, Dict[str, int]], port_counts: Dict[str, int]) -> str:
+    """Pre-aggregated charts as plain HTML/CSS bars (no chart library needed)."""
+    parts = ['<div class="charts"><div class="chart"><h3>Risk by segment</h3>']
+    widest = max((sum(c.values()) for c in by_segment.values()), default=0) or 1
+    for segment, counts in sorted(by_segment.items(), key=lambda x: -sum(x[1].values())):
+        bars = "".join(_bar(100.0 * counts[r] / widest, RISK_COLORS[r], f"{r}: {counts[r]}")
+                       for r in reversed(RISK_LEVELS) if counts.get(r))
+        parts.append(f'<div class="chart-row"><span class="label">{html.escape(segment)}</span>'
+                     f'<span class="track">{bars}</span><span class="value">{sum(counts.values())}</span></div>')
+    parts.append('</div><div class="chart"><h3>Open ports by frequency</h3>')
+    top_ports = sorted(port_counts.items(), key=lambda x: (-x[1], int(x[0])))[:15]
+    peak = top_ports[0][1] if top_ports else 1
+    for port, count in top_ports:
+        parts.append(f'<div class="chart-row"><span class="label">{port}</span>'
+                     f'<span class="track">{_bar(100.0 * count / peak, "#4c6ef5", f"{port}: {count}")}</span>'
+                     f'<span class="value">{count}</span></div>')
+    parts.append("</div></div>")
+    return "".join(parts)
+
+
+class DashboardWriter:
+    """Incremental dashboard writer with the same write()/close() interface as the streaming writers.
+
+    Rows are embedded as [ip, ports, risk id, score, segment id, adjusted]
+    with risk and segment labels interned, and aggregated for the charts as
+    they arrive. The `top_n` highest-scoring findings are kept for a static
+    fallback table (rendered with `render_row`) shown when scripts are off.
+    """
+
+    suffix = ".html"
+
+    def __init__(self, path, metadata: Dict, summary: Dict,
+                 render_row: Optional[Callable[[Dict], str]] = None, top_n: int = 20):
+        self.path = Path(path)
+        self.render_row = render_row
+        self.top_n = top_n
+        self.count = 0
+        self.closed = False
+        self._segments: Dict[str, int] = {}
+        self._risks = {label: i for i, label in enumerate(RISK_LEVELS)}
+        self._by_segment: Dict[str, Dict[str, int]] = {}
+        self._port_counts: Dict[str, int] = {}
+        self._chunk: List[list] = []
+        self._top: List[Tuple[int, int, Dict]] = []
+
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write(_HEAD.format(
+            report_id=html.escape(str(metadata.get("report_id", ""))),
+            generated=html.escape(str(metadata.get("generated_at", ""))),
+            total_hosts=summary.get("total_hosts", 0),
+            total_ports=summary.get("total_open_ports", 0),
+            critical=summary.get("critical_hosts", 0),
+            high=summary.get("high_hosts", 0),
+        ))
+        self._file.write('<script type="application/json" id="findings-data">{"rows":[')
+
+    def write(self, assessment: Dict) -> None:
+        row = next(dashboard_rows([assessment]))
+        if self.render_row is not None:
+            # Min-heap of the best top_n; ties keep the earliest finding, like a stable sort
+            entry = (row[3], -self.count, assessment)
+            if len(self._top) < self.top_n:
+                heapq.heappush(self._top, entry)
+            elif entry[:2] > self._top[0][:2]:
+                heapq.heapreplace(self._top, entry)
+        self.write_row(row)
+
+    def write_row(self, row: Row) -> None:
+        ip, ports, risk, score, segment, adjusted = row
+        risk_id = self._risks.setdefault(risk, len(self._risks))
+        segment_id = self._segments.setdefault(segment, len(self._segments))
+        counts = self._by_segment.setdefault(segment, {})
+        counts[risk] = counts.get(risk, 0) + 1
+        for port in ports.split(";") if ports else ():
+            self._port_counts[port] = self._port_counts.get(port, 0) + 1
+        self._chunk.append([ip, ports, risk_id, score, segment_id, 1 if adjusted else 0])
+        self.count += 1
+        if len(self._chunk) >= _CHUNK:
+            self._flush_rows()
+
+    def _flush_rows(self) -> None:
+        if self._chunk:
+            first = self.count == len(self._chunk)
+            self._file.write(("" if first else ",") + _json_for_script(self._chunk)[1:-1])
+            self._chunk = []
+
+    def abort(self) -> None:
+        """Close without finishing and delete the partial page."""
+        if not self.closed:
+            self._file.close()
+            self.closed = True
+            self.path.unlink(missing_ok=True)
+
+    def close(self, metadata: Optional[Dict] = None, fallback_rows: Optional[str] = None) -> Path:
+        if self.closed:
+            return self.path
+        self._flush_rows()
+        self._file.write('],"risks":' + _json_for_script(list(self._risks)) + ',"segments":' +
+                         _json_for_script(list(self._segments)) + "}</script>\n")
+        self._file.write(render_charts(self._by_segment, self._port_counts))
+        if fallback_rows is None:
+            top = [a for _, _, a in sorted(self._top, key=lambda e: e[:2], reverse=True)]
+            fallback_rows = "\n".join(self.render_row(a) for a in top) if self.render_row else ""
+        self._file.write(_TABLE.format(
+            risk_options="".join(f'<option value="{i}">{html.escape(r)}</option>' for r, i in self._risks.items()),
+            segment_options="".join(f'<option value="{i}">{html.escape(s)}</option>'
+                                    for s, i in self._segments.items()),
+            fallback_rows=fallback_rows,
+        ))
+        self._file.close()
+        self.closed = True
+        return self.path
+
+
+def write_dashboard(path, metadata: Dict, summary: Dict, assessments: Iterable[Dict],
+                    fallback_rows: str = "") -> None:
+    """Write the dashboard for a complete set of findings in one call."""
+    writer = DashboardWriter(path, metadata, summary)
+    # Rows come straight from the columns when `assessments` is a FindingStore
+    for row in dashboard_rows(assessments):
+        writer.write_row(row)
+    writer.close(fallback_rows=fallback_rows)
+
+
+_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<title>SentinelSweep-SOC Report</title>
+<style>
+body {{ font-family: Arial; background:#f4f6f8; padding:40px; }}
+.container {{ background:white; padding:30px; border-radius:12px; }}
+table {{ width:100%; border-collapse: collapse; margin-top:20px; }}
+th, td {{ padding:10px; border-bottom:1px solid #ddd; }}
+th {{ background:#f0f0f0; text-align:left; }}
+.badge {{ padding:4px 8px; border-radius:6px; font-weight:bold; }}
+.critical {{ background:#fdd; }}
+.high {{ background:#ffe4cc; }}
+.medium {{ background:#fff4cc; }}
+.low {{ background:#d4f8d4; }}
+.charts {{ display:flex; gap:40px; flex-wrap:wrap; }}
+.chart {{ flex:1; min-width:320px; }}
+.chart-row {{ display:flex; align-items:center; gap:8px; margin:4px 0; font-size:13px; }}
+.chart-row .label {{ width:140px; overflow:hidden; text-overflow:ellipsis; white-space:nowrap; }}
+.chart-row .track {{ flex:1; display:flex; height:14px; background:#f0f0f0; border-radius:3px; overflow:hidden; }}
+.chart-row .value {{ width:60px; text-align:right; }}
+.bar {{ display:block; height:100%; }}
+.controls {{ display:flex; gap:10px; margin:20px 0 10px; align-items:center; }}
+.grid {{ display:grid; grid-template-columns: 2fr 2fr 1fr 1fr 2fr 1fr; align-items:center; }}
+.grid > div {{ padding:0 10px; overflow:hidden; text-overflow:ellipsis; white-space:nowrap; }}
+.head {{ background:#f0f0f0; font-weight:bold; height:36px; cursor:pointer; user-select:none; }}
+.viewport {{ height:600px; overflow-y:auto; position:relative; border:1px solid #ddd; }}
+.spacer {{ position:relative; }}
+.rows {{ position:absolute; top:0; left:0; right:0; will-change:transform; }}
+.rows .grid {{ height:28px; border-bottom:1px solid #eee; font-size:13px; }}
+</style>
+</head>
+<body>
+<div class="container">
+<h1>SentinelSweep-SOC</h1>
+<p><strong>Report ID:</strong> {report_id}</p>
+<p><strong>Generated:</strong> {generated}</p>
+
+<h2>Summary</h2>
+<ul>
+<li>Total Hosts: {total_hosts}</li>
+<li>Total Open Ports: {total_ports}</li>
+<li>Critical: {critical}</li>
+<li>High: {high}</li>
+</ul>
+"""
+
+_TABLE = """
+<h2>Findings</h2>
+<noscript>
+<table>
+<tr><th>IP</th><th>Ports</th><th>Final Risk</th><th>Score</th><th>Segment</th></tr>
+{fallback_rows}
+</table>
+</noscript>
+<div class="controls">
+<input id="search" type="search" placeholder="Filter IP or port" size="28">
+<select id="risk"><option value="">All risks</option>{risk_options}</select>
+<select id="segment"><option value="">All segments</option>{segment_options}</select>
+<span id="count"></span>
+</div>
+<div class="grid head" id="header">
+<div data-col="0">IP</div><div data-col="1">Ports</div><div data-col="2">Final Risk</div>
+<div data-col="3">Score</div><div data-col="4">Segment</div><div data-col="5">Adjusted</div>
+</div>
+<div class="viewport" id="viewport"><div class="spacer" id="spacer"><div class="rows" id="rows"></div></div></div>
+</div>
+<script>
+(function () {{
+  var data = JSON.parse(document.getElementById("findings-data").textContent);
+  var rows = data.rows, RISKS = data.risks, SEGMENTS = data.segments;
+  var SEVERITY = {{LOW: 0, MEDIUM: 1, HIGH: 2, CRITICAL: 3}};
+  var ROW_H = 28, OVERSCAN = 12;
+  var viewport = document.getElementById("viewport"), spacer = document.getElementById("spacer"),
+      body = document.getElementById("rows"), count = document.getElementById("count"),
+      search = document.getElementById("search"), riskSel = document.getElementById("risk"),
+      segSel = document.getElementById("segment");
+  var view = [], sortCol = 3, sortDir = -1, frame = 0, timer = 0;
+
+  function esc(s) {{
+    return String(s).replace(/[&<>"]/g, function (c) {{
+      return {{"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"}}[c];
+    }});
+  }}
+  function ipKey(ip) {{
+    if (ip.indexOf(":") >= 0) return 4294967296 + ip.length;
+    var p = ip.split("."); return ((+p[0] * 256 + +p[1]) * 256 + +p[2]) * 256 + +p[3];
+  }}
+  function key(row) {{
+    switch (sortCol) {{
+      case 0: return ipKey(row[0]);
+      case 1: return row[1];
+      case 2: return SEVERITY[RISKS[row[2]]] !== undefined ? SEVERITY[RISKS[row[2]]] : -1;
+      case 4: return SEGMENTS[row[4]];
+      default: return row[sortCol];
+    }}
+  }}
+  function applySort() {{
+    var keys = new Array(rows.length);
+    for (var i = 0; i < view.length; i++) keys[view[i]] = key(rows[view[i]]);
+    view.sort(function (a, b) {{
+      var x = keys[a], y = keys[b];
+      return x < y ? -sortDir : x > y ? sortDir : a - b;
+    }});
+    viewport.scrollTop = 0;
+    render();
+  }}
+  function applyFilter() {{
+    var q = search.value.trim().toLowerCase(), r = riskSel.value, s = segSel.value, out = [];
+    for (var i = 0; i < rows.length; i++) {{
+      var row = rows[i];
+      if (r !== "" && row[2] !== +r) continue;
+      if (s !== "" && row[4] !== +s) continue;
+      if (q && row[0].indexOf(q) < 0 && row[1].indexOf(q) < 0) continue;
+      out.push(i);
+    }}
+    view = out;
+    applySort();
+  }}
+  function render() {{
+    frame = 0;
+    var total = view.length;
+    spacer.style.height = (total * ROW_H) + "px";
+    var start = Math.max(0, Math.floor(viewport.scrollTop / ROW_H) - OVERSCAN);
+    var end = Math.min(total, start + Math.ceil(viewport.clientHeight / ROW_H) + 2 * OVERSCAN);
+    var out = [];
+    for (var i = start; i < end; i++) {{
+      var row = rows[view[i]], risk = RISKS[row[2]];
+      out.push('<div class="grid"><div>' + esc(row[0]) + "</div><div>" + esc(row[1]) +
+        '</div><div><span class="badge ' + esc(risk.toLowerCase()) + '">' + esc(risk) + "</span></div><div>" +
+        row[3] + "</div><div>" + esc(SEGMENTS[row[4]]) + "</div><div>" + (row[5] ? "yes" : "") + "</div></div>");
+    }}
+    body.style.transform = "translateY(" + (start * ROW_H) + "px)";
+    body.innerHTML = out.join("");
+    count.textContent = total + " of " + rows.length + " findings";
+  }}
+
+  viewport.addEventListener("scroll", function () {{ if (!frame) frame = requestAnimationFrame(render); }});
+  search.addEventListener("input", function () {{ clearTimeout(timer); timer = setTimeout(applyFilter, 150); }});
+  riskSel.addEventListener("change", applyFilter);
+  segSel.addEventListener("change", applyFilter);
+  document.getElementById("header").addEventListener("click", function (e) {{
+    var col = e.target.getAttribute("data-col");
+    if (col === null) return;
+    col = +col;
+    sortDir = col === sortCol ? -sortDir : (col === 3 || col === 2 ? -1 : 1);
+    sortCol = col;
+    applySort();
+  }});
+  applyFilter();
+}})();
+</script>
+</body>
+</html>
+"""
@@ -2,20 +2,36 @@
 Clean Main File - Just Works Version
 """
 
+import argparse
 import os
 import sys
 from dotenv import load_dotenv
 
 from banner import display_banner
-from scanner import DefenderSafeScanner
+from async_scanner import AsyncScanner
+from rate_limiter import ProbePacer
+from rtt import RTTEstimator
 from risk_engine import SOCRiskEngine
-from triage_engine import TriageEngine
+from async_triage import AsyncTriageEngine
 from reporter import SOCReporter
+from history import ScanHistory
+from pipeline import SweepPipeline
+from finding_store import FindingStore
+from siem_forwarder import create_forwarder
+from alerts import create_alert_channel
+from checkpoint import open_checkpoint
+from discovery import HostDiscovery
+from scheduler import probe_passes
+from sharding import ShardedSweep, scanner_options, shard_count
 
 from rich.console import Console
 
 def main():
     console = Console()
+    parser = argparse.ArgumentParser(description="SentinelSweep-SOC network exposure sweep")
+    parser.add_argument('--resume', metavar='RUN_ID',
+                        help="continue an interrupted run (e.g. sentinel_20260101_020000) from its checkpoint")
+    args = parser.parse_args()
     
     # Display compliance banner
     if not display_banner():
@@ -37,47 +53,132 @@ def main():
         sys.exit(1)
     
     # Initialize components
-    scanner = DefenderSafeScanner()
+    pacer = ProbePacer(
+        rate=float(os.getenv('SCAN_RATE', '0')),
+        host_rate=float(os.getenv('HOST_RATE', '4')),
+        subnet_rate=float(os.getenv('SUBNET_RATE', '0'))
+    )
+    timeout = float(os.getenv('TIMEOUT', '1.5'))
+    rtt = None
+    if os.getenv('ADAPTIVE_TIMEOUT', 'true').lower() == 'true':
+        rtt = RTTEstimator(min_timeout=min(float(os.getenv('TIMEOUT_MIN', '0.05')), timeout), max_timeout=timeout)
+    scanner = AsyncScanner(
+        timeout=timeout,
+        max_concurrency=int(os.getenv('MAX_CONCURRENCY', '2000')),
+        pacer=pacer,
+        rtt=rtt
+    )
     risk_engine = SOCRiskEngine()
-    triage_engine = TriageEngine()
-    reporter = SOCReporter()
+    triage_concurrency = int(os.getenv('TRIAGE_CONCURRENCY', '500'))
+    triage_engine = AsyncTriageEngine(max_concurrency=triage_concurrency)
+    discovery_ports = None
+    if os.getenv('DISCOVERY', 'false').lower() == 'true':
+        # Only addresses that answer a TCP ping on one of these ports get the full port scan
+        discovery_ports = list(map(int, os.getenv('DISCOVERY_PORTS', '445,80,443,22,3389').split(',')))
+    history_db = os.getenv('HISTORY_DB')
+    reporter = SOCReporter(history=ScanHistory(history_db) if history_db else None,
+                            formats=os.getenv('REPORT_FORMAT'),
+                            compression=os.getenv('REPORT_COMPRESSION'))
     
-    # Get target hosts (limit to 5 for testing)
-    targets = scanner.validate_cidr(NETWORK_CIDR)[:5]
+    # Sweep the ports in passes by risk weight (SMB and RDP on every host first) rather than host by host
+    passes = None
+    if os.getenv('PORT_PRIORITY', 'true').lower() == 'true':
+        passes = probe_passes(PORTS, risk_engine.risk_scores)
+
+    # Progress is checkpointed so an interrupted run can continue with --resume <run-id>
+    try:
+        checkpoint = open_checkpoint(os.getenv('CHECKPOINT_DIR', 'reports/checkpoints'), args.resume,
+                                     reporter.timestamp, NETWORK_CIDR, PORTS,
+                                     exclude=os.getenv('EXCLUDE_TARGETS'),
+                                     shuffle=os.getenv('SHUFFLE_TARGETS', 'true').lower() == 'true',
+                                     interval=float(os.getenv('CHECKPOINT_INTERVAL', '30')),
+                                     passes=passes)
+    except FileNotFoundError:
+        console.print(f"[red]No checkpoint found for {args.resume}[/red]")
+        sys.exit(1)
+    reporter.timestamp = checkpoint.timestamp
+    reporter.started_at = checkpoint.created_at  # History records when the run began, even when resumed
+    PORTS = checkpoint.ports
+    targets = checkpoint.targets(scanner)
     
     if not targets:
+        checkpoint.finish()
         console.print("[red]No valid targets found.[/red]")
         sys.exit(1)
     
-    console.print(f"[green]Testing with {len(targets)} hosts[/green]")
+    console.print(f"[green]Sweeping {len(targets)} hosts x {len(PORTS)} ports[/green]")
     
-    assessments = []
+    # JSON/NDJSON reports are written while the sweep runs
+    report_stream = reporter.open_stream()
+    store = FindingStore()
+    if args.resume:
+        restored = checkpoint.restore(store)
+        report_stream.write_all(store)
+        console.print(f"[cyan]Resuming {checkpoint.run_id} at host {checkpoint.next_host}/{len(targets)} "
+                      f"with {restored} findings[/cyan]")
     
-    # Simple scan loop
-    for host in targets:
-        console.print(f"[dim]Checking {host}...[/dim]")
-        
-        # For demo, just check a few common ports
-        open_ports = []
-        for port in PORTS:
-            # Simple port check
-            if scanner.scan_host(host, [port], delay=0.1):
-                open_ports.append(port)
-                
-                # Triage the service
-                triage_data = triage_engine.triage_service(host, port)
-                assessment = risk_engine.assess_exposure(host, [port], triage_data)
-                assessments.append(assessment)
-                
-                # Show finding
-                risk = assessment['true_risk']
-                if risk in ['HIGH', 'CRITICAL']:
-                    console.print(f"[red]  ! {host}:{port} -> {risk}[/red]")
-                elif risk == 'MEDIUM':
-                    console.print(f"[yellow]  • {host}:{port} -> {risk}[/yellow]")
-        
-        if not open_ports:
-            console.print(f"[dim]  No open ports[/dim]")
+    # Findings are also shipped to the SIEM as they arrive (SIEM_ENABLED=true)
+    siem = None
+    if os.getenv('SIEM_ENABLED', 'false').lower() == 'true':
+        siem = create_forwarder(os.getenv('SIEM_TYPE', 'elastic'), os.getenv('SIEM_ENDPOINT'),
+                                os.getenv('SIEM_API_KEY'), workspace_id=os.getenv('SIEM_WORKSPACE_ID'),
+                                batch_size=int(os.getenv('SIEM_BATCH_SIZE', '500')),
+                                spool_dir=os.getenv('SIEM_SPOOL_DIR', 'reports/spool'),
+                                queue_dir=os.getenv('SIEM_QUEUE_DIR'))
+
+    # HIGH/CRITICAL exposures go to the alert sinks as soon as they are found (ALERTS_ENABLED=true)
+    alerts = None
+    if os.getenv('ALERTS_ENABLED', 'false').lower() == 'true':
+        alerts = create_alert_channel(os.getenv('ALERT_SINKS', 'file'),
+                                      min_risk=os.getenv('ALERT_MIN_RISK', 'HIGH'),
+                                      webhook_url=os.getenv('ALERT_WEBHOOK_URL'),
+                                      syslog_address=os.getenv('ALERT_SYSLOG_ADDRESS'),
+                                      alert_file=os.getenv('ALERT_FILE'),
+                                      siem_options=dict(siem_type=os.getenv('SIEM_TYPE', 'elastic'),
+                                                        endpoint=os.getenv('SIEM_ENDPOINT'),
+                                                        api_key=os.getenv('SIEM_API_KEY'),
+                                                        workspace_id=os.getenv('SIEM_WORKSPACE_ID'),
+                                                        spool_dir=os.getenv('SIEM_SPOOL_DIR', 'reports/spool')))
+    
+    def show_finding(assessment):
+        report_stream.write(assessment)
+        if siem:
+            siem.write(assessment)
+        if alerts:
+            alerts.observe(assessment)
+        host, port = assessment['ip'], assessment['open_ports'][0]
+        risk = assessment['true_risk']
+        if risk in ['HIGH', 'CRITICAL']:
+            console.print(f"[red]  ! {host}:{port} -> {risk}[/red]")
+        elif risk == 'MEDIUM':
+            console.print(f"[yellow]  • {host}:{port} -> {risk}[/yellow]")
+    
+    processes = shard_count(int(os.getenv('SCAN_PROCESSES', '1')), checkpoint)
+    if processes > 1:
+        # Each process sweeps its own share of the /24s; findings are merged here
+        sweep = ShardedSweep(processes, checkpoint=checkpoint,
+                             **scanner_options(scanner, triage_concurrency, discovery_ports=discovery_ports))
+        assessments = sweep.run(store, on_finding=show_finding, on_restored=report_stream.write)
+    else:
+        pipeline = SweepPipeline(
+            scanner, risk_engine, triage_engine,
+            triage_workers=triage_concurrency,
+            on_finding=show_finding,
+            store=store,
+            checkpoint=checkpoint,
+            discovery=HostDiscovery(scanner, discovery_ports) if discovery_ports else None
+        )
+        assessments = pipeline.run(targets, PORTS)
+    checkpoint.close()
+    if siem:
+        siem_stats = siem.close()
+        console.print(f"[dim]SIEM: {siem_stats['events_sent']} events sent, "
+                      f"{siem_stats['events_spooled']} spooled for retry[/dim]")
+    if alerts:
+        alert_stats = alerts.close()
+        console.print(f"[dim]Alerts: {alert_stats['alerts']} raised "
+                      f"({alert_stats['correlated']} correlated), "
+                      f"{alert_stats['send_failures']} failed deliveries[/dim]")
     
     # Generate summary
     if assessments:
@@ -89,11 +190,16 @@ def main():
         
         # Generate reports
         try:
-            report_paths = reporter.generate_reports(assessments, summary)
+            report_paths = reporter.generate_reports(assessments, summary, stream=report_stream)
+            reporter.apply_retention(int(os.getenv('RETENTION_DAYS', '30')),
+                                     int(os.getenv('COMPACT_AFTER_DAYS', '7')))
+            checkpoint.finish()
             console.print(f"\n[green]Reports saved to /reports/[/green]")
         except Exception as e:
             console.print(f"[yellow]Note: Could not generate reports: {e}[/yellow]")
     else:
+        report_stream.close()
+        checkpoint.finish()
         console.print("\n[green]✅ No exposures found![/green]")
     
     console.print("\n[bold green]Scan complete![/bold green]")
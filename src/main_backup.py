@@ -3,19 +3,30 @@ SentinelSweep-SOC v2.0 Main Orchestrator
 SOC-grade defensive network exposure assessment with intelligent triage.
 """
 
+import argparse
 import os
 import sys
 import time
 from datetime import datetime
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Local imports
 from src.banner import display_banner
-from src.scanner import DefenderSafeScanner
+from src.async_scanner import AsyncScanner
+from src.rate_limiter import ProbePacer
+from src.rtt import RTTEstimator
 from src.risk_engine import SOCRiskEngine
 from src.reporter import SOCReporter
-from src.triage_engine import TriageEngine
+from src.history import ScanHistory
+from src.async_triage import AsyncTriageEngine
+from src.pipeline import SweepPipeline
+from src.finding_store import FindingStore
+from src.siem_forwarder import create_forwarder
+from src.alerts import create_alert_channel
+from src.checkpoint import open_checkpoint
+from src.discovery import HostDiscovery
+from src.scheduler import probe_passes
+from src.sharding import ShardedSweep, scanner_options, shard_count
 
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
@@ -27,6 +38,10 @@ def main():
     """Main execution flow."""
     
     console = Console()
+    parser = argparse.ArgumentParser(description="SentinelSweep-SOC network exposure sweep")
+    parser.add_argument('--resume', metavar='RUN_ID',
+                        help="continue an interrupted run (e.g. sentinel_20260101_020000) from its checkpoint")
+    args = parser.parse_args()
     
     # Display compliance banner
     if not display_banner():
@@ -39,13 +54,18 @@ def main():
         NETWORK_CIDR = os.getenv('NETWORK_CIDR', '192.168.1.0/24')
         PORTS = list(map(int, os.getenv('PORTS', '22,80,443,3389').split(',')))
         TIMEOUT = float(os.getenv('TIMEOUT', '1.5'))
-        DELAY = float(os.getenv('DELAY', '0.25'))
+        SCAN_RATE = float(os.getenv('SCAN_RATE', '0'))
+        HOST_RATE = float(os.getenv('HOST_RATE') or 1 / float(os.getenv('DELAY', '0.25')))
+        SUBNET_RATE = float(os.getenv('SUBNET_RATE', '0'))
         MAX_THREADS = int(os.getenv('MAX_THREADS', '50'))
+        MAX_CONCURRENCY = int(os.getenv('MAX_CONCURRENCY', '2000'))
+        TRIAGE_CONCURRENCY = int(os.getenv('TRIAGE_CONCURRENCY', '500'))
         
         console.print(f"[cyan]Configuration Loaded:[/cyan]")
         console.print(f"  Network: {NETWORK_CIDR}")
         console.print(f"  Ports: {PORTS}")
         console.print(f"  Max Threads: {MAX_THREADS}")
+        console.print(f"  Rate: {SCAN_RATE or 'unlimited'}/s global, {HOST_RATE}/s per host")
         console.print()
         
     except Exception as e:
@@ -53,26 +73,54 @@ def main():
         sys.exit(1)
     
     # Initialize components
-    scanner = DefenderSafeScanner(timeout=TIMEOUT, max_workers=MAX_THREADS)
+    pacer = ProbePacer(rate=SCAN_RATE, host_rate=HOST_RATE, subnet_rate=SUBNET_RATE)
+    rtt = None
+    if os.getenv('ADAPTIVE_TIMEOUT', 'true').lower() == 'true':
+        # Per-/24 timeouts from measured RTTs, between TIMEOUT_MIN and TIMEOUT
+        rtt = RTTEstimator(min_timeout=min(float(os.getenv('TIMEOUT_MIN', '0.05')), TIMEOUT), max_timeout=TIMEOUT)
+    scanner = AsyncScanner(timeout=TIMEOUT, max_concurrency=MAX_CONCURRENCY, pacer=pacer, rtt=rtt)
     risk_engine = SOCRiskEngine()
-    reporter = SOCReporter()
-    triage_engine = TriageEngine()  # Single instance for stats tracking
+    history_db = os.getenv('HISTORY_DB')
+    reporter = SOCReporter(history=ScanHistory(history_db) if history_db else None,
+                            formats=os.getenv('REPORT_FORMAT'),
+                            compression=os.getenv('REPORT_COMPRESSION'))
+    triage_engine = AsyncTriageEngine(max_concurrency=TRIAGE_CONCURRENCY)  # Single instance for stats tracking
+    discovery_ports = None
+    if os.getenv('DISCOVERY', 'false').lower() == 'true':
+        # Only addresses that answer a TCP ping on one of these ports get the full port scan
+        discovery_ports = list(map(int, os.getenv('DISCOVERY_PORTS', '445,80,443,22,3389').split(',')))
     
-    # Get target hosts
-    targets = scanner.validate_cidr(NETWORK_CIDR)
+    # Sweep the ports in passes by risk weight (SMB and RDP on every host first) rather than host by host
+    passes = None
+    if os.getenv('PORT_PRIORITY', 'true').lower() == 'true':
+        passes = probe_passes(PORTS, risk_engine.risk_scores)
+
+    # Progress is checkpointed so an interrupted run can continue with --resume <run-id>
+    try:
+        checkpoint = open_checkpoint(os.getenv('CHECKPOINT_DIR', 'reports/checkpoints'), args.resume,
+                                     reporter.timestamp, NETWORK_CIDR, PORTS,
+                                     exclude=os.getenv('EXCLUDE_TARGETS'),
+                                     shuffle=os.getenv('SHUFFLE_TARGETS', 'true').lower() == 'true',
+                                     interval=float(os.getenv('CHECKPOINT_INTERVAL', '30')),
+                                     passes=passes)
+    except FileNotFoundError:
+        console.print(f"[red]No checkpoint found for {args.resume}[/red]")
+        sys.exit(1)
+    reporter.timestamp = checkpoint.timestamp
+    reporter.started_at = checkpoint.created_at  # History records when the run began, even when resumed
+    PORTS = checkpoint.ports
+    
+    # Get target hosts, in the same order as the checkpointed run when resuming
+    targets = checkpoint.targets(scanner)
     
     if not targets:
+        checkpoint.finish()
         console.print("[red]No valid targets found. Check CIDR notation.[/red]")
         sys.exit(1)
     
     console.print(f"[green]Targets identified: {len(targets)} hosts[/green]")
-    console.print("[yellow]Note: Running in demo mode (first 10 hosts only)[/yellow]")
-    
-    # Limit targets for demo
-    demo_targets = targets[:10]
     
     # Perform scan with progress bar
-    assessments = []
     scan_start = time.time()
     
     with Progress(
@@ -83,87 +131,129 @@ def main():
         console=console
     ) as progress:
         
-        task = progress.add_task("[cyan]Scanning network...", total=len(demo_targets))
+        task = progress.add_task("[cyan]Scanning network...", total=len(targets) * len(PORTS),
+                                 completed=checkpoint.next_host * len(PORTS))
+        
+        # JSON/NDJSON reports are written while the sweep runs
+        report_stream = reporter.open_stream()
+        store = FindingStore()
+        if args.resume:
+            restored = checkpoint.restore(store)
+            report_stream.write_all(store)
+            progress.console.print(f"[cyan]Resuming {checkpoint.run_id} at host {checkpoint.next_host}/"
+                                   f"{len(targets)} with {restored} findings[/cyan]")
+        
+        # Findings are also shipped to the SIEM as they arrive (SIEM_ENABLED=true)
+        siem = None
+        if os.getenv('SIEM_ENABLED', 'false').lower() == 'true':
+            siem = create_forwarder(os.getenv('SIEM_TYPE', 'elastic'), os.getenv('SIEM_ENDPOINT'),
+                                    os.getenv('SIEM_API_KEY'), workspace_id=os.getenv('SIEM_WORKSPACE_ID'),
+                                    batch_size=int(os.getenv('SIEM_BATCH_SIZE', '500')),
+                                    spool_dir=os.getenv('SIEM_SPOOL_DIR', 'reports/spool'),
+                                    queue_dir=os.getenv('SIEM_QUEUE_DIR'))
+
+        # HIGH/CRITICAL exposures go to the alert sinks as soon as they are found (ALERTS_ENABLED=true)
+        alerts = None
+        if os.getenv('ALERTS_ENABLED', 'false').lower() == 'true':
+            alerts = create_alert_channel(os.getenv('ALERT_SINKS', 'file'),
+                                          min_risk=os.getenv('ALERT_MIN_RISK', 'HIGH'),
+                                          webhook_url=os.getenv('ALERT_WEBHOOK_URL'),
+                                          syslog_address=os.getenv('ALERT_SYSLOG_ADDRESS'),
+                                          alert_file=os.getenv('ALERT_FILE'),
+                                          siem_options=dict(siem_type=os.getenv('SIEM_TYPE', 'elastic'),
+                                                            endpoint=os.getenv('SIEM_ENDPOINT'),
+                                                            api_key=os.getenv('SIEM_API_KEY'),
+                                                            workspace_id=os.getenv('SIEM_WORKSPACE_ID'),
+                                                            spool_dir=os.getenv('SIEM_SPOOL_DIR', 'reports/spool')))
         
-        with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
-            future_to_host = {
-                executor.submit(scanner.scan_host, host, PORTS, DELAY): host 
-                for host in demo_targets
-            }
+        def show_finding(assessment):
+            report_stream.write(assessment)
+            if siem:
+                siem.write(assessment)
+            if alerts:
+                alerts.observe(assessment)
+            host, port = assessment['ip'], assessment['open_ports'][0]
             
-            for future in as_completed(future_to_host):
-                host = future_to_host[future]
-                
-                try:
-                    open_ports = future.result(timeout=TIMEOUT * len(PORTS) + 5)
-                    
-                    if open_ports:
-                        host_assessments = []
-                        
-                        # Triage each open port individually
-                        for port in open_ports:
-                            # Only perform deep triage on critical ports
-                            if port in [22, 3389, 445, 21, 23, 80, 443]:
-                                triage_data = triage_engine.triage_service(host, port)
-                                assessment = risk_engine.assess_exposure(host, [port], triage_data)
-                                
-                                # Color-coded display based on risk
-                                risk_level = assessment['true_risk']
-                                risk_color = {
-                                    'CRITICAL': 'bright_red',
-                                    'HIGH': 'red',
-                                    'MEDIUM': 'yellow',
-                                    'LOW': 'green'
-                                }.get(risk_level, 'white')
-                                
-                                service_name = triage_data.get('service_guess', f'Port-{port}')
-                                reason = assessment.get('adjustment_reason', '')
-                                
-                                # Show only MEDIUM and HIGH risks (LOW is usually OK)
-                                if risk_level in ['MEDIUM', 'HIGH', 'CRITICAL']:
-                                    icon = '⚠️ ' if risk_level in ['HIGH', 'CRITICAL'] else '•'
-                                    progress.console.print(
-                                        f"[{risk_color}]{icon} {host}:{port} ({service_name}) -> {risk_level}[/{risk_color}]"
-                                    )
-                                    if reason and risk_level != 'CRITICAL':
-                                        progress.console.print(f"    [dim]{reason}[/dim]")
-                                
-                            else:
-                                # Quick assessment for non-critical ports
-                                assessment = risk_engine.assess_exposure(host, [port])
-                            
-                            host_assessments.append(assessment)
-                        
-                        # Add all assessments to main list
-                        assessments.extend(host_assessments)
-                        
-                        # Show summary for host
-                        if host_assessments:
-                            critical_count = sum(1 for a in host_assessments if a['true_risk'] in ['CRITICAL', 'HIGH'])
-                            if critical_count > 0:
-                                progress.console.print(f"[dim]  Found {critical_count} high-risk services on {host}[/dim]")
-                    
-                    else:
-                        # Host with no open ports
-                        progress.console.print(f"[dim]  {host}: No open ports found[/dim]")
-                
-                except Exception as e:
-                    progress.console.print(f"[yellow]Warning scanning {host}: {e}[/yellow]")
-                
-                progress.update(task, advance=1)
+            # Color-coded display based on risk
+            risk_level = assessment['true_risk']
+            risk_color = {
+                'CRITICAL': 'bright_red',
+                'HIGH': 'red',
+                'MEDIUM': 'yellow',
+                'LOW': 'green'
+            }.get(risk_level, 'white')
+            
+            mitre = assessment['context']['mitre_findings']
+            service_name = mitre[0]['service'] if mitre else f'Port-{port}'
+            reason = assessment.get('adjustment_reason', '')
+            
+            # Show only MEDIUM and HIGH risks (LOW is usually OK)
+            if risk_level in ['MEDIUM', 'HIGH', 'CRITICAL']:
+                icon = '⚠️ ' if risk_level in ['HIGH', 'CRITICAL'] else '•'
+                progress.console.print(
+                    f"[{risk_color}]{icon} {host}:{port} ({service_name}) -> {risk_level}[/{risk_color}]"
+                )
+                if reason and risk_level != 'CRITICAL':
+                    progress.console.print(f"    [dim]{reason}[/dim]")
+        
+        # Only perform deep triage on critical ports
+        triage_ports = {22, 3389, 445, 21, 23, 80, 443}
+        sweep = None
+        processes = shard_count(int(os.getenv('SCAN_PROCESSES', '1')), checkpoint)
+        if processes > 1:
+            # Each process sweeps its own share of the /24s; findings are merged here
+            sweep = ShardedSweep(processes, checkpoint=checkpoint,
+                                 **scanner_options(scanner, TRIAGE_CONCURRENCY, triage_ports, discovery_ports))
+            assessments = sweep.run(store, on_finding=show_finding, on_restored=report_stream.write,
+                                    on_progress=lambda probes: progress.update(task, advance=probes))
+        else:
+            pipeline = SweepPipeline(
+                scanner, risk_engine, triage_engine,
+                triage_workers=TRIAGE_CONCURRENCY,
+                triage_ports=triage_ports,
+                on_finding=show_finding,
+                store=store,
+                checkpoint=checkpoint,
+                discovery=HostDiscovery(scanner, discovery_ports) if discovery_ports else None,
+                on_probe=lambda host, port, is_open: progress.update(task, advance=1)
+            )
+            assessments = pipeline.run(targets, PORTS)
+        checkpoint.close()
+        if siem:
+            siem_stats = siem.close()
+            progress.console.print(f"[dim]SIEM: {siem_stats['events_sent']} events sent, "
+                                   f"{siem_stats['events_spooled']} spooled for retry[/dim]")
+        if alerts:
+            alert_stats = alerts.close()
+            progress.console.print(f"[dim]Alerts: {alert_stats['alerts']} raised "
+                                   f"({alert_stats['correlated']} correlated), "
+                                   f"{alert_stats['send_failures']} failed deliveries[/dim]")
     
     scan_duration = time.time() - scan_start
     
     # Show triage statistics
-    triage_stats = triage_engine.get_stats()
+    triage_stats = sweep.triage_stats if sweep else triage_engine.get_stats()
+    timeouts = "fixed"
+    if rtt:
+        rtt_stats = sweep.get_stats() if sweep else rtt.get_stats()
+        timeouts = (f"adaptive, median {rtt_stats['median_deadline'] or TIMEOUT}s "
+                    f"({rtt_stats['retransmits']} retransmits)")
+    discovery = "off"
+    if discovery_ports:
+        sweep_stats = sweep.get_stats() if sweep else pipeline.get_stats()
+        discovery = (f"{sweep_stats['hosts_alive']} live, {sweep_stats['hosts_dead']} skipped "
+                     f"({sweep_stats['probes_skipped']} probes saved)")
     console.print()
     console.print(Panel.fit(
         f"[bold]Scan Complete[/bold]\n"
         f"Duration: {scan_duration:.1f}s\n"
-        f"Hosts scanned: {len(demo_targets)}\n"
+        f"Hosts scanned: {len(targets)}\n"
         f"Services triaged: {triage_stats['services_triaged']}\n"
         f"Banners grabbed: {triage_stats['banners_grabbed']}\n"
-        f"Risks adjusted: {triage_stats['risks_adjusted']}",
+        f"Protocol probes: {triage_stats['protocol_probes']} ({triage_stats['probe_failures']} failed)\n"
+        f"Risks adjusted: {triage_stats['risks_adjusted']}\n"
+        f"Timeouts: {timeouts}\n"
+        f"Discovery: {discovery}",
         title="Performance Summary",
         border_style="green"
     ))
@@ -185,12 +275,14 @@ def main():
         
         # Generate reports
         try:
-            report_paths = reporter.generate_reports(assessments, summary)
+            report_paths = reporter.generate_reports(assessments, summary, stream=report_stream)
             
             console.print("\n[bold green]📊 Reports Generated:[/bold green]")
             for format_name, path in report_paths.items():
                 if format_name != 'metadata':
                     console.print(f"  • {format_name.upper()}: {path}")
+            timings = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in reporter.timings.items())
+            console.print(f"  [dim]Writer time: {timings}[/dim]")
             
             # Check for drift
             drift_result = reporter.detect_drift(assessments)
@@ -199,12 +291,26 @@ def main():
                     Panel.fit(
                         f"[yellow]⚠️  DRIFT DETECTED[/yellow]\n"
                         f"Network configuration has changed since baseline.\n"
-                        f"Baseline: {drift_result['baseline_time']}",
+                        f"Baseline: {drift_result['baseline_time']}\n"
+                        f"New hosts: {len(drift_result['new_hosts'])}, "
+                        f"removed: {len(drift_result['removed_hosts'])}, "
+                        f"changed: {len(drift_result['changed_hosts'])}\n"
+                        f"Ports opened: {drift_result['ports_opened']}, closed: {drift_result['ports_closed']}, "
+                        f"risk changes: {drift_result['risk_changes']}",
                         title="Drift Detection Alert",
                         border_style="yellow"
                     )
                 )
             
+            # Compact and expire earlier runs (RETENTION_DAYS)
+            retention = reporter.apply_retention(int(os.getenv('RETENTION_DAYS', '30')),
+                                                 int(os.getenv('COMPACT_AFTER_DAYS', '7')))
+            if retention['runs_compacted'] or retention['runs_expired']:
+                console.print(f"  [dim]Retention: {retention['runs_compacted']} runs archived, "
+                              f"{retention['runs_expired']} expired, "
+                              f"{retention['bytes_freed'] / 1e6:.1f} MB freed[/dim]")
+            checkpoint.finish()
+            
         except Exception as e:
             console.print(f"[red]Error generating reports: {e}[/red]")
             sys.exit(1)
@@ -217,10 +323,8 @@ def main():
             table.add_column("Risk", justify="center")
             table.add_column("Context", style="yellow")
             
-            # Sort by risk score (highest first) and take top 10
-            sorted_assessments = sorted(assessments, 
-                                      key=lambda x: x.get('risk_score', 0), 
-                                      reverse=True)[:10]
+            # Highest risk score first, straight from the store's columns
+            sorted_assessments = assessments.top(10)
             
             for assessment in sorted_assessments:
                 ip = assessment['ip']
@@ -257,6 +361,8 @@ def main():
         console.print("\n[bold green]✅ SentinelSweep-SOC assessment completed successfully![/bold green]")
         console.print("[dim]Next: Review reports in /reports/ directory[/dim]")
     else:
+        report_stream.close()
+        checkpoint.finish()
         console.print("\n[green]✅ No exposures found. Network appears secure![/green]")
 
 if __name__ == "__main__":
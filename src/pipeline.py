@@ -0,0 +1,321 @@
+﻿"""
+Streaming sweep pipeline for whole-CIDR scans.
+Producer -> probe -> triage -> risk stages connected by bounded asyncio queues.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+try:
+    from .async_scanner import AsyncScanner, raise_fd_limit
+    from .risk_engine import SOCRiskEngine
+except ImportError:
+    from async_scanner import AsyncScanner, raise_fd_limit
+    from risk_engine import SOCRiskEngine
+
+logger = logging.getLogger(__name__)
+
+_DONE = None  # Stage shutdown sentinel
+
+
+class SweepPipeline:
+    """Runs a sweep end-to-end at full concurrency with bounded memory.
+
+    Work items are generated lazily from the host iterable, so only the
+    contents of the queues (not the whole host x port matrix) are ever held.
+    Every open (host, port) is triaged and assessed individually, matching the
+    per-service assessments the entry points have always produced.
+
+    With `handoff` (the default when the triage engine supports it) the probe
+    stage keeps the socket of each open port and triage reads the banner on
+    that same connection, concurrently on the event loop, instead of opening a
+    second connection from a thread. An AsyncTriageEngine runs its protocol
+    probes on that connection instead of a plain banner read.
+
+    With a HostDiscovery, hosts first pass a discovery stage that TCP-pings a
+    few ports per address; only hosts that answer reach the probe stage, and
+    ports they already refused are not probed again.
+
+    `passes` (see scheduler.probe_passes) sweeps the ports in groups, each
+    across every host before the next, instead of all ports host by host.
+    """
+
+    def __init__(self, scanner: AsyncScanner, risk_engine: SOCRiskEngine, triage_engine=None,
+                 queue_size: int = 1024, probe_workers: Optional[int] = None, triage_workers: int = 32,
+                 triage_ports: Optional[Set[int]] = None,
+                 on_finding: Optional[Callable[[Dict], None]] = None,
+                 on_probe: Optional[Callable[[str, int, bool], None]] = None,
+                 collect: bool = True, store=None, handoff: bool = True, checkpoint=None,
+                 discovery=None, discovery_workers: Optional[int] = None,
+                 passes: Optional[List[List[int]]] = None):
+        self.scanner = scanner
+        self.risk_engine = risk_engine
+        self.triage_engine = triage_engine
+        self.queue_size = queue_size
+        self.probe_workers = probe_workers or scanner.max_concurrency
+        self.triage_workers = triage_workers
+        self.triage_ports = triage_ports
+        self.on_finding = on_finding
+        self.on_probe = on_probe
+        self.collect = collect
+        self.store = store  # FindingStore; when set, findings are recorded as columns instead of dicts
+        self.handoff = handoff and hasattr(triage_engine, 'grab_banner_async')
+        self.checkpoint = checkpoint  # ScanCheckpoint; skips finished work and records progress
+        self.discovery = discovery  # HostDiscovery; when set, only hosts that answer a TCP ping are scanned
+        if discovery is not None and not discovery_workers:
+            # Each discovery check holds up to one scanner slot per ping port
+            discovery_workers = max(1, scanner.max_concurrency // len(discovery.ports))
+        self.discovery_workers = discovery_workers or 0
+        self.passes = passes  # Port groups swept one after another; a checkpoint's own passes take precedence
+        self.stats = {'work_items': 0, 'open_services': 0, 'triaged': 0, 'triage_errors': 0, 'findings': 0}
+        self._unprobed: Dict[int, int] = {}  # Host position -> probes of its last pass not yet answered
+
+    # ======================================================
+    # Stages
+    # ======================================================
+
+    async def _produce(self, hosts: Iterable[str], ports: List[int], work_q: asyncio.Queue,
+                       discover_q: Optional[asyncio.Queue] = None) -> None:
+        passes = self._passes(ports)
+        for stage, stage_ports in enumerate(passes):
+            final = stage == len(passes) - 1
+            if self.checkpoint:
+                work = self.checkpoint.work(hosts, stage_ports, stage)
+            else:
+                work = ((index, host, stage_ports) for index, host in enumerate(hosts))
+            for index, host, host_ports in work:
+                if discover_q is not None and host_ports:
+                    await discover_q.put((index, host, host_ports, final))
+                else:
+                    await self._queue_probes(work_q, index, host, host_ports, final)
+        # Sentinels only on success: after a failure the stages are cancelled, and a put could block forever
+        if discover_q is not None:
+            await self._finish(discover_q, self.discovery_workers)
+        else:
+            await self._finish(work_q, self.probe_workers)
+
+    async def _queue_probes(self, work_q: asyncio.Queue, index: int, host: str, host_ports: List[int],
+                            final: bool) -> None:
+        """Queue a host's probes; on the last pass, track them so the host counts as scanned once answered."""
+        if final:
+            if not host_ports:
+                self.scanner.scan_stats['hosts_scanned'] += 1
+                return
+            self._unprobed[index] = len(host_ports)
+        for port in host_ports:
+            await work_q.put((host, port, index if final else None))
+            self.stats['work_items'] += 1
+
+    def _probed(self, index: int) -> None:
+        left = self._unprobed[index] - 1
+        if left:
+            self._unprobed[index] = left
+        else:
+            del self._unprobed[index]
+            self.scanner.scan_stats['hosts_scanned'] += 1
+
+    @staticmethod
+    async def _finish(q: asyncio.Queue, workers: int) -> None:
+        for _ in range(workers):
+            await q.put(_DONE)
+
+    async def _discover_worker(self, discover_q: asyncio.Queue, work_q: asyncio.Queue) -> None:
+        while True:
+            item = await discover_q.get()
+            if item is _DONE:
+                return
+            index, host, host_ports, final = item
+            answers = await self.discovery.check(host, index)
+            probe_ports = []
+            for port in host_ports:
+                if answers and answers.get(port) is not False:
+                    probe_ports.append(port)
+                    continue
+                # Dead host, or a port that already answered the ping with an RST
+                if self.on_probe:
+                    self.on_probe(host, port, False)
+                if self.checkpoint:
+                    self.checkpoint.finished(host, port)
+            self.discovery.skipped(len(host_ports) - len(probe_ports))
+            await self._queue_probes(work_q, index, host, probe_ports, final)
+
+    async def _probe_worker(self, work_q: asyncio.Queue, triage_q: asyncio.Queue) -> None:
+        while True:
+            item = await work_q.get()
+            if item is _DONE:
+                return
+            host, port, index = item
+            sock = None
+            if self.handoff and self._wants_triage(port):
+                sock = await self.scanner.probe_connection(host, port)
+                is_open = sock is not None
+            else:
+                _, is_open = await self.scanner.probe(host, port)
+            if index is not None:
+                self._probed(index)
+            if self.on_probe:
+                self.on_probe(host, port, is_open)
+            if is_open:
+                self.stats['open_services'] += 1
+                await triage_q.put((host, port, sock))
+            elif self.checkpoint:
+                self.checkpoint.finished(host, port)
+
+    def _passes(self, ports: List[int]) -> List[List[int]]:
+        return self.checkpoint.passes if self.checkpoint else (self.passes or [ports])
+
+    def _wants_triage(self, port: int) -> bool:
+        return self.triage_engine is not None and (self.triage_ports is None or port in self.triage_ports)
+
+    async def _triage_worker(self, triage_q: asyncio.Queue, risk_q: asyncio.Queue,
+                             executor: ThreadPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await triage_q.get()
+            if item is _DONE:
+                return
+            host, port, sock = item
+            triage_data = None
+            if self._wants_triage(port):
+                try:
+                    if hasattr(self.triage_engine, 'triage_service_async'):
+                        # Protocol probes run on the event loop, on the handed-off socket if any
+                        triage_data = await self.triage_engine.triage_service_async(host, port, sock=sock)
+                    elif sock is not None:
+                        # Banner read on the scanner's connection; the rules themselves are cheap
+                        banner = await self.triage_engine.grab_banner_async(sock, port)
+                        triage_data = self.triage_engine.triage_service(host, port, banner=banner)
+                    else:
+                        # TriageEngine blocks on banner reads, so keep it off the event loop
+                        triage_data = await loop.run_in_executor(
+                            executor, self.triage_engine.triage_service, host, port)
+                    self.stats['triaged'] += 1
+                except Exception as e:
+                    self.stats['triage_errors'] += 1
+                    logger.warning(f"Triage failed for {host}:{port} - {e}")
+            await risk_q.put((host, port, triage_data))
+
+    async def _risk_stage(self, risk_q: asyncio.Queue, findings: List[Dict]) -> None:
+        while True:
+            item = await risk_q.get()
+            if item is _DONE:
+                return
+            host, port, triage_data = item
+            self.stats['findings'] += 1
+            if self.store is not None:
+                row = self.risk_engine.record(self.store, host, [port], triage_data)
+                if self.on_finding or self.checkpoint:
+                    assessment = self.store[row]
+                    if self.checkpoint:
+                        self.checkpoint.finished(host, port, assessment)
+                    if self.on_finding:
+                        self.on_finding(assessment)
+                continue
+            assessment = self.risk_engine.assess_exposure(host, [port], triage_data)
+            if self.checkpoint:
+                self.checkpoint.finished(host, port, assessment)
+            if self.collect:
+                findings.append(assessment)
+            if self.on_finding:
+                self.on_finding(assessment)
+
+    # ======================================================
+    # Public API
+    # ======================================================
+
+    async def run_async(self, hosts: Iterable[str], ports: List[int]):
+        """Sweep every host x port and return the assessments.
+
+        Returns the FindingStore when one was given, otherwise a list of
+        assessment dicts (empty when collect=False).
+        """
+        work_q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        triage_q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        risk_q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        discover_q: Optional[asyncio.Queue] = asyncio.Queue(maxsize=self.queue_size) if self.discovery else None
+        findings: List[Dict] = []
+        self._unprobed = {}
+        if len(self._passes(ports)) > 1 and not isinstance(hosts, Sequence):
+            hosts = list(hosts)  # Every pass walks the hosts again
+        if self.discovery and len(self._passes(ports)) > 1:
+            self.discovery.remember(len(hosts))  # Later passes reuse the first verdict on each host
+        if self.handoff:
+            # Handed-off sockets wait in the triage queue outside the scanner's semaphore
+            raise_fd_limit(self.scanner.max_concurrency + self.queue_size + self.triage_workers + 256)
+
+        with ThreadPoolExecutor(max_workers=self.triage_workers) as executor:
+            risk = asyncio.create_task(self._risk_stage(risk_q, findings))
+            triage = [asyncio.create_task(self._triage_worker(triage_q, risk_q, executor))
+                      for _ in range(self.triage_workers)]
+            probes = [asyncio.create_task(self._probe_worker(work_q, triage_q))
+                      for _ in range(self.probe_workers)]
+            discoverers = [asyncio.create_task(self._discover_worker(discover_q, work_q))
+                           for _ in range(self.discovery_workers)]
+            producer = asyncio.create_task(self._produce(hosts, ports, work_q, discover_q))
+            stages: List[asyncio.Task] = [producer, *discoverers, *probes, *triage, risk]
+
+            def finish(q: asyncio.Queue, workers: int) -> List[asyncio.Task]:
+                task = asyncio.create_task(self._finish(q, workers))
+                stages.append(task)
+                return [task]
+
+            try:
+                await self._supervise([producer], stages)
+                if discoverers:
+                    await self._supervise(discoverers, stages)
+                    await self._supervise(finish(work_q, len(probes)), stages)
+                await self._supervise(probes, stages)
+                await self._supervise(finish(triage_q, len(triage)), stages)
+                await self._supervise(triage, stages)
+                await self._supervise(finish(risk_q, 1), stages)
+                await self._supervise([risk], stages)
+            finally:
+                await self._cancel(stages)
+                if self.checkpoint:
+                    self.checkpoint.save()
+                while not triage_q.empty():
+                    item = triage_q.get_nowait()
+                    if item is not _DONE and item[2] is not None:
+                        item[2].close()
+
+        return self.store if self.store is not None else findings
+
+    @staticmethod
+    async def _cancel(stages: List[asyncio.Task]) -> None:
+        """Cancel every unfinished stage and wait for all of them to end."""
+        pending = {task for task in stages if not task.done()}
+        while pending:
+            for task in pending:
+                task.cancel()
+            # Re-cancel stragglers: before Python 3.12 wait_for drops a cancel that races a finished connect
+            _, pending = await asyncio.wait(pending, timeout=0.1)
+        await asyncio.gather(*stages, return_exceptions=True)
+
+    @staticmethod
+    async def _supervise(tasks: List[asyncio.Task], stages: List[asyncio.Task]) -> None:
+        """Wait for `tasks`, raising the error of the first stage that fails meanwhile.
+
+        A dead stage would otherwise leave the stages feeding it blocked on
+        full queues for good.
+        """
+        while True:
+            for task in stages:
+                if task.done() and not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+            if all(task.done() for task in tasks):
+                return
+            await asyncio.wait([task for task in stages if not task.done()], return_when=asyncio.FIRST_COMPLETED)
+
+    def run(self, hosts: Iterable[str], ports: List[int]):
+        """Blocking wrapper around run_async."""
+        return asyncio.run(self.run_async(hosts, ports))
+
+    def get_stats(self) -> Dict:
+        """Return pipeline statistics merged with the scanner's."""
+        stats = self.scanner.get_stats()
+        stats.update(self.stats)
+        if self.discovery is not None:
+            stats.update(self.discovery.get_stats())
+        return stats
@@ -0,0 +1,40 @@
+﻿"""
+Per-protocol probe modules for the async triage engine.
+"""
+
+from typing import Dict, Iterable, List
+
+from .base import ProbeConnection, ProbeError, ProtocolProbe
+from .ftp import FTPProbe
+from .http import HTTPProbe
+from .mongodb import MongoDBProbe
+from .mysql import MySQLProbe
+from .postgresql import PostgreSQLProbe
+from .rdp import RDPProbe
+from .smb import SMBProbe
+from .smtp import SMTPProbe
+from .ssh import SSHProbe
+from .tls import TLSProbe
+
+PROBE_CLASSES = [SSHProbe, HTTPProbe, TLSProbe, SMBProbe, RDPProbe, FTPProbe,
+                 SMTPProbe, MySQLProbe, PostgreSQLProbe, MongoDBProbe]
+
+
+def default_probes() -> List[ProtocolProbe]:
+    return [cls() for cls in PROBE_CLASSES]
+
+
+def probes_by_port(probes: Iterable[ProtocolProbe]) -> Dict[int, ProtocolProbe]:
+    """Port -> probe map; later probes win when two claim the same port."""
+    mapping: Dict[int, ProtocolProbe] = {}
+    for probe in probes:
+        for port in probe.ports:
+            mapping[port] = probe
+    return mapping
+
+
+__all__ = [
+    'ProbeConnection', 'ProbeError', 'ProtocolProbe', 'PROBE_CLASSES', 'default_probes', 'probes_by_port',
+    'FTPProbe', 'HTTPProbe', 'MongoDBProbe', 'MySQLProbe', 'PostgreSQLProbe', 'RDPProbe', 'SMBProbe',
+    'SMTPProbe', 'SSHProbe', 'TLSProbe',
+]
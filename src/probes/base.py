@@ -0,0 +1,83 @@
+﻿"""
+Base classes for protocol probe modules.
+"""
+
+import asyncio
+import socket
+from typing import Dict, Optional, Tuple
+
+Verdict = Optional[Tuple[str, str]]  # (final_risk, adjustment_reason), or None to keep the default
+
+
+class ProbeError(Exception):
+    """Raised when a service does not answer the way the protocol requires."""
+
+
+class ProbeConnection:
+    """Deadline-bounded reads and writes on a connected non-blocking socket."""
+
+    def __init__(self, sock: socket.socket, deadline: float = 2.0):
+        self.sock = sock
+        self.deadline = deadline
+        self.loop = asyncio.get_running_loop()
+        self._buffer = b''
+
+    async def send(self, data: bytes) -> None:
+        await asyncio.wait_for(self.loop.sock_sendall(self.sock, data), self.deadline)
+
+    async def recv(self, size: int = 4096) -> bytes:
+        """Return buffered bytes if any, else one read from the socket (b'' on EOF)."""
+        if self._buffer:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+            return data
+        return await asyncio.wait_for(self.loop.sock_recv(self.sock, size), self.deadline)
+
+    async def read_exact(self, size: int) -> bytes:
+        data = b''
+        while len(data) < size:
+            chunk = await self.recv(size - len(data))
+            if not chunk:
+                raise ProbeError(f"connection closed after {len(data)} of {size} bytes")
+            data += chunk
+        return data
+
+    async def read_until(self, marker: bytes, limit: int = 8192) -> bytes:
+        """Read until `marker` (inclusive), EOF or `limit` bytes."""
+        data = b''
+        while marker not in data and len(data) < limit:
+            chunk = await self.recv(limit - len(data))
+            if not chunk:
+                break
+            data += chunk
+        end = data.find(marker)
+        if end >= 0:
+            end += len(marker)
+            data, self._buffer = data[:end], data[end:] + self._buffer
+        return data
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class ProtocolProbe:
+    """A protocol probe module.
+
+    Subclasses set `name` and `ports`, implement `run` to collect structured
+    facts over an open connection, and `assess` to turn facts into a risk
+    verdict. Probes only read what a client normally sees before
+    authenticating; they never send credentials.
+    """
+
+    name = 'generic'
+    ports: Tuple[int, ...] = ()
+    deadline = 2.0  # Per read/write
+
+    async def run(self, conn: ProbeConnection, ip: str, port: int) -> Dict:
+        raise NotImplementedError
+
+    def assess(self, facts: Dict, network_context: str) -> Verdict:
+        return None
+
+
+def decode(data: bytes) -> str:
+    return data.decode('utf-8', errors='ignore').strip()
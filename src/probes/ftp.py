@@ -0,0 +1,23 @@
+﻿"""
+FTP probe: server greeting only (no login attempts).
+"""
+
+from typing import Dict
+
+from .base import ProbeConnection, ProtocolProbe, Verdict, decode
+
+
+class FTPProbe(ProtocolProbe):
+    name = 'FTP'
+    ports = (21,)
+
+    async def run(self, conn: ProbeConnection, ip: str, port: int) -> Dict:
+        banner = decode(await conn.read_until(b'\n', limit=512))
+        return {'banner': banner, 'ready': banner.startswith('220')}
+
+    def assess(self, facts: Dict, network_context: str) -> Verdict:
+        if 'vsFTPd 2.3.4' in facts.get('banner', ''):
+            return 'CRITICAL', 'Backdoored vsFTPd 2.3.4 banner'
+        if facts.get('ready'):
+            return 'HIGH', 'Cleartext FTP service accepting sessions'
+        return None
@@ -0,0 +1,50 @@
+﻿"""
+HTTP probe: status line, Server header, page title and default-page detection.
+"""
+
+import re
+from typing import Dict
+
+from .base import ProbeConnection, ProtocolProbe, Verdict, decode
+
+_TITLE = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+DEFAULT_PAGE_MARKERS = ('It works', 'Welcome to nginx', 'IIS Windows Server', 'Apache2 Default Page',
+                        'Test Page for the Apache')
+
+
+class HTTPProbe(ProtocolProbe):
+    name = 'HTTP'
+    ports = (80, 8000, 8080, 8888)
+
+    async def run(self, conn: ProbeConnection, ip: str, port: int) -> Dict:
+        await conn.send(f'GET / HTTP/1.0\r\nHost: {ip}\r\nUser-Agent: SentinelSweep-SOC\r\n\r\n'.encode())
+        response = b''
+        while len(response) < 16384:
+            chunk = await conn.recv()
+            if not chunk:
+                break
+            response += chunk
+        text = response.decode('utf-8', errors='ignore')
+        head, _, body = text.partition('\r\n\r\n')
+        lines = head.split('\r\n')
+
+        facts = {'banner': decode(lines[0].encode()) if lines else None}
+        parts = lines[0].split(' ', 2) if lines else []
+        if len(parts) >= 2 and parts[0].startswith('HTTP/') and parts[1].isdigit():
+            facts['status'] = int(parts[1])
+        for line in lines[1:]:
+            key, _, value = line.partition(':')
+            if key.strip().lower() == 'server':
+                facts['server'] = value.strip()
+        title = _TITLE.search(body)
+        if title:
+            facts['title'] = title.group(1).strip()[:120]
+        facts['default_page'] = any(marker in body for marker in DEFAULT_PAGE_MARKERS)
+        return facts
+
+    def assess(self, facts: Dict, network_context: str) -> Verdict:
+        if facts.get('default_page'):
+            return 'MEDIUM', 'Default web page detected'
+        if facts.get('status') in (401, 403):
+            return 'LOW', f"Access restricted (HTTP {facts['status']})"
+        return None
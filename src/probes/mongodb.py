@@ -0,0 +1,93 @@
+﻿"""
+MongoDB probe: OP_MSG `hello` (no authentication required) for wire version and role.
+"""
+
+import struct
+from typing import Dict
+
+from .base import ProbeConnection, ProbeError, ProtocolProbe, Verdict
+
+OP_MSG = 2013
+
+
+def _cstring(value: str) -> bytes:
+    return value.encode() + b'\x00'
+
+
+def encode_document(fields: Dict) -> bytes:
+    """Minimal BSON encoder for int32 and string fields."""
+    body = b''
+    for key, value in fields.items():
+        if isinstance(value, int):
+            body += b'\x10' + _cstring(key) + struct.pack('<i', value)
+        else:
+            data = value.encode() + b'\x00'
+            body += b'\x02' + _cstring(key) + struct.pack('<i', len(data)) + data
+    return struct.pack('<i', len(body) + 5) + body + b'\x00'
+
+
+_FIXED_SIZES = {0x01: 8, 0x07: 12, 0x09: 8, 0x0A: 0, 0x11: 8, 0x12: 8, 0x13: 16, 0xFF: 0, 0x7F: 0}
+
+
+def decode_document(data: bytes) -> Dict:
+    """Minimal BSON decoder for top-level scalar fields; nested values are skipped."""
+    fields, pos, end = {}, 4, struct.unpack_from('<i', data)[0] - 1
+    while pos < end:
+        kind = data[pos]
+        key_end = data.index(b'\x00', pos + 1)
+        key = data[pos + 1:key_end].decode('utf-8', errors='ignore')
+        pos = key_end + 1
+        if kind == 0x01:
+            fields[key] = struct.unpack_from('<d', data, pos)[0]
+        elif kind == 0x08:
+            fields[key] = data[pos] == 1
+            pos += 1
+            continue
+        elif kind == 0x10:
+            fields[key] = struct.unpack_from('<i', data, pos)[0]
+            pos += 4
+            continue
+        elif kind == 0x12:
+            fields[key] = struct.unpack_from('<q', data, pos)[0]
+        if kind in (0x02, 0x0D, 0x0E):
+            length = struct.unpack_from('<i', data, pos)[0]
+            fields[key] = data[pos + 4:pos + 3 + length].decode('utf-8', errors='ignore')
+            pos += 4 + length
+        elif kind in (0x03, 0x04):
+            pos += struct.unpack_from('<i', data, pos)[0]
+        elif kind == 0x05:
+            pos += 5 + struct.unpack_from('<i', data, pos)[0]
+        elif kind in _FIXED_SIZES:
+            pos += _FIXED_SIZES[kind]
+        else:
+            break  # Unknown type; stop rather than misparse
+    return fields
+
+
+class MongoDBProbe(ProtocolProbe):
+    name = 'MongoDB'
+    ports = (27017,)
+
+    async def run(self, conn: ProbeConnection, ip: str, port: int) -> Dict:
+        document = encode_document({'hello': 1, '$db': 'admin'})
+        body = struct.pack('<I', 0) + b'\x00' + document
+        await conn.send(struct.pack('<iiii', 16 + len(body), 1, 0, OP_MSG) + body)
+
+        length, _, _, opcode = struct.unpack('<iiii', await conn.read_exact(16))
+        if opcode != OP_MSG or not 21 <= length <= 1 << 20:
+            raise ProbeError('unexpected MongoDB reply')
+        reply = await conn.read_exact(length - 16)
+        fields = decode_document(reply[5:])
+        facts = {'responded': True}
+        for key in ('maxWireVersion', 'isWritablePrimary', 'ismaster', 'setName', 'ok'):
+            if key in fields:
+                facts[key] = fields[key]
+        return facts
+
+    def assess(self, facts: Dict, network_context: str) -> Verdict:
+        wire = facts.get('maxWireVersion')
+        if isinstance(wire, int) and wire < 6:
+            return 'HIGH', 'End-of-life MongoDB (< 3.6)'
+        if facts.get('responded'):
+            return 'HIGH', 'MongoDB answering unauthenticated hello'
+        return None
@@ -0,0 +1,35 @@
+﻿"""
+MySQL probe: server greeting packet (protocol and server version).
+"""
+
+import re
+import struct
+from typing import Dict
+
+from .base import ProbeConnection, ProtocolProbe, Verdict
+
+_VERSION = re.compile(r'^(\d+)\.(\d+)')
+
+
+class MySQLProbe(ProtocolProbe):
+    name = 'MySQL'
+    ports = (3306,)
+
+    async def run(self, conn: ProbeConnection, ip: str, port: int) -> Dict:
+        header = await conn.read_exact(4)
+        length = struct.unpack('<I', header[:3] + b'\x00')[0]
+        payload = await conn.read_exact(min(length, 4096))
+        if payload[:1] == b'\xff':
+            # Error packet: the server refuses this client host before any handshake
+            message = payload[3:].decode('utf-8', errors='ignore')
+            return {'host_blocked': True, 'error': message[:200]}
+        version = payload[1:payload.find(b'\x00', 1)].decode('utf-8', errors='ignore')
+        return {'protocol_version': payload[0], 'server_version': version, 'banner': version}
+
+    def assess(self, facts: Dict, network_context: str) -> Verdict:
+        if facts.get('host_blocked'):
+            return 'LOW', 'MySQL rejects connections from this host'
+        match = _VERSION.match(facts.get('server_version', ''))
+        if match and 'MariaDB' not in facts['server_version'] and (int(match.group(1)), int(match.group(2))) < (5, 7):
+            return 'HIGH', f"End-of-life MySQL {match.group(0)}"
+        return None
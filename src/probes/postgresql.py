@@ -0,0 +1,29 @@
+﻿"""
+PostgreSQL probe: SSLRequest to see whether the server offers TLS.
+"""
+
+import struct
+from typing import Dict
+
+from .base import ProbeConnection, ProtocolProbe, Verdict
+
+SSL_REQUEST_CODE = 80877103
+
+
+class PostgreSQLProbe(ProtocolProbe):
+    name = 'PostgreSQL'
+    ports = (5432,)
+
+    async def run(self, conn: ProbeConnection, ip: str, port: int) -> Dict:
+        await conn.send(struct.pack('!II', 8, SSL_REQUEST_CODE))
+        answer = await conn.read_exact(1)
+        if answer not in (b'S', b'N'):
+            return {'unexpected_reply': answer.hex()}
+        return {'ssl_supported': answer == b'S'}
+
+    def assess(self, facts: Dict, network_context: str) -> Verdict:
+        if facts.get('ssl_supported') is False:
+            return 'HIGH', 'PostgreSQL without TLS'
+        if facts.get('ssl_supported'):
+            return 'MEDIUM', 'PostgreSQL offers TLS'
+        return None
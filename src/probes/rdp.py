@@ -0,0 +1,48 @@
+﻿"""
+RDP probe: X.224 connection request with RDP_NEG_REQ to detect NLA (CredSSP).
+"""
+
+import struct
+from typing import Dict
+
+from .base import ProbeConnection, ProbeError, ProtocolProbe, Verdict
+
+PROTOCOL_RDP, PROTOCOL_SSL, PROTOCOL_HYBRID, PROTOCOL_HYBRID_EX = 0x0, 0x1, 0x2, 0x8
+PROTOCOL_NAMES = {PROTOCOL_RDP: 'RDP', PROTOCOL_SSL: 'SSL', PROTOCOL_HYBRID: 'HYBRID', PROTOCOL_HYBRID_EX: 'HYBRID_EX'}
+_NLA = (PROTOCOL_HYBRID, PROTOCOL_HYBRID_EX)
+
+
+def connection_request() -> bytes:
+    requested = PROTOCOL_SSL | PROTOCOL_HYBRID | PROTOCOL_HYBRID_EX
+    neg_req = struct.pack('<BBHI', 0x01, 0x00, 8, requested)
+    x224 = bytes([6 + len(neg_req), 0xE0, 0, 0, 0, 0, 0]) + neg_req
+    return struct.pack('>BBH', 3, 0, 4 + len(x224)) + x224
+
+
+class RDPProbe(ProtocolProbe):
+    name = 'RDP'
+    ports = (3389,)
+
+    async def run(self, conn: ProbeConnection, ip: str, port: int) -> Dict:
+        await conn.send(connection_request())
+        tpkt = await conn.read_exact(4)
+        if tpkt[0] != 3:
+            raise ProbeError('not a TPKT response')
+        payload = await conn.read_exact(struct.unpack('>H', tpkt[2:])[0] - 4)
+        if len(payload) < 7 or payload[1] & 0xF0 != 0xD0:
+            raise ProbeError('no X.224 connection confirm')
+        if len(payload) < 15:
+            # Legacy server that ignores negotiation: standard RDP security only
+            return {'selected_protocol': 'RDP', 'nla': False}
+
+        neg_type, _, _, value = struct.unpack_from('<BBHI', payload, 7)
+        if neg_type == 0x02:
+            return {'selected_protocol': PROTOCOL_NAMES.get(value, hex(value)), 'nla': value in _NLA}
+        return {'negotiation_failure': value, 'nla': value == 0x05}  # 5 = HYBRID_REQUIRED_BY_SERVER
+
+    def assess(self, facts: Dict, network_context: str) -> Verdict:
+        if facts.get('nla'):
+            return 'MEDIUM', 'RDP with NLA detected'
+        if facts.get('nla') is False:
+            return 'HIGH', 'RDP without NLA'
+        return None
@@ -0,0 +1,50 @@
+﻿"""
+SMB probe: SMB2 NEGOTIATE for the dialect and whether signing is required.
+"""
+
+import struct
+from typing import Dict
+
+from .base import ProbeConnection, ProbeError, ProtocolProbe, Verdict
+
+DIALECTS = {0x0202: '2.0.2', 0x0210: '2.1', 0x0300: '3.0', 0x0302: '3.0.2'}
+_SIGNING_REQUIRED = 0x02
+
+
+def negotiate_request() -> bytes:
+    header = struct.pack('<4sHHIHHIIQIIQ16s', b'\xfeSMB', 64, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, b'\x00' * 16)
+    dialects = list(DIALECTS)
+    body = struct.pack('<HHHHI16sQ', 36, len(dialects), 0x01, 0, 0, b'SentinelSweepSOC', 0)
+    body += struct.pack(f'<{len(dialects)}H', *dialects)
+    message = header + body
+    return struct.pack('>I', len(message)) + message
+
+
+class SMBProbe(ProtocolProbe):
+    name = 'SMB'
+    ports = (445,)
+
+    async def run(self, conn: ProbeConnection, ip: str, port: int) -> Dict:
+        await conn.send(negotiate_request())
+        length = struct.unpack('>I', await conn.read_exact(4))[0] & 0xFFFFFF
+        message = await conn.read_exact(length)
+        if message[:4] == b'\xffSMB':
+            return {'smb1_only': True}
+        if message[:4] != b'\xfeSMB' or len(message) < 70:
+            raise ProbeError('not an SMB2 negotiate response')
+
+        status = struct.unpack_from('<I', message, 8)[0]
+        if status != 0:
+            return {'negotiate_status': f'0x{status:08x}'}
+        security_mode, dialect = struct.unpack_from('<HH', message, 66)
+        return {
+            'dialect': DIALECTS.get(dialect, f'0x{dialect:04x}'),
+            'signing_required': bool(security_mode & _SIGNING_REQUIRED),
+        }
+
+    def assess(self, facts: Dict, network_context: str) -> Verdict:
+        if facts.get('smb1_only'):
+            return 'CRITICAL', 'Server only speaks SMBv1'
+        if facts.get('signing_required') is False:
+            return 'HIGH', 'SMB signing not required'
+        return None
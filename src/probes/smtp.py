@@ -0,0 +1,42 @@
+﻿"""
+SMTP probe: greeting plus EHLO capabilities (STARTTLS, AUTH).
+"""
+
+from typing import Dict, List
+
+from .base import ProbeConnection, ProtocolProbe, Verdict, decode
+
+
+class SMTPProbe(ProtocolProbe):
+    name = 'SMTP'
+    ports = (25, 587)
+
+    async def _reply(self, conn: ProbeConnection) -> List[str]:
+        lines = []
+        while len(lines) < 64:
+            line = decode(await conn.read_until(b'\n', limit=1024))
+            if not line:
+                break
+            lines.append(line)
+            if len(line) < 4 or line[3] != '-':
+                break
+        return lines
+
+    async def run(self, conn: ProbeConnection, ip: str, port: int) -> Dict:
+        greeting = await self._reply(conn)
+        facts = {'banner': greeting[0] if greeting else None}
+        await conn.send(b'EHLO sentinelsweep.local\r\n')
+        capabilities = [line[4:].upper() for line in await self._reply(conn) if line.startswith('250')]
+        await conn.send(b'QUIT\r\n')
+
+        facts['starttls'] = 'STARTTLS' in capabilities
+        auth = next((c for c in capabilities if c.startswith('AUTH')), None)
+        facts['auth_mechanisms'] = auth.split()[1:] if auth else []
+        return facts
+
+    def assess(self, facts: Dict, network_context: str) -> Verdict:
+        if facts.get('banner') is None:
+            return None
+        if not facts.get('starttls'):
+            return 'HIGH', 'SMTP without STARTTLS'
+        return 'MEDIUM', 'SMTP offers STARTTLS'
@@ -0,0 +1,38 @@
+﻿"""
+SSH probe: protocol version and server software from the identification string.
+"""
+
+import re
+from typing import Dict
+
+from .base import ProbeConnection, ProtocolProbe, Verdict, decode
+
+_IDENT = re.compile(r'SSH-(?P<protocol>[\d.]+)-(?P<software>\S+)')
+_OPENSSH = re.compile(r'OpenSSH_(\d+)\.(\d+)')
+
+
+class SSHProbe(ProtocolProbe):
+    name = 'SSH'
+    ports = (22, 2222)
+
+    async def run(self, conn: ProbeConnection, ip: str, port: int) -> Dict:
+        banner = decode(await conn.read_until(b'\n', limit=255))
+        facts = {'banner': banner}
+        match = _IDENT.search(banner)
+        if match:
+            facts['protocol'] = match.group('protocol')
+            facts['software'] = match.group('software')
+        return facts
+
+    def assess(self, facts: Dict, network_context: str) -> Verdict:
+        protocol = facts.get('protocol')
+        if protocol is None:
+            return None
+        if protocol.startswith('1.') and protocol != '1.99':
+            return 'HIGH', f'Legacy SSH protocol {protocol} only'
+        version = _OPENSSH.search(facts.get('software', ''))
+        if version and (int(version.group(1)), int(version.group(2))) < (7, 4):
+            return 'HIGH', f'Outdated OpenSSH {version.group(1)}.{version.group(2)}'
+        if network_context == 'Internal_Network':
+            return 'MEDIUM', 'SSH version detected'
+        return 'HIGH', 'SSH version detected'
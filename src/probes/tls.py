@@ -0,0 +1,65 @@
+﻿"""
+TLS probe: negotiated protocol version, cipher and certificate fingerprint.
+"""
+
+import hashlib
+import ssl
+from typing import Dict
+
+from .base import ProbeConnection, ProbeError, ProtocolProbe, Verdict
+
+DEPRECATED_VERSIONS = ('SSLv2', 'SSLv3', 'TLSv1', 'TLSv1.1')
+
+
+def _client_context() -> ssl.SSLContext:
+    # Observation only: accept any certificate and allow legacy versions so they can be reported
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    try:
+        ctx.minimum_version = ssl.TLSVersion.TLSv1
+        ctx.set_ciphers('ALL:@SECLEVEL=0')
+    except (ValueError, ssl.SSLError):
+        pass
+    return ctx
+
+
+class TLSProbe(ProtocolProbe):
+    name = 'TLS'
+    ports = (443, 636, 993, 995, 8443)
+
+    async def run(self, conn: ProbeConnection, ip: str, port: int) -> Dict:
+        incoming, outgoing = ssl.MemoryBIO(), ssl.MemoryBIO()
+        tls = _client_context().wrap_bio(incoming, outgoing)
+        try:
+            while True:
+                try:
+                    tls.do_handshake()
+                    break
+                except ssl.SSLWantReadError:
+                    pending = outgoing.read()
+                    if pending:
+                        await conn.send(pending)
+                    data = await conn.recv()
+                    if not data:
+                        raise ProbeError('connection closed during TLS handshake')
+                    incoming.write(data)
+        except ssl.SSLError as e:
+            return {'handshake': 'failed', 'error': e.reason or str(e)}
+
+        facts = {'handshake': 'ok', 'tls_version': tls.version()}
+        cipher = tls.cipher()
+        if cipher:
+            facts['cipher'] = cipher[0]
+        der = tls.getpeercert(binary_form=True)
+        if der:
+            facts['cert_sha256'] = hashlib.sha256(der).hexdigest()
+        return facts
+
+    def assess(self, facts: Dict, network_context: str) -> Verdict:
+        version = facts.get('tls_version')
+        if version in DEPRECATED_VERSIONS:
+            return 'HIGH', f'Deprecated {version} negotiated'
+        if version:
+            return 'LOW', f'{version} negotiated'
+        return None
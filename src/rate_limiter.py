@@ -0,0 +1,144 @@
+﻿"""
+Token-bucket probe pacing for Defender-safe scanning.
+Global, per-host and per-/24 buckets that the probe dispatcher draws from.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Idle buckets are swept once a table grows past this size
+_PRUNE_THRESHOLD = 4096
+
+
+class TokenBucket:
+    """Token bucket in its virtual-scheduling (GCRA) form.
+
+    Instead of refilling a token count, the bucket tracks the theoretical
+    arrival time (TAT) of the next conforming probe. A bucket whose TAT is in
+    the past is indistinguishable from a fresh one, which makes idle buckets
+    free to discard.
+    """
+
+    __slots__ = ('rate', 'burst', 'interval', 'tolerance', 'tat')
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.interval = 1.0 / self.rate
+        self.tolerance = (self.burst - 1.0) * self.interval
+        self.tat = 0.0
+
+    def earliest(self, now: float) -> float:
+        """Earliest time at which one token is available."""
+        return max(now, self.tat - self.tolerance)
+
+    def consume(self, at: float) -> None:
+        """Take one token at time `at` (which must be >= earliest())."""
+        self.tat = max(self.tat, at) + self.interval
+
+    def idle(self, now: float) -> bool:
+        return self.tat <= now
+
+
+class ProbePacer:
+    """Shared pacing for probe emission.
+
+    Each probe reserves a send slot that satisfies the global, per-host and
+    per-/24 buckets at once; the caller then sleeps until that slot. Rates are
+    probes per second and `None`/0 disables a level.
+    """
+
+    def __init__(self, rate: Optional[float] = None, host_rate: Optional[float] = None,
+                 subnet_rate: Optional[float] = None, burst: float = 1.0):
+        self.rate = rate or None
+        self.host_rate = host_rate or None
+        self.subnet_rate = subnet_rate or None
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._global = TokenBucket(self.rate, burst) if self.rate else None
+        self._hosts: Dict[str, TokenBucket] = {}
+        self._subnets: Dict[str, TokenBucket] = {}
+        self._sent = 0
+        self._released = 0  # Probes whose acquire has returned
+        self._first_send: Optional[float] = None
+        self._last_send: Optional[float] = None
+
+    @classmethod
+    def from_delay(cls, delay: float) -> 'ProbePacer':
+        """Legacy `delay` seconds between probes to one host, as a per-host rate."""
+        return cls(host_rate=1.0 / delay if delay and delay > 0 else None)
+
+    @staticmethod
+    def subnet_key(ip: str) -> str:
+        """/24 for IPv4, /64 for IPv6."""
+        if ':' in ip:
+            return ':'.join(ip.split(':')[:4])
+        return ip.rsplit('.', 1)[0]
+
+    def _bucket(self, table: Dict[str, TokenBucket], key: str, rate: float, now: float) -> TokenBucket:
+        bucket = table.get(key)
+        if bucket is None:
+            if len(table) >= _PRUNE_THRESHOLD:
+                for stale in [k for k, b in table.items() if b.idle(now)]:
+                    del table[stale]
+            bucket = table[key] = TokenBucket(rate, self.burst)
+        return bucket
+
+    def reserve(self, ip: str) -> float:
+        """Reserve a send slot for one probe to `ip`. Returns seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            buckets: List[TokenBucket] = []
+            if self._global is not None:
+                buckets.append(self._global)
+            if self.host_rate:
+                buckets.append(self._bucket(self._hosts, ip, self.host_rate, now))
+            if self.subnet_rate:
+                buckets.append(self._bucket(self._subnets, self.subnet_key(ip), self.subnet_rate, now))
+
+            send_at = max((b.earliest(now) for b in buckets), default=now)
+            for b in buckets:
+                b.consume(send_at)
+
+            self._sent += 1
+            return send_at - now
+
+    def _released_now(self) -> None:
+        """Record when a probe is actually let go; achieved_rate is measured from these times."""
+        now = time.monotonic()
+        with self._lock:
+            self._released += 1
+            if self._first_send is None:
+                self._first_send = now
+            self._last_send = now
+
+    def acquire(self, ip: str) -> None:
+        """Block the calling thread until a probe to `ip` may be sent."""
+        wait = self.reserve(ip)
+        if wait > 0:
+            time.sleep(wait)
+        self._released_now()
+
+    async def acquire_async(self, ip: str) -> None:
+        """Suspend the calling task until a probe to `ip` may be sent."""
+        wait = self.reserve(ip)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._released_now()
+
+    def get_stats(self) -> Dict:
+        """Configured rates and the achieved global emission rate (from actual release times)."""
+        with self._lock:
+            span = (self._last_send or 0.0) - (self._first_send or 0.0)
+            achieved = (self._released - 1) / span if self._released > 1 and span > 0 else None
+            return {
+                'configured_rate': self.rate,
+                'configured_host_rate': self.host_rate,
+                'configured_subnet_rate': self.subnet_rate,
+                'achieved_rate': round(achieved, 2) if achieved is not None else None,
+                'probes_paced': self._sent,
+            }
@@ -0,0 +1,315 @@
+﻿"""
+Streaming report writers.
+Findings are appended as the pipeline produces them; metadata and summary are finalised at close.
+"""
+
+import csv
+import json
+import logging
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .compressed_io import ChunkedTextSink, compressed_path, index_path
+except ImportError:
+    from compressed_io import ChunkedTextSink, compressed_path, index_path
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingWriter:
+    """Base class: buffered file, flushed every `flush_every` records or `flush_interval` seconds.
+
+    Periodic flushing lets other processes (e.g. a SIEM forwarder) tail the
+    file while a multi-hour scan is still running.
+
+    With `compression` ("gzip" or "zstd") the file gets the codec's extension
+    and is written as independently compressed chunks plus a `.idx.json`
+    index of offsets and IP ranges (see compressed_io).
+    """
+
+    name = ""
+    suffix = ""
+    newline: Optional[str] = None  # Passed to open()
+
+    def __init__(self, path: Path, flush_every: int = 100, flush_interval: float = 5.0,
+                 compression: Optional[str] = None, chunk_size: int = 1 << 20):
+        self.path = compressed_path(path, compression)
+        self.compression = compression
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.count = 0
+        self.closed = False
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        if compression:
+            self._sink: Optional[ChunkedTextSink] = ChunkedTextSink(self.path, compression,
+                                                                    chunk_size=chunk_size, fmt=self.name)
+            self._file = self._sink
+        else:
+            self._sink = None
+            self._file = open(self.path, "w", encoding="utf-8", newline=self.newline)
+        self._start()
+        if self._sink is not None:
+            self._sink.cut()  # Preamble/header in a chunk of its own, so record chunks decode alone
+
+    def _start(self) -> None:
+        pass
+
+    def _write_record(self, assessment: Dict) -> None:
+        raise NotImplementedError
+
+    def _finish(self, metadata: Dict) -> None:
+        pass
+
+    def write(self, assessment: Dict) -> None:
+        self._write_record(assessment)
+        if self._sink is not None:
+            self._sink.note(assessment.get("ip"))
+        self.count += 1
+        self._pending += 1
+        if self._pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        self._file.flush()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def close(self, metadata: Optional[Dict] = None) -> Path:
+        if not self.closed:
+            if self._sink is not None:
+                self._sink.cut()
+            self._finish(metadata or {})
+            self._file.close()
+            self.closed = True
+        return self.path
+
+    def abort(self) -> None:
+        """Close without finishing and delete the partial file."""
+        if not self.closed:
+            self._file.close()
+            self.closed = True
+            if self._sink is not None:
+                index_path(self.path).unlink(missing_ok=True)
+            self.path.unlink(missing_ok=True)
+
+    def __enter__(self) -> 'StreamingWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class NDJSONWriter(StreamingWriter):
+    """One assessment per line. Metadata goes to a `.meta.json` sidecar at close,
+    so every line of the stream has the same shape."""
+
+    name = "ndjson"
+    suffix = ".ndjson"
+
+    def _write_record(self, assessment: Dict) -> None:
+        self._file.write(json.dumps(assessment, default=str, separators=(",", ":")) + "\n")
+
+    @property
+    def metadata_path(self) -> Path:
+        path = self.path.with_suffix("") if self.compression else self.path
+        return path.with_suffix(".meta.json")
+
+    def _finish(self, metadata: Dict) -> None:
+        metadata = dict(metadata, record_count=self.count)
+        with open(self.metadata_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2, default=str)
+
+
+class JSONArrayWriter(StreamingWriter):
+    """The JSON report as one valid document, streamed.
+
+    Assessments come first; metadata (which carries the run summary) is
+    written after them when the writer is closed. Until then the file is a
+    valid prefix that tolerant readers can follow.
+    """
+
+    name = "json"
+    suffix = ".json"
+
+    def _start(self) -> None:
+        self._file.write('{\n  "schema_version": "3.0",\n  "assessments": [')
+
+    def _write_record(self, assessment: Dict) -> None:
+        self._file.write(("," if self.count else "") + "\n    " + _nested(assessment).replace("\n", "\n  "))
+
+    def _finish(self, metadata: Dict) -> None:
+        self._file.write(("\n  " if self.count else "") + '],\n  "metadata": ' + _nested(metadata) + "\n}")
+
+
+CSV_COLUMNS = ["ip", "ports", "initial_risk", "final_risk", "risk_score", "risk_adjusted",
+               "network_segment", "mitre_techniques"]
+
+
+def csv_row(a: Dict) -> List[Any]:
+    context = a.get("context") or {}
+    findings = context.get("mitre_findings") or []
+    return [
+        a.get("ip"),
+        ";".join(map(str, a.get("open_ports", []))),
+        a.get("initial_risk"),
+        a.get("true_risk"),
+        a.get("risk_score", 0),
+        a.get("risk_adjusted", False),
+        context.get("network_segment"),
+        ";".join(f.get("technique", "") for f in findings[:5]),
+    ]
+
+
+class CSVWriter(StreamingWriter):
+    """Analyst CSV, one row per assessment, written with the stdlib csv module."""
+
+    name = "csv"
+    suffix = ".csv"
+    newline = ""  # The csv module writes its own line endings
+
+    def _start(self) -> None:
+        # Same line endings pandas' to_csv used to produce
+        self._csv = csv.writer(self._file, lineterminator=os.linesep)
+        self._csv.writerow(CSV_COLUMNS)
+
+    def _write_record(self, assessment: Dict) -> None:
+        self._csv.writerow(csv_row(assessment))
+
+
+def _nested(obj: Any) -> str:
+    return json.dumps(obj, indent=2, default=str).replace("\n", "\n  ")
+
+
+WRITERS = {"json": JSONArrayWriter, "ndjson": NDJSONWriter, "csv": CSVWriter}
+
+
+class ReportStream:
+    """Several streaming writers fed with the same findings."""
+
+    def __init__(self, writers: Dict[str, StreamingWriter]):
+        self.writers = writers
+
+    def write(self, assessment: Dict) -> None:
+        for writer in self.writers.values():
+            writer.write(assessment)
+
+    def write_all(self, assessments: Iterable[Dict]) -> None:
+        for assessment in assessments:
+            self.write(assessment)
+
+    def flush(self) -> None:
+        for writer in self.writers.values():
+            writer.flush()
+
+    def close(self, metadata: Optional[Dict] = None) -> Dict[str, str]:
+        """Finalise every writer. Returns {format: path}."""
+        return {name: str(writer.close(metadata)) for name, writer in self.writers.items()}
+
+    @property
+    def formats(self) -> List[str]:
+        return list(self.writers)
+
+
+class ReportFanOut:
+    """Single pass over the findings, dispatched to every writer on its own thread.
+
+    Findings are read once (for a FindingStore, each row dict is built once)
+    and handed to the writers in batches over bounded queues, so one slow
+    writer applies back-pressure instead of buffering the run. Serialisation
+    still shares the GIL; what overlaps is file I/O. Any object with
+    write(assessment) and close(metadata) can be a writer.
+    """
+
+    def __init__(self, writers: Dict[str, Any], batch_size: int = 512, queue_depth: int = 8):
+        self.writers = writers
+        self.batch_size = batch_size
+        self.queue_depth = queue_depth
+        self.timings: Dict[str, float] = {}
+        self.paths: Dict[str, str] = {}  # Writers that finished, also after another one failed
+        self.errors: Dict[str, Exception] = {}
+
+    def _drain(self, writer, batches: queue.Queue, metadata: Dict) -> Tuple[str, float]:
+        busy, error = 0.0, None
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            if error is not None:
+                continue  # Keep draining so the producer never blocks on a dead writer
+            start = time.perf_counter()
+            try:
+                for assessment in batch:
+                    writer.write(assessment)
+            except Exception as e:
+                error = e
+                self._abort(writer)
+            busy += time.perf_counter() - start
+        if error is not None:
+            raise error
+        start = time.perf_counter()
+        path = writer.close(metadata)
+        return str(path), busy + time.perf_counter() - start
+
+    @staticmethod
+    def _abort(writer) -> None:
+        """Release a failed writer: abort() where it has one, else close() what it has."""
+        try:
+            abort = getattr(writer, "abort", None)
+            if abort is not None:
+                abort()
+            else:
+                writer.close({})
+        except Exception as e:
+            logger.warning(f"Could not close failed report writer {writer!r}: {e}")
+
+    def run(self, assessments: Iterable[Dict], metadata: Optional[Dict] = None) -> Dict[str, str]:
+        """Write everything. Returns {name: path}; per-writer busy seconds end up in `timings`.
+
+        A failing writer is aborted while the others finish; its error is raised afterwards,
+        with the finished writers' paths in `paths` and every failure in `errors`.
+        """
+        metadata = metadata or {}
+        if not self.writers:
+            return {}
+        started = time.perf_counter()
+        queues = {name: queue.Queue(maxsize=self.queue_depth) for name in self.writers}
+
+        with ThreadPoolExecutor(max_workers=len(self.writers), thread_name_prefix="report") as pool:
+            futures = {name: pool.submit(self._drain, writer, queues[name], metadata)
+                       for name, writer in self.writers.items()}
+            try:
+                batch: List[Dict] = []
+                for assessment in assessments:
+                    batch.append(assessment)
+                    if len(batch) >= self.batch_size:
+                        for q in queues.values():
+                            q.put(batch)
+                        batch = []
+                if batch:
+                    for q in queues.values():
+                        q.put(batch)
+            finally:
+                for q in queues.values():
+                    q.put(None)
+            results, errors = {}, {}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    errors[name] = e
+                    logger.error(f"Report writer {name} failed: {e}")
+        self.timings = {name: round(busy, 4) for name, (_, busy) in results.items()}
+        self.timings["total"] = round(time.perf_counter() - started, 4)
+        self.paths = {name: path for name, (path, _) in results.items()}
+        self.errors = errors
+        if errors:
+            raise next(iter(errors.values()))
+        logger.info("Report writers (busy seconds): " +
+                    ", ".join(f"{name}={t}" for name, t in self.timings.items()))
+        return dict(self.paths)
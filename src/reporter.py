@@ -3,10 +3,13 @@ SentinelSweep-SOC Reporter v3.0
 Enterprise Security Reporting Engine
 
 Generates:
-- JSON (SIEM-ready)
+- JSON (SIEM-ready), streamed during the sweep; NDJSON for tailing
 - CSV (Analyst-ready)
-- Executive HTML dashboard
+- Executive HTML dashboard (all findings, virtualised table)
 - Baseline snapshots for drift detection
+- Optional SQLite scan history (see history.py)
+- Optional gzip/zstd compression with a seekable chunk index (see compressed_io.py)
+- A run index (reports/index.json) and retention/compaction (see retention.py)
 """
 
 from __future__ import annotations
@@ -17,13 +20,29 @@ import hashlib
 import html
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional
-
-import pandas as pd
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple, Union
+
+try:
+    from .risk_engine import RISK_LEVELS
+    from .report_writers import WRITERS, ReportFanOut, ReportStream
+    from .html_dashboard import DashboardWriter
+    from .compressed_io import index_path, normalise_codec
+    from .retention import RetentionPolicy, RunIndex
+    from .targets import ip_to_int
+except ImportError:
+    from risk_engine import RISK_LEVELS
+    from report_writers import WRITERS, ReportFanOut, ReportStream
+    from html_dashboard import DashboardWriter
+    from compressed_io import index_path, normalise_codec
+    from retention import RetentionPolicy, RunIndex
+    from targets import ip_to_int
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+REPORT_FORMATS = ("json", "ndjson", "csv", "html")
+DEFAULT_FORMATS = REPORT_FORMATS
+
 
 # ==========================================================
 # Utility Helpers
@@ -43,6 +62,140 @@ def stable_hash(data: Any) -> str:
     ).hexdigest()
 
 
+def port_fingerprints(assessments: Iterable[Dict]) -> Iterator[Tuple[str, int, str]]:
+    """(ip, port, true_risk) for every open port; read from the columns of a FindingStore."""
+    if hasattr(assessments, "port_risks"):
+        yield from assessments.port_risks()
+        return
+    for a in assessments:
+        for port in a.get("open_ports", []):
+            yield a.get("ip"), port, a.get("true_risk")
+
+
+def _severity(risk: Optional[str]) -> int:
+    return RISK_LEVELS.index(risk) if risk in RISK_LEVELS else -1
+
+
+def build_host_index(assessments: Iterable[Dict]) -> Dict[str, Dict[str, str]]:
+    """Per-host fingerprint: {ip: {port: true_risk}}, ignoring timestamps and other volatile fields.
+
+    When several assessments cover the same port, the most severe risk is kept.
+    """
+    index: Dict[str, Dict[str, str]] = {}
+    for ip, port, risk in port_fingerprints(assessments):
+        _index_port(index, ip, port, risk)
+    return index
+
+
+def _index_port(index: Dict[str, Dict[str, str]], ip: str, port: int, risk: Optional[str]) -> None:
+    ports = index.setdefault(ip, {})
+    key = str(port)
+    if key not in ports or _severity(risk) > _severity(ports[key]):
+        ports[key] = risk
+
+
+def host_digest(ports: Dict[str, str]) -> str:
+    return hashlib.sha256(json.dumps(ports, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _port_list(ports: Dict[str, str]) -> List[int]:
+    return sorted(int(p) for p in ports)
+
+
+def diff_host_index(baseline: Dict[str, Dict], current: Dict[str, Dict[str, str]],
+                    digests: Optional[Dict[str, str]] = None) -> Dict:
+    """Diff a stored baseline index ({ip: {"digest", "ports"}}) against a current host index.
+
+    Hosts are compared by digest first; ports are only walked for hosts whose
+    digest differs, so the detailed work is proportional to the changed hosts.
+    """
+    new_hosts: Dict[str, List[int]] = {}
+    changed: Dict[str, Dict] = {}
+
+    for ip, ports in current.items():
+        before = baseline.get(ip)
+        if before is None:
+            new_hosts[ip] = _port_list(ports)
+            continue
+        digest = digests[ip] if digests is not None else host_digest(ports)
+        if before["digest"] == digest:
+            continue
+        old = before["ports"]
+        changed[ip] = {
+            "opened": _port_list({p: r for p, r in ports.items() if p not in old}),
+            "closed": _port_list({p: r for p, r in old.items() if p not in ports}),
+            "risk_changed": {
+                p: {"from": old[p], "to": r} for p, r in sorted(ports.items(), key=lambda x: int(x[0]))
+                if p in old and old[p] != r
+            },
+        }
+
+    removed_hosts = {ip: _port_list(entry["ports"]) for ip, entry in baseline.items() if ip not in current}
+
+    return {
+        "new_hosts": new_hosts,
+        "removed_hosts": removed_hosts,
+        "changed_hosts": changed,
+        "ports_opened": sum(len(p) for p in new_hosts.values()) + sum(len(c["opened"]) for c in changed.values()),
+        "ports_closed": sum(len(p) for p in removed_hosts.values()) + sum(len(c["closed"]) for c in changed.values()),
+        "risk_changes": sum(len(c["risk_changed"]) for c in changed.values()),
+    }
+
+
+class BaselineWriter:
+    """Builds the baseline host index as findings arrive; writes it at close."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.index: Dict[str, Dict[str, str]] = {}
+
+    def write(self, assessment: Dict) -> None:
+        for port in assessment.get("open_ports", []):
+            _index_port(self.index, assessment.get("ip"), port, assessment.get("true_risk"))
+
+    def add(self, ip: str, port: int, risk: Optional[str]) -> None:
+        _index_port(self.index, ip, port, risk)
+
+    def close(self, metadata: Optional[Dict] = None) -> Path:
+        hosts = {ip: {"digest": host_digest(ports), "ports": ports} for ip, ports in self.index.items()}
+
+        baseline = {
+            "created_at": utc_iso(),
+            "index_version": 1,
+            "host_count": len(hosts),
+            "hash": stable_hash({ip: entry["digest"] for ip, entry in hosts.items()}),
+            "hosts": hosts,
+        }
+
+        # Compact: the index is read back by machines, not people
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, separators=(",", ":"))
+
+        return self.path
+
+
+def in_ip_order(assessments: Iterable[Dict]) -> Iterable[Dict]:
+    """Findings sorted by address, so each compressed chunk covers a narrow, disjoint IP range."""
+    if hasattr(assessments, "in_ip_order"):
+        return assessments.in_ip_order()
+    return sorted(assessments, key=lambda a: ip_to_int(a["ip"]))
+
+
+def parse_formats(formats: Union[str, Iterable[str], None]) -> List[str]:
+    """REPORT_FORMAT-style list ("json,csv,html") to known format names."""
+    if formats is None:
+        return list(DEFAULT_FORMATS)
+    if isinstance(formats, str):
+        formats = formats.split(",")
+    names = []
+    for name in (f.strip().lower() for f in formats):
+        if name in REPORT_FORMATS and name not in names:
+            names.append(name)
+        elif name:
+            logger.warning(f"Unknown report format ignored: {name}")
+    return names
+
+
 def safe_get(d: Dict, keys: List[str], default=None):
     for key in keys:
         if not isinstance(d, dict):
@@ -59,19 +212,52 @@ class SOCReporter:
 
     VERSION = "SentinelSweep-SOC v3.0"
 
-    def __init__(self, output_dir: str = "reports") -> None:
+    def __init__(self, output_dir: str = "reports", history=None,
+                 formats: Union[str, Iterable[str], None] = None, compression: Optional[str] = None) -> None:
         self.output_dir = Path(output_dir)
+        self.history = history  # Optional ScanHistory; each generated report is also recorded there
+        self.formats = parse_formats(formats)  # The baseline is always written
+        self.compression = normalise_codec(compression)  # JSON/NDJSON/CSV only; HTML and baseline stay plain
+        self.timings: Dict[str, float] = {}  # Busy seconds per writer from the last generate_reports
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.runs = RunIndex(self.output_dir)
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.started_at = utc_iso()  # Run start for the history; entry points set it from the checkpoint
 
     # ======================================================
     # Public API
     # ======================================================
 
+    def open_stream(
+        self,
+        formats: Optional[Iterable[str]] = None,
+        flush_every: int = 100,
+        flush_interval: float = 5.0
+    ) -> ReportStream:
+        """Start streaming reports for this run; feed it findings as they arrive.
+
+        Pass the stream to generate_reports at the end of the run to finalise
+        it with the run's metadata instead of writing those formats again.
+        By default every configured format that can be streamed is opened;
+        with compression only NDJSON is, and JSON/CSV are written in address
+        order at the end so their chunk index can narrow range lookups.
+        """
+        if formats is None:
+            formats = [name for name in self.formats if name in WRITERS and
+                       (not self.compression or name == "ndjson")]
+        writers = {}
+        for name in formats:
+            cls = WRITERS[name]
+            path = self.output_dir / f"sentinel_{self.timestamp}{cls.suffix}"
+            writers[name] = cls(path, flush_every=flush_every, flush_interval=flush_interval,
+                                compression=self.compression)
+        return ReportStream(writers)
+
     def generate_reports(
         self,
         assessments: List[Dict[str, Any]],
-        summary: Optional[Dict[str, Any]] = None
+        summary: Optional[Dict[str, Any]] = None,
+        stream: Optional[ReportStream] = None
     ) -> Dict[str, str]:
 
         if summary is None or not summary:
@@ -84,133 +270,59 @@ class SOCReporter:
             "scan_summary": summary,
         }
 
-        json_path = self._write_json(metadata, assessments)
-        csv_path = self._write_csv(assessments)
-        html_path = self._write_html(metadata, assessments, summary)
-        baseline_path = self._write_baseline(assessments)
-
-        return {
-            "json": str(json_path),
-            "csv": str(csv_path),
-            "html": str(html_path),
-            "baseline": str(baseline_path),
-        }
-
-    # ======================================================
-    # JSON
-    # ======================================================
-
-    def _write_json(self, metadata: Dict, assessments: List[Dict]) -> Path:
-        path = self.output_dir / f"sentinel_{self.timestamp}.json"
-
-        payload = {
-            "metadata": metadata,
-            "schema_version": "3.0",
-            "assessments": assessments,
-        }
-
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(payload, f, indent=2, default=str)
-
-        return path
-
-    # ======================================================
-    # CSV
-    # ======================================================
-
-    def _write_csv(self, assessments: List[Dict]) -> Path:
-        path = self.output_dir / f"sentinel_{self.timestamp}.csv"
-
-        rows = []
-        for a in assessments:
-            rows.append({
-                "ip": a.get("ip"),
-                "ports": ";".join(map(str, a.get("open_ports", []))),
-                "initial_risk": a.get("initial_risk"),
-                "final_risk": a.get("true_risk"),
-                "risk_score": a.get("risk_score", 0),
-                "risk_adjusted": a.get("risk_adjusted", False),
-                "network_segment": safe_get(a, ["context", "network_segment"]),
-                "mitre_techniques": self._extract_mitre(a),
-            })
-
-        pd.DataFrame(rows).to_csv(path, index=False)
-        return path
-
-    # ======================================================
-    # HTML
-    # ======================================================
-
-    def _write_html(
-        self,
-        metadata: Dict,
-        assessments: List[Dict],
-        summary: Dict
-    ) -> Path:
-
-        path = self.output_dir / f"sentinel_{self.timestamp}.html"
-
-        top = sorted(
-            assessments,
-            key=lambda x: x.get("risk_score", 0),
-            reverse=True
-        )[:20]
-
-        rows = "\n".join(self._render_row(a) for a in top)
-
-        html_doc = f"""
-<!DOCTYPE html>
-<html>
-<head>
-<meta charset="UTF-8">
-<title>SentinelSweep-SOC Report</title>
-<style>
-body {{ font-family: Arial; background:#f4f6f8; padding:40px; }}
-.container {{ background:white; padding:30px; border-radius:12px; }}
-table {{ width:100%; border-collapse: collapse; margin-top:20px; }}
-th, td {{ padding:10px; border-bottom:1px solid #ddd; }}
-th {{ background:#f0f0f0; text-align:left; }}
-.badge {{ padding:4px 8px; border-radius:6px; font-weight:bold; }}
-.critical {{ background:#fdd; }}
-.high {{ background:#ffe4cc; }}
-.medium {{ background:#fff4cc; }}
-.low {{ background:#d4f8d4; }}
-</style>
-</head>
-<body>
-<div class="container">
-<h1>SentinelSweep-SOC</h1>
-<p><strong>Report ID:</strong> {metadata['report_id']}</p>
-<p><strong>Generated:</strong> {metadata['generated_at']}</p>
-
-<h2>Summary</h2>
-<ul>
-<li>Total Hosts: {summary.get("total_hosts", 0)}</li>
-<li>Total Open Ports: {summary.get("total_open_ports", 0)}</li>
-<li>Critical: {summary.get("critical_hosts", 0)}</li>
-<li>High: {summary.get("high_hosts", 0)}</li>
-</ul>
-
-<h2>Top Findings</h2>
-<table>
-<tr>
-<th>IP</th>
-<th>Ports</th>
-<th>Final Risk</th>
-<th>Score</th>
-<th>Segment</th>
-</tr>
-{rows}
-</table>
-</div>
-</body>
-</html>
-"""
-
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(html_doc)
-
-        return path
+        paths = stream.close(metadata) if stream is not None else {}
+
+        # One pass over the findings feeds every remaining writer, each on its own thread
+        writers: Dict[str, Any] = {}
+        for name in self.formats:
+            if name in paths:
+                continue
+            if name == "html":
+                writers[name] = DashboardWriter(self.output_dir / f"sentinel_{self.timestamp}.html",
+                                                metadata, summary, render_row=self._render_row)
+            else:
+                cls = WRITERS[name]
+                writers[name] = cls(self.output_dir / f"sentinel_{self.timestamp}{cls.suffix}", flush_every=1000,
+                                    compression=self.compression)
+        writers["baseline"] = BaselineWriter(self.output_dir / f"baseline_{self.timestamp}.json")
+
+        source = in_ip_order(assessments) if self.compression else assessments
+        fan_out = ReportFanOut(writers)
+        try:
+            paths.update(fan_out.run(source, metadata))
+        except Exception:
+            if not fan_out.errors:
+                raise  # Reading the findings failed, not a writer: there is no complete run to record
+            # Index and record what the other writers finished, so retention and history still see the run
+            paths.update(fan_out.paths)
+            self.timings = fan_out.timings
+            self._record_run(paths, assessments, metadata)
+            raise
+        self.timings = fan_out.timings
+        self._record_run(paths, assessments, metadata)
+        return paths
+
+    def _record_run(self, paths: Dict[str, str], assessments: List[Dict], metadata: Dict) -> None:
+        """Add the run's files to the run index and its findings to the history database."""
+        self.runs.add(self.timestamp, self._run_files(paths.values()))
+        if self.history is not None:
+            self.history.record_run(assessments, run_id=metadata["report_id"], started_at=self.started_at,
+                                    tool_version=self.VERSION)
+            paths["history"] = str(self.history.path)
+
+    def _run_files(self, paths: Iterable[str]) -> List[str]:
+        """Report files plus their sidecars (chunk index, NDJSON metadata)."""
+        files = []
+        for p in map(Path, paths):
+            files.append(p.name)
+            for sidecar in (index_path(p), p.with_name(f"sentinel_{self.timestamp}.meta.json")):
+                if sidecar.exists():
+                    files.append(sidecar.name)
+        return files
+
+    def apply_retention(self, retention_days: int = 30, compact_after_days: int = 7) -> Dict[str, int]:
+        """Compact and expire earlier runs in the reports directory (see RetentionPolicy)."""
+        return RetentionPolicy(self.output_dir, retention_days, compact_after_days, index=self.runs).apply()
 
     def _render_row(self, a: Dict) -> str:
         risk = (a.get("true_risk") or "").lower()
@@ -226,47 +338,43 @@ th {{ background:#f0f0f0; text-align:left; }}
 </tr>
 """
 
-    # ======================================================
-    # Baseline
-    # ======================================================
-
-    def _write_baseline(self, assessments: List[Dict]) -> Path:
-        path = self.output_dir / f"baseline_{self.timestamp}.json"
-
-        baseline = {
-            "created_at": utc_iso(),
-            "host_count": len(assessments),
-            "hash": stable_hash(assessments),
-        }
-
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(baseline, f, indent=2)
-
-        return path
-
-    def detect_drift(self, current_assessments: List[Dict]) -> Dict:
-        files = sorted(self.output_dir.glob("baseline_*.json"))
-        if not files:
-            return {"drift_detected": False, "message": "No baseline found."}
-
-        latest = files[-1]
-
-        with open(latest, "r", encoding="utf-8") as f:
-            baseline = json.load(f)
-
-        current_hash = stable_hash(current_assessments)
-
-        return {
+    def detect_drift(self, current_assessments: List[Dict], baseline_path: Optional[Path] = None) -> Dict:
+        """Compare a run with the latest earlier baseline, host by host.
+
+        The baseline is looked up in the run index (loose or archived). The
+        baseline written by this reporter's own run is skipped, so calling
+        this after generate_reports compares against the previous run.
+        """
+        if baseline_path is None:
+            run = self.runs.latest_baseline(exclude=self.timestamp)
+            if run is None:
+                return {"drift_detected": False, "message": "No baseline found."}
+            baseline = self.runs.read_baseline(run)
+        else:
+            with open(baseline_path, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+
+        if "hosts" not in baseline:
+            return {"drift_detected": False, "message": "Baseline predates the host index; re-run to create one."}
+
+        current = build_host_index(current_assessments)
+        digests = {ip: host_digest(ports) for ip, ports in current.items()}
+        current_hash = stable_hash(digests)
+
+        result = {
             "drift_detected": current_hash != baseline["hash"],
             "baseline_time": baseline.get("created_at"),
             "current_time": utc_iso(),
             "baseline_hash": baseline.get("hash"),
             "current_hash": current_hash,
-            "host_delta": len(current_assessments) - baseline.get("host_count", 0),
+            "host_delta": len(current) - baseline.get("host_count", 0),
         }
+        if result["drift_detected"]:
+            result.update(diff_host_index(baseline["hosts"], current, digests))
+        return result
 
     # ======================================================
-    # Summary + MITRE
+    # Summary
     # ======================================================
 
     def _generate_summary(self, assessments: List[Dict]) -> Dict:
@@ -294,10 +402,6 @@ th {{ background:#f0f0f0; text-align:left; }}
 
         return summary
 
-    def _extract_mitre(self, assessment: Dict) -> str:
-        findings = safe_get(assessment, ["context","mitre_findings"], [])
-        return ";".join(f.get("technique","") for f in findings[:5])
-
 
 def write_reports(results: List[Dict]) -> Dict[str, str]:
     reporter = SOCReporter()
@@ -0,0 +1,248 @@
+﻿"""
+Report retention and compaction.
+Keeps an index of the runs in the reports directory, rolls older runs into weekly archives and deletes expired ones.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+ARCHIVE_DIR = "archive"
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+_RUN_FILE = re.compile(r"^(sentinel|baseline)_(\d{8}_\d{6})\.")
+_STORED_SUFFIXES = (".gz", ".zst", ".zip")  # Already compressed; deflating again only costs time
+
+
+def run_time(timestamp: str) -> datetime:
+    return datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+
+
+def archive_name(timestamp: str) -> str:
+    """Weekly archive a run belongs to, e.g. archive/2026-W41.zip (ISO weeks)."""
+    year, week, _ = run_time(timestamp).isocalendar()
+    return f"{ARCHIVE_DIR}/{year}-W{week:02d}.zip"
+
+
+class RunIndex:
+    """index.json: every run in the reports directory and where its files live.
+
+    The reporter adds each run as it writes it, so finding the latest
+    baseline is a lookup instead of a directory glob. A missing index is
+    rebuilt once from the directory and the weekly archives.
+    """
+
+    def __init__(self, output_dir: str = "reports"):
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / INDEX_FILE
+        self._runs: Optional[Dict[str, Dict]] = None
+
+    @property
+    def runs(self) -> Dict[str, Dict]:
+        if self._runs is None:
+            self._runs = self._load()
+        return self._runs
+
+    def _load(self) -> Dict[str, Dict]:
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                return {run["timestamp"]: run for run in json.load(f)["runs"]}
+        runs = self._scan()
+        if runs:
+            logger.info(f"Rebuilt run index from {self.output_dir}: {len(runs)} runs")
+        return runs
+
+    def _scan(self) -> Dict[str, Dict]:
+        runs: Dict[str, Dict] = {}
+        if not self.output_dir.exists():
+            return runs
+        for entry in os.scandir(self.output_dir):
+            match = _RUN_FILE.match(entry.name)
+            if entry.is_file() and match:
+                self._entry(runs, match.group(2))["files"].append(entry.name)
+        archive_dir = self.output_dir / ARCHIVE_DIR
+        if archive_dir.is_dir():
+            for entry in os.scandir(archive_dir):
+                if not entry.name.endswith(".zip"):
+                    continue
+                with zipfile.ZipFile(entry.path) as archive:
+                    for name in archive.namelist():
+                        match = _RUN_FILE.match(name)
+                        if match:
+                            run = self._entry(runs, match.group(2))
+                            run["archive"] = f"{ARCHIVE_DIR}/{entry.name}"
+                            if name not in run["files"]:
+                                run["files"].append(name)
+        for run in runs.values():
+            run["files"].sort()
+            run["baseline"] = next((f for f in run["files"] if f.startswith("baseline_")), None)
+        return runs
+
+    @staticmethod
+    def _entry(runs: Dict[str, Dict], timestamp: str) -> Dict:
+        return runs.setdefault(timestamp, {"run_id": f"sentinel_{timestamp}", "timestamp": timestamp,
+                                           "files": [], "baseline": None, "archive": None})
+
+    def save(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"index_version": 1, "runs": self.ordered()}, f, indent=2)
+        os.replace(tmp, self.path)  # Readers never see a half-written index
+
+    def ordered(self) -> List[Dict]:
+        """Runs, oldest first."""
+        return [self.runs[ts] for ts in sorted(self.runs)]
+
+    def add(self, timestamp: str, files: Iterable[str]) -> Dict:
+        """Record a run's files (names relative to the reports directory) and save the index."""
+        run = self._entry(self.runs, timestamp)
+        run["files"] = sorted(set(run["files"]) | {Path(f).name for f in files})
+        run["baseline"] = next((f for f in run["files"] if f.startswith("baseline_")), None)
+        self.save()
+        return run
+
+    def latest_baseline(self, exclude: Optional[str] = None) -> Optional[Dict]:
+        """Newest run with a baseline, skipping the run with timestamp `exclude`."""
+        for run in reversed(self.ordered()):
+            if run["baseline"] and run["timestamp"] != exclude:
+                return run
+        return None
+
+    def read_baseline(self, run: Dict) -> Dict:
+        """A run's baseline JSON, from the reports directory or its weekly archive."""
+        loose = self.output_dir / run["baseline"]
+        if loose.exists():
+            with open(loose, "r", encoding="utf-8") as f:
+                return json.load(f)
+        with zipfile.ZipFile(self.output_dir / run["archive"]) as archive:
+            return json.loads(archive.read(run["baseline"]).decode("utf-8"))
+
+
+class RetentionPolicy:
+    """Enforces RETENTION_DAYS on the reports directory.
+
+    Runs older than `compact_after_days` are moved into weekly zip archives
+    (already compressed reports are stored, the rest deflated); runs older
+    than `retention_days` are dropped from the index and their members are
+    removed from the weekly archive (so a rebuilt index cannot bring them
+    back); an archive is deleted once none of its runs remain. The newest run
+    is always kept so drift detection has a baseline.
+    """
+
+    def __init__(self, output_dir: str = "reports", retention_days: int = 30,
+                 compact_after_days: int = 7, index: Optional[RunIndex] = None):
+        self.output_dir = Path(output_dir)
+        self.retention_days = retention_days
+        self.compact_after_days = compact_after_days
+        self.index = index or RunIndex(output_dir)
+
+    def apply(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        now = now or datetime.now()
+        stats = {"runs_expired": 0, "runs_compacted": 0, "archives_removed": 0, "bytes_freed": 0}
+        runs = self.index.ordered()
+        if not runs:
+            return stats
+        newest = runs[-1]["timestamp"]
+        expired: Dict[str, Set[str]] = {}  # Archive -> members of expired runs
+
+        for run in runs:
+            if run["timestamp"] == newest:
+                continue
+            age = now - run_time(run["timestamp"])
+            if self.retention_days > 0 and age > timedelta(days=self.retention_days):
+                stats["bytes_freed"] += self._delete_loose(run)
+                if run["archive"] is not None:
+                    expired.setdefault(run["archive"], set()).update(run["files"])
+                del self.index.runs[run["timestamp"]]
+                stats["runs_expired"] += 1
+            elif run["archive"] is None and age > timedelta(days=self.compact_after_days):
+                self._compact(run)
+                self.index.save()  # Archived before the loose copies go, so a crash loses nothing
+                stats["bytes_freed"] += self._delete_loose(run)
+                stats["runs_compacted"] += 1
+            elif run["archive"] is not None:
+                stats["bytes_freed"] += self._delete_loose(run)  # Left over from an interrupted compaction
+
+        referenced = {run["archive"] for run in self.index.runs.values() if run["archive"]}
+        for name in referenced & set(expired):
+            stats["bytes_freed"] += self._prune(name, expired[name])
+        archive_dir = self.output_dir / ARCHIVE_DIR
+        if archive_dir.is_dir():
+            for entry in os.scandir(archive_dir):
+                if entry.name.endswith(".zip") and f"{ARCHIVE_DIR}/{entry.name}" not in referenced:
+                    stats["bytes_freed"] += entry.stat().st_size
+                    os.remove(entry.path)
+                    stats["archives_removed"] += 1
+
+        self.index.save()
+        if stats["runs_expired"] or stats["runs_compacted"]:
+            logger.info(f"Retention: {stats['runs_compacted']} runs compacted, {stats['runs_expired']} expired, "
+                        f"{stats['archives_removed']} archives removed, {stats['bytes_freed']} bytes freed")
+        return stats
+
+    def _compact(self, run: Dict) -> None:
+        name = archive_name(run["timestamp"])
+        path = self.output_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with zipfile.ZipFile(path, "a") as archive:
+            present = set(archive.namelist())
+            for file_name in run["files"]:
+                source = self.output_dir / file_name
+                if file_name in present or not source.exists():
+                    continue
+                stored = file_name.endswith(_STORED_SUFFIXES)
+                archive.write(source, file_name, compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+        run["archive"] = name
+
+    def _prune(self, name: str, members: Set[str]) -> int:
+        """Rewrite a weekly archive without `members`. Returns the bytes freed."""
+        path = self.output_dir / name
+        if not path.exists():
+            return 0
+        before = path.stat().st_size
+        tmp = path.with_name(path.name + ".tmp")
+        with zipfile.ZipFile(path) as source, zipfile.ZipFile(tmp, "w") as target:
+            for info in source.infolist():
+                if info.filename in members:
+                    continue
+                with source.open(info) as src, target.open(info, "w") as dst:
+                    shutil.copyfileobj(src, dst)
+        os.replace(tmp, path)  # The old archive stays intact until the new one is complete
+        return before - path.stat().st_size
+
+    def _delete_loose(self, run: Dict) -> int:
+        freed = 0
+        for file_name in run["files"]:
+            path = self.output_dir / file_name
+            if path.exists():
+                freed += path.stat().st_size
+                path.unlink()
+        return freed
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Standalone job for the scheduler: python src/retention.py [--dir reports]."""
+    load_dotenv("config.env")
+    parser = argparse.ArgumentParser(description="Compact and expire SentinelSweep reports")
+    parser.add_argument("--dir", default="reports")
+    parser.add_argument("--days", type=int, default=int(os.getenv("RETENTION_DAYS", "30")))
+    parser.add_argument("--compact-after", type=int, default=int(os.getenv("COMPACT_AFTER_DAYS", "7")))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(RetentionPolicy(args.dir, args.days, args.compact_after).apply()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 ﻿from typing import List, Dict, Tuple, Optional
 import datetime
 
+try:
+    from .targets import ip_to_int, int_to_ip
+except ImportError:
+    from targets import ip_to_int, int_to_ip
+
 MITRE_ATTACK_MAP = {
     21: {'technique': 'T1071.001', 'tactic': 'Command and Control', 'name': 'FTP', 'risk': 'MEDIUM'},
     22: {'technique': 'T1021.004', 'tactic': 'Lateral Movement', 'name': 'SSH', 'risk': 'HIGH'},
@@ -15,38 +20,55 @@ MITRE_ATTACK_MAP = {
     8443: {'technique': 'T1190', 'tactic': 'Initial Access', 'name': 'HTTPS-Alt', 'risk': 'MEDIUM'}
 }
 
+# Severity order; FindingStore encodes risk levels by index into this list
+RISK_LEVELS = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+
+
+def mitre_findings_for(open_ports: List[int]) -> List[Dict]:
+    findings = []
+    for port in open_ports:
+        if port in MITRE_ATTACK_MAP:
+            mitre_data = MITRE_ATTACK_MAP[port]
+            findings.append({
+                'port': port,
+                'technique': mitre_data['technique'],
+                'tactic': mitre_data['tactic'],
+                'service': mitre_data['name'],
+                'risk': mitre_data['risk']
+            })
+    return findings
+
+
+def recommendations_for(open_ports: List[int]) -> List[str]:
+    recommendations = []
+    for port in open_ports:
+        if port not in MITRE_ATTACK_MAP:
+            continue
+        if port == 3389:
+            recommendations.append("Restrict RDP to VPN or jump host")
+        elif port == 22:
+            recommendations.append("Implement SSH key authentication only")
+        elif port == 80 and 443 not in open_ports:
+            recommendations.append("Redirect HTTP to HTTPS")
+        elif port == 445:
+            recommendations.append("Restrict SMB to internal subnets only")
+    
+    if 3389 in open_ports and 445 in open_ports:
+        recommendations.append("CRITICAL: Both RDP and SMB exposed")
+    return recommendations
+
+
 class SOCRiskEngine:
     def __init__(self):
         self.findings = []
         self.risk_scores = {'LOW': 1, 'MEDIUM': 3, 'HIGH': 6, 'CRITICAL': 10}
     
-    def assess_exposure(self, ip: str, open_ports: List[int], triage_data: Optional[Dict] = None) -> Dict:
-        port_details = triage_data if triage_data else {}
-        
+    def _score_ports(self, open_ports: List[int]) -> Tuple[int, str]:
+        """Sum of MITRE risk weights and the resulting initial risk level."""
         risk_score = 0
-        mitre_findings = []
-        recommendations = []
-        
         for port in open_ports:
             if port in MITRE_ATTACK_MAP:
-                mitre_data = MITRE_ATTACK_MAP[port]
-                mitre_findings.append({
-                    'port': port,
-                    'technique': mitre_data['technique'],
-                    'tactic': mitre_data['tactic'],
-                    'service': mitre_data['name'],
-                    'risk': mitre_data['risk']
-                })
-                risk_score += self.risk_scores[mitre_data['risk']]
-                
-                if port == 3389:
-                    recommendations.append("Restrict RDP to VPN or jump host")
-                elif port == 22:
-                    recommendations.append("Implement SSH key authentication only")
-                elif port == 80 and 443 not in open_ports:
-                    recommendations.append("Redirect HTTP to HTTPS")
-                elif port == 445:
-                    recommendations.append("Restrict SMB to internal subnets only")
+                risk_score += self.risk_scores[MITRE_ATTACK_MAP[port]['risk']]
         
         if risk_score >= 15:
             initial_risk_level = 'CRITICAL'
@@ -59,7 +81,20 @@ class SOCRiskEngine:
         
         if 3389 in open_ports and 445 in open_ports:
             initial_risk_level = 'CRITICAL'
-            recommendations.append("CRITICAL: Both RDP and SMB exposed")
+        
+        return risk_score, initial_risk_level
+    
+    def assess_exposure(self, ip: str, open_ports: List[int], triage_data: Optional[Dict] = None) -> Dict:
+        port_details = triage_data if triage_data else {}
+        
+        risk_score, initial_risk_level = self._score_ports(open_ports)
+        return self._build_finding(ip, open_ports, initial_risk_level, risk_score,
+                                   self._determine_network_segment(ip), port_details)
+    
+    def _build_finding(self, ip: str, open_ports: List[int], initial_risk_level: str, risk_score: int,
+                       network_segment: str, port_details: Dict) -> Dict:
+        mitre_findings = mitre_findings_for(open_ports)
+        recommendations = recommendations_for(open_ports)
         
         enhanced_finding = {
             'ip': ip,
@@ -71,7 +106,7 @@ class SOCRiskEngine:
             'context': {
                 'mitre_findings': mitre_findings,
                 'asset_owner': 'Unknown',
-                'network_segment': self._determine_network_segment(ip),
+                'network_segment': network_segment,
                 'triage_details': port_details.get('details', {})
             },
             'transferable_data': {
@@ -95,6 +130,91 @@ class SOCRiskEngine:
         
         return enhanced_finding
     
+    def record(self, store, ip: str, open_ports: List[int], triage_data: Optional[Dict] = None) -> int:
+        """Assess like assess_exposure but append straight into a FindingStore. Returns the row."""
+        port_details = triage_data if triage_data else {}
+        risk_score, initial_risk_level = self._score_ports(open_ports)
+        adjusted = 'final_risk' in port_details
+        
+        return store.append(
+            ip, open_ports, initial_risk_level,
+            port_details['final_risk'] if adjusted else initial_risk_level,
+            risk_score, self._determine_network_segment(ip),
+            risk_adjusted=adjusted,
+            verification=port_details.get('verification', 'Standard port detection'),
+            reliability=port_details.get('reliability', 'MEDIUM'),
+            adjustment_reason=port_details.get('adjustment_reason', 'Contextual triage applied') if adjusted else None,
+            details=port_details.get('details')
+        )
+    
+    def assess_batch(self, ips, ports_matrix, ports: Optional[List[int]] = None, store=None):
+        """Score a whole sweep with NumPy array operations (no triage data).
+        
+        `ports_matrix` is either an N x P boolean matrix of open ports whose
+        columns are labelled by `ports`, or (with `ports` omitted) N lists of
+        open ports. Returns per-host dicts identical to assess_exposure(ip,
+        open_ports), or bulk-appends the rows to `store` and returns it.
+        """
+        import numpy as np
+        
+        n = len(ips)
+        if ports is None:
+            ragged = [list(row) for row in ports_matrix]
+            ports = sorted({port for row in ragged for port in row})
+            column = {port: j for j, port in enumerate(ports)}
+            matrix = np.zeros((n, len(ports)), dtype=bool)
+            for i, row in enumerate(ragged):
+                matrix[i, [column[port] for port in row]] = True
+            counts = np.fromiter((len(row) for row in ragged), dtype=np.int64, count=n)
+            flat_ports = np.fromiter((port for row in ragged for port in row), dtype=np.int64,
+                                     count=int(counts.sum()))
+        else:
+            ragged = None
+            matrix = np.asarray(ports_matrix, dtype=bool).reshape(n, len(ports))
+            counts = matrix.sum(axis=1)
+            flat_ports = np.asarray(ports, dtype=np.int64)[np.nonzero(matrix)[1]]
+        
+        # Risk score: open-port matrix times per-port MITRE weights
+        weights = np.array([self.risk_scores[MITRE_ATTACK_MAP[p]['risk']] if p in MITRE_ATTACK_MAP else 0
+                            for p in ports], dtype=np.int64)
+        scores = matrix.astype(np.int64) @ weights if len(ports) else np.zeros(n, dtype=np.int64)
+        
+        # Index into RISK_LEVELS via the 5/10/15 cut-offs, then the RDP+SMB escalation
+        levels = ((scores >= 5).astype(np.uint8) + (scores >= 10) + (scores >= 15)).astype(np.uint8)
+        if 3389 in ports and 445 in ports:
+            both = matrix[:, ports.index(3389)] & matrix[:, ports.index(445)]
+            levels[both] = RISK_LEVELS.index('CRITICAL')
+        
+        # Vector form of _determine_network_segment
+        segment_labels = ['General_Network', 'Internal_Management', 'User_Network', 'Server_Farm']
+        addresses = [ip_to_int(ip) if isinstance(ip, str) else int(ip) for ip in ips]
+        # IPv6 rows do not fit uint32: they score as 0 here (General_Network) and keep their address aside
+        ipv6 = {i: address for i, address in enumerate(addresses)
+                if address > 0xFFFFFFFF or (isinstance(ips[i], str) and ':' in ips[i])}
+        ip_ints = np.fromiter((0 if i in ipv6 else address for i, address in enumerate(addresses)),
+                              dtype=np.uint32, count=n)
+        segments = np.zeros(n, dtype=np.uint8)
+        segments[(ip_ints >> 8) == 0xC0A80A] = 1
+        segments[(ip_ints >> 8) == 0xC0A814] = 2
+        segments[(ip_ints >> 16) == 0x0A00] = 3
+        
+        if store is not None:
+            store.extend_columns(ip_ints, flat_ports, counts, levels, scores, segment_labels, segments, ipv6=ipv6)
+            return store
+        
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        flat = flat_ports.tolist()
+        results = []
+        for i in range(n):
+            if isinstance(ips[i], str):
+                ip = ips[i]
+            else:
+                ip = int_to_ip(ipv6[i], 6) if i in ipv6 else int_to_ip(int(ip_ints[i]))
+            open_ports = ragged[i] if ragged is not None else flat[offsets[i]:offsets[i + 1]]
+            results.append(self._build_finding(ip, open_ports, RISK_LEVELS[levels[i]], int(scores[i]),
+                                               segment_labels[segments[i]], {}))
+        return results
+    
     def _determine_network_segment(self, ip: str) -> str:
         if ip.startswith('192.168.10.'):
             return 'Internal_Management'
@@ -106,6 +226,10 @@ class SOCRiskEngine:
             return 'General_Network'
     
     def generate_executive_summary(self, assessments: List[Dict]) -> Dict:
+        # A FindingStore summarises from its columns without building dicts
+        if hasattr(assessments, 'executive_summary'):
+            return assessments.executive_summary()
+        
         summary = {
             'total_hosts': len(assessments),
             'hosts_with_exposure': 0,
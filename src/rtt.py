@@ -0,0 +1,102 @@
+﻿"""
+Adaptive probe timeouts.
+Per-/24 connect RTT statistics and the per-probe deadlines derived from them.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+try:
+    from .rate_limiter import ProbePacer
+except ImportError:
+    from rate_limiter import ProbePacer
+
+
+class _SubnetRTT:
+    """Recent connect RTTs of one subnet and the deadline they imply."""
+
+    __slots__ = ('samples', 'next', 'deadline')
+
+    def __init__(self):
+        self.samples: List[float] = []
+        self.next = 0  # Ring position of the next sample once the window is full
+        self.deadline: Optional[float] = None  # Cached; cleared by every new sample
+
+
+class RTTEstimator:
+    """Derives connect timeouts from RTTs measured per /24 (/64 for IPv6).
+
+    Every answered connect, a SYN-ACK or an RST, is an RTT sample for its
+    subnet. A subnet's deadline is the `percentile` of its last `window`
+    samples times `multiplier` plus `margin`, clamped to
+    [min_timeout, max_timeout]. Until `min_samples` answers have been seen
+    the subnet gets max_timeout, so slow WAN links are never cut short
+    before they have been measured. A probe that times out is retransmitted
+    up to `retransmits` times with a doubled deadline; as each attempt is a
+    fresh connect, a late answer is still an unambiguous sample.
+    """
+
+    def __init__(self, min_timeout: float = 0.05, max_timeout: float = 1.5, percentile: float = 0.95,
+                 multiplier: float = 2.0, margin: float = 0.02, window: int = 16, min_samples: int = 3,
+                 retransmits: int = 1):
+        if not 0 < min_timeout <= max_timeout:
+            raise ValueError("need 0 < min_timeout <= max_timeout")
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.margin = margin
+        self.window = window
+        self.min_samples = min_samples
+        self.retransmits = retransmits
+        self._lock = threading.Lock()
+        self._subnets: Dict[str, _SubnetRTT] = {}
+        self.stats = {'samples': 0, 'timeouts': 0, 'retransmits': 0, 'answered_after_retransmit': 0}
+
+    def observe(self, ip: str, rtt: float, attempt: int = 0) -> None:
+        """Record the RTT of an answered connect (attempt > 0 for a retransmission)."""
+        key = ProbePacer.subnet_key(ip)
+        with self._lock:
+            subnet = self._subnets.get(key)
+            if subnet is None:
+                subnet = self._subnets[key] = _SubnetRTT()
+            if len(subnet.samples) < self.window:
+                subnet.samples.append(rtt)
+            else:
+                subnet.samples[subnet.next] = rtt
+                subnet.next = (subnet.next + 1) % self.window
+            subnet.deadline = None
+            self.stats['samples'] += 1
+            if attempt:
+                self.stats['answered_after_retransmit'] += 1
+
+    def deadline(self, ip: str) -> float:
+        """Timeout for the first connect attempt to `ip`."""
+        subnet = self._subnets.get(ProbePacer.subnet_key(ip))
+        if subnet is None or len(subnet.samples) < self.min_samples:
+            return self.max_timeout
+        deadline = subnet.deadline
+        if deadline is None:
+            with self._lock:
+                ordered = sorted(subnet.samples)
+            estimate = ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+            deadline = subnet.deadline = min(self.max_timeout,
+                                             max(self.min_timeout, estimate * self.multiplier + self.margin))
+        return deadline
+
+    def on_timeout(self, ip: str, attempt: int, deadline: float) -> Optional[float]:
+        """Deadline for retransmission number `attempt`, or None when the probe gives up."""
+        with self._lock:
+            self.stats['timeouts'] += 1
+            if attempt > self.retransmits:
+                return None
+            self.stats['retransmits'] += 1
+        return min(self.max_timeout, deadline * 2)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = self.stats.copy()
+            stats['rtt_subnets'] = len(self._subnets)
+        deadlines = sorted(d for d in (s.deadline for s in list(self._subnets.values())) if d is not None)
+        stats['median_deadline'] = round(deadlines[len(deadlines) // 2], 4) if deadlines else None
+        return stats
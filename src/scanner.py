@@ -3,37 +3,82 @@ Defensive network scanner with Windows Defender-safe practices.
 Rate-limited TCP connect scanning only.
 """
 
+import errno
 import socket
 import time
-import ipaddress
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Sequence
 import logging
 
+try:
+    from .rate_limiter import ProbePacer
+    from .rtt import RTTEstimator
+    from .targets import TargetSpace
+except ImportError:
+    from rate_limiter import ProbePacer
+    from rtt import RTTEstimator
+    from targets import TargetSpace
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# connect_ex results that are an answer from the host (SYN-ACK or RST), and so an RTT sample
+_ANSWERED = {0, errno.ECONNREFUSED, getattr(errno, 'WSAECONNREFUSED', 10061)}
+
 class DefenderSafeScanner:
     """Windows Defender-safe TCP scanner with rate limiting."""
     
-    def __init__(self, timeout: float = 1.5, max_workers: int = 50):
+    # Probes per second to one host; matches the historical 0.25s delay
+    DEFAULT_HOST_RATE = 4.0
+    
+    def __init__(self, timeout: float = 1.5, max_workers: int = 50, pacer: Optional[ProbePacer] = None,
+                 keep_connections: bool = False, rtt: Optional[RTTEstimator] = None):
         self.timeout = timeout
+        # When set, per-subnet RTTs replace the fixed timeout and timed-out probes are retransmitted
+        self.rtt = rtt
         self.max_workers = max_workers
+        self.pacer = pacer if pacer is not None else ProbePacer(host_rate=self.DEFAULT_HOST_RATE)
+        # When set, open sockets are kept for triage instead of being closed
+        self.keep_connections = keep_connections
+        self._connections: Dict[Tuple[str, int], socket.socket] = {}
         self.scan_stats = {'hosts_scanned': 0, 'ports_checked': 0, 'open_ports_found': 0}
     
-    def safe_tcp_connect(self, ip: str, port: int) -> Tuple[int, bool]:
-        """Single TCP connection attempt with explicit error handling."""
+    def safe_tcp_connect(self, ip: str, port: int, pacer: Optional[ProbePacer] = None) -> Tuple[int, bool]:
+        """TCP connection attempt (retransmitted on timeout when adaptive) with explicit error handling."""
+        sock = None
         try:
-            # Windows Defender-safe: Explicit TCP connect (not SYN)
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(self.timeout)
-            
-            # Connect attempt
-            result = sock.connect_ex((ip, port))
-            sock.close()
+            deadline = self.rtt.deadline(ip) if self.rtt else self.timeout
+            attempt = 0
+            while True:
+                # Rate limiting to avoid Defender detection: pace emission, not collection
+                (pacer or self.pacer).acquire(ip)
+                
+                # Windows Defender-safe: Explicit TCP connect (not SYN)
+                sock = socket.socket(socket.AF_INET6 if ':' in ip else socket.AF_INET, socket.SOCK_STREAM)
+                sock.settimeout(deadline)
+                
+                # Connect attempt
+                started = time.monotonic()
+                result = sock.connect_ex((ip, port))
+                elapsed = time.monotonic() - started
+                if self.rtt is None:
+                    break
+                if result in _ANSWERED:
+                    self.rtt.observe(ip, elapsed, attempt)
+                    break
+                if elapsed < deadline:
+                    break  # Failed for some other reason; retrying will not help
+                attempt += 1
+                deadline = self.rtt.on_timeout(ip, attempt, deadline)
+                if deadline is None:
+                    break
+                sock.close()
+            is_open = result == 0
+            if is_open and self.keep_connections:
+                self._connections[(ip, port)] = sock
+                sock = None  # Handed over; take_connection's caller closes it
             
             self.scan_stats['ports_checked'] += 1
-            is_open = result == 0
             
             if is_open:
                 self.scan_stats['open_ports_found'] += 1
@@ -49,39 +94,65 @@ class DefenderSafeScanner:
         except Exception as e:
             logger.error(f"Unexpected error on {ip}:{port} - {e}")
             return port, False
+        finally:
+            if sock is not None:
+                sock.close()
     
-    def scan_host(self, ip: str, ports: List[int], delay: float = 0.25) -> List[int]:
-        """Scan a single host with rate limiting."""
+    def scan_host(self, ip: str, ports: List[int], delay: Optional[float] = None) -> List[int]:
+        """Scan a single host with rate limiting.
+        
+        Probes are paced by the scanner's ProbePacer. An explicit `delay` (legacy
+        seconds between probes) overrides it with an equivalent per-host rate.
+        """
         open_ports = []
+        pacer = ProbePacer.from_delay(delay) if delay is not None else None
         
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = {executor.submit(self.safe_tcp_connect, ip, port): port for port in ports}
+            futures = {executor.submit(self.safe_tcp_connect, ip, port, pacer): port for port in ports}
             
             for future in as_completed(futures):
                 port, is_open = future.result()
                 if is_open:
                     open_ports.append(port)
-                
-                # Rate limiting to avoid Defender detection
-                time.sleep(delay)
         
         self.scan_stats['hosts_scanned'] += 1
         return sorted(open_ports)
     
-    def validate_cidr(self, cidr: str) -> List[str]:
-        """Validate and expand CIDR notation."""
+    def take_connection(self, ip: str, port: int) -> Optional[socket.socket]:
+        """Hand over the established socket for an open port (keep_connections mode).
+        
+        The caller owns the socket afterwards, e.g. TriageEngine.triage_service(ip, port, sock=...).
+        """
+        return self._connections.pop((ip, port), None)
+    
+    def close_connections(self) -> None:
+        """Close any kept sockets nobody took."""
+        while self._connections:
+            _, sock = self._connections.popitem()
+            sock.close()
+    
+    def validate_cidr(self, cidr: str, exclude: Optional[str] = None) -> Sequence[str]:
+        """Validate and lazily expand CIDR notation.
+        
+        Accepts comma-separated CIDRs, ranges (10.0.0.1-10.0.0.50 or 10.0.0.1-50)
+        and single addresses, minus any `exclude` specs. Addresses are produced on
+        demand; len() and indexing work without materialising the list.
+        """
         try:
-            network = ipaddress.ip_network(cidr, strict=False)
-            return [str(ip) for ip in network.hosts()]
+            return TargetSpace(cidr, exclude=exclude).hosts()
         except ValueError as e:
             logger.error(f"Invalid CIDR: {e}")
             return []
     
     def get_stats(self) -> Dict:
-        """Return scanning statistics."""
-        return self.scan_stats.copy()
+        """Return scanning statistics, including configured vs. achieved probe rate."""
+        stats = self.scan_stats.copy()
+        stats.update(self.pacer.get_stats())
+        if self.rtt:
+            stats.update(self.rtt.get_stats())
+        return stats
 
 # Legacy function for backward compatibility
-def scan_host(ip: str, ports: List[int], timeout: float = 1.5, delay: float = 0.25) -> List[int]:
+def scan_host(ip: str, ports: List[int], timeout: float = 1.5, delay: Optional[float] = 0.25) -> List[int]:
     scanner = DefenderSafeScanner(timeout=timeout)
     return scanner.scan_host(ip, ports, delay)
@@ -0,0 +1,33 @@
+﻿"""
+Probe scheduling.
+Orders a sweep port-major by MITRE risk weight so the most dangerous exposures are found first.
+"""
+
+from typing import Dict, List, Optional
+
+try:
+    from .risk_engine import MITRE_ATTACK_MAP, SOCRiskEngine
+except ImportError:
+    from risk_engine import MITRE_ATTACK_MAP, SOCRiskEngine
+
+
+def port_weight(port: int, risk_scores: Optional[Dict[str, int]] = None) -> int:
+    """Risk weight of a port as scored by the risk engine (0 for ports outside the MITRE map)."""
+    risk_scores = risk_scores or SOCRiskEngine().risk_scores
+    return risk_scores[MITRE_ATTACK_MAP[port]['risk']] if port in MITRE_ATTACK_MAP else 0
+
+
+def probe_passes(ports: List[int], risk_scores: Optional[Dict[str, int]] = None) -> List[List[int]]:
+    """Split `ports` into sweep passes, one per risk weight, highest weight first.
+
+    Each pass is swept across every host before the next one starts, so
+    with the default weights SMB and RDP are checked on the whole range
+    before SSH, Telnet and VNC, and those before the web ports. Every host
+    gets only a pass's few ports at a time, which spreads the per-host
+    load over the run. Ports keep their configured order within a pass.
+    """
+    risk_scores = risk_scores or SOCRiskEngine().risk_scores
+    passes: Dict[int, List[int]] = {}
+    for port in ports:
+        passes.setdefault(port_weight(port, risk_scores), []).append(port)
+    return [passes[weight] for weight in sorted(passes, reverse=True)]
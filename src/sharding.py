@@ -0,0 +1,317 @@
+﻿"""
+Multi-process sharded sweeps.
+Splits the target space across worker processes, each running its own sweep pipeline, and merges their findings.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from .async_scanner import AsyncScanner
+    from .async_triage import AsyncTriageEngine
+    from .checkpoint import ScanCheckpoint
+    from .discovery import HostDiscovery
+    from .finding_store import FindingStore
+    from .pipeline import SweepPipeline
+    from .rate_limiter import ProbePacer
+    from .risk_engine import SOCRiskEngine
+    from .rtt import RTTEstimator
+    from .scheduler import probe_passes
+except ImportError:
+    from async_scanner import AsyncScanner
+    from async_triage import AsyncTriageEngine
+    from checkpoint import ScanCheckpoint
+    from discovery import HostDiscovery
+    from finding_store import FindingStore
+    from pipeline import SweepPipeline
+    from rate_limiter import ProbePacer
+    from risk_engine import SOCRiskEngine
+    from rtt import RTTEstimator
+    from scheduler import probe_passes
+
+logger = logging.getLogger(__name__)
+
+# Scanner and triage settings of each worker; totals are divided between the shards
+DEFAULT_OPTIONS = {
+    'timeout': 1.5,
+    'max_concurrency': 2000,
+    'rate': 0.0,
+    'host_rate': 4.0,
+    'subnet_rate': 0.0,
+    'adaptive_timeout': True,
+    'min_timeout': 0.05,
+    'triage_concurrency': 500,
+    'triage_ports': None,
+    'discovery_ports': None,  # TCP-ping ports of the host discovery stage; None scans every address
+    'port_priority': False,  # Sweep the ports in passes by risk weight (scheduler.probe_passes)
+}
+
+
+def shard_count(processes: int, checkpoint: Optional[ScanCheckpoint] = None) -> int:
+    """Worker count for a run (0 = one per CPU core).
+
+    A resumed run keeps the layout it was checkpointed with: its shard count,
+    or a single process if it was not sharded and already made progress.
+    """
+    if checkpoint is not None:
+        shards = len(list(checkpoint.path.glob("shard-*")))
+        if shards:
+            return shards
+        if checkpoint.next_host or checkpoint.findings or checkpoint._done:
+            return 1
+    return processes or os.cpu_count() or 1
+
+
+def scanner_options(scanner: AsyncScanner, triage_concurrency: int = 500, triage_ports=None,
+                    discovery_ports: Optional[List[int]] = None) -> Dict:
+    """Worker options that reproduce a configured scanner (and its pacer and RTT estimator) in every shard."""
+    return {
+        'timeout': scanner.timeout,
+        'max_concurrency': scanner.max_concurrency,
+        'rate': scanner.pacer.rate or 0.0,
+        'host_rate': scanner.pacer.host_rate or 0.0,
+        'subnet_rate': scanner.pacer.subnet_rate or 0.0,
+        'adaptive_timeout': scanner.rtt is not None,
+        'min_timeout': scanner.rtt.min_timeout if scanner.rtt else DEFAULT_OPTIONS['min_timeout'],
+        'triage_concurrency': triage_concurrency,
+        'triage_ports': triage_ports,
+        'discovery_ports': discovery_ports,
+    }
+
+
+def build_engines(options: Dict, share: int = 1) -> Tuple[AsyncScanner, AsyncTriageEngine]:
+    """Scanner and triage engine for a worker running 1/`share` of a sweep configured by `options`."""
+    rtt = None
+    if options['adaptive_timeout']:
+        rtt = RTTEstimator(min_timeout=min(options['min_timeout'], options['timeout']),
+                           max_timeout=options['timeout'])
+    # Workers own disjoint hosts and /24s, so only the global rate is split
+    pacer = ProbePacer(rate=options['rate'] / share, host_rate=options['host_rate'],
+                       subnet_rate=options['subnet_rate'])
+    scanner = AsyncScanner(timeout=options['timeout'], pacer=pacer, rtt=rtt,
+                           max_concurrency=max(1, options['max_concurrency'] // share))
+    return scanner, AsyncTriageEngine(max_concurrency=max(1, options['triage_concurrency'] // share))
+
+
+def build_discovery(options: Dict, scanner: AsyncScanner) -> Optional[HostDiscovery]:
+    """Host discovery stage for a worker, or None when the options leave it off."""
+    return HostDiscovery(scanner, options['discovery_ports']) if options.get('discovery_ports') else None
+
+
+# Per-shard settings that are the same in every shard rather than additive counters
+_SHARED_STATS = {'configured_host_rate', 'configured_subnet_rate', 'median_deadline'}
+
+
+def _merge_stats(parts: List[Dict]) -> Dict:
+    """Sum numeric counters across shards; other values are taken from the first shard."""
+    merged: Dict = {}
+    for part in parts:
+        for key, value in part.items():
+            if key not in merged:
+                merged[key] = value
+            elif (key not in _SHARED_STATS and isinstance(value, (int, float)) and not isinstance(value, bool)
+                  and merged[key] is not None):
+                merged[key] += value
+    return merged
+
+
+# ======================================================
+# Worker process
+# ======================================================
+
+def _run_shard(index: int, count: int, spec: Dict, results) -> None:
+    """Sweep one shard and stream its findings to the parent in batches."""
+    options = spec['options']
+    checkpoint = None
+    try:
+        if spec['checkpoint_dir']:
+            name = f"shard-{index}"
+            if (Path(spec['checkpoint_dir']) / name / "state.json").exists():
+                checkpoint = ScanCheckpoint.load(spec['checkpoint_dir'], name, interval=spec['interval'])
+            else:
+                checkpoint = ScanCheckpoint.create(spec['checkpoint_dir'], name, spec['network'], spec['ports'],
+                                                   exclude=spec['exclude'], shuffle=spec['shuffle'],
+                                                   seed=spec['seed'], interval=spec['interval'],
+                                                   shard=(index, count), passes=spec['passes'])
+
+        scanner, triage_engine = build_engines(options, count)
+
+        if checkpoint is not None:
+            hosts = checkpoint.targets(scanner)
+            restored = FindingStore()
+            checkpoint.restore(restored)
+            batch = list(restored)
+            for start in range(0, len(batch), spec['batch_size']):
+                results.put(("restored", index, batch[start:start + spec['batch_size']], 0))
+        else:
+            hosts = scanner.validate_cidr(spec['network'], exclude=spec['exclude'])
+            if hosts:
+                hosts = hosts.shard(index, count)
+            if hosts and spec['shuffle']:
+                hosts = hosts.permuted(spec['seed'])
+
+        batch: List[Dict] = []
+        probes = 0
+        last_send = time.monotonic()
+
+        def send(force: bool = False) -> None:
+            nonlocal batch, probes, last_send
+            if force or len(batch) >= spec['batch_size'] or time.monotonic() - last_send >= 0.5:
+                if batch or probes:
+                    results.put(("findings", index, batch, probes))
+                batch, probes = [], 0
+                last_send = time.monotonic()
+
+        def on_finding(assessment: Dict) -> None:
+            batch.append(assessment)
+            send()
+
+        def on_probe(host: str, port: int, is_open: bool) -> None:
+            nonlocal probes
+            probes += 1
+            send()
+
+        pipeline = SweepPipeline(scanner, SOCRiskEngine(), triage_engine,
+                                 triage_workers=triage_engine.max_concurrency, triage_ports=options['triage_ports'],
+                                 on_finding=on_finding, on_probe=on_probe, collect=False,
+                                 checkpoint=checkpoint, discovery=build_discovery(options, scanner),
+                                 passes=spec['passes'])
+        pipeline.run(hosts, spec['ports'])
+        send(force=True)
+        results.put(("done", index, {'pipeline': pipeline.get_stats(), 'triage': triage_engine.get_stats()}, 0))
+    except KeyboardInterrupt:
+        pass  # The pipeline has saved the checkpoint; the parent reports the interruption
+    except Exception:
+        results.put(("error", index, traceback.format_exc(), 0))
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+
+# ======================================================
+# Coordinator
+# ======================================================
+
+class ShardedSweep:
+    """Runs one sweep as `processes` worker processes.
+
+    The target space is dealt out by whole /24 (TargetSpace.shard), each
+    worker runs its own scanner, triage engine and pipeline with its share
+    of the concurrency and global rate, and findings come back over a
+    queue in batches. The parent merges them into one FindingStore, so
+    summaries and reports are produced exactly as for a single process.
+
+    With a checkpoint, each worker checkpoints its shard under the run's
+    checkpoint directory (shard-<n>/) and a resumed run continues every
+    shard where it stopped.
+    """
+
+    def __init__(self, processes: int, network: Optional[str] = None, ports: Optional[List[int]] = None,
+                 exclude: Optional[str] = None, shuffle: bool = True, seed: Optional[int] = None,
+                 checkpoint: Optional[ScanCheckpoint] = None, batch_size: int = 256, **options):
+        unknown = set(options) - set(DEFAULT_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown sweep options: {', '.join(sorted(unknown))}")
+        self.processes = max(1, processes)
+        self.checkpoint = checkpoint
+        if checkpoint is not None:
+            network, ports = checkpoint.network, checkpoint.ports
+            exclude, shuffle, seed = checkpoint.exclude, checkpoint.shuffle, checkpoint.seed
+        if network is None or ports is None:
+            raise ValueError("network and ports are required without a checkpoint")
+        options = dict(DEFAULT_OPTIONS, **options)
+        if checkpoint is not None:
+            passes = checkpoint.passes
+        else:
+            passes = probe_passes(ports) if options['port_priority'] else [list(ports)]
+        self.spec = {
+            'network': network,
+            'ports': list(ports),
+            'exclude': exclude,
+            'shuffle': shuffle,
+            'seed': seed,
+            'batch_size': batch_size,
+            'checkpoint_dir': str(checkpoint.path) if checkpoint is not None else None,
+            'interval': checkpoint.interval if checkpoint is not None else 30.0,
+            'passes': passes,
+            'options': options,
+        }
+        self.stats: Dict = {}
+        self.triage_stats: Dict = {}
+
+    def run(self, store: Optional[FindingStore] = None,
+            on_finding: Optional[Callable[[Dict], None]] = None,
+            on_restored: Optional[Callable[[Dict], None]] = None,
+            on_progress: Optional[Callable[[int], None]] = None) -> FindingStore:
+        """Sweep every shard and return the merged findings.
+
+        `on_finding` sees each new finding, `on_restored` each finding a
+        resumed shard restored from its checkpoint, and `on_progress` the
+        number of probes done since its last call.
+        """
+        store = store if store is not None else FindingStore()
+        ctx = multiprocessing.get_context("spawn")  # Same behaviour on Windows and POSIX; no forked threads
+        results = ctx.Queue(maxsize=self.processes * 8)
+        workers = [ctx.Process(target=_run_shard, args=(i, self.processes, self.spec, results),
+                               name=f"sweep-shard-{i}", daemon=True) for i in range(self.processes)]
+        for worker in workers:
+            worker.start()
+        logger.info(f"Sweeping in {self.processes} processes")
+
+        pending = set(range(self.processes))
+        exited = set()
+        errors: Dict[int, str] = {}
+        done: List[Dict] = []
+        try:
+            while pending:
+                try:
+                    kind, index, payload, probes = results.get(timeout=1.0)
+                except queue.Empty:
+                    # A worker that exited without reporting (killed, out of memory) is failed once
+                    # a further wait shows nothing of it was still in the pipe
+                    for index in list(pending):
+                        if index in exited:
+                            errors[index] = f"exited with code {workers[index].exitcode}"
+                            pending.discard(index)
+                        elif workers[index].exitcode is not None:
+                            exited.add(index)
+                    continue
+                if kind == "findings" or kind == "restored":
+                    callback = on_finding if kind == "findings" else on_restored
+                    for assessment in payload:
+                        store.add_assessment(assessment)
+                        if callback:
+                            callback(assessment)
+                    if probes and on_progress:
+                        on_progress(probes)
+                elif kind == "done":
+                    done.append(payload)
+                    pending.discard(index)
+                else:
+                    errors[index] = payload
+                    pending.discard(index)
+        finally:
+            for worker in workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+
+        self.stats = _merge_stats([part['pipeline'] for part in done])
+        self.stats['shards'] = self.processes
+        self.triage_stats = _merge_stats([part['triage'] for part in done])
+        if errors:
+            for index, error in sorted(errors.items()):
+                logger.error(f"Shard {index} failed: {error}")
+            raise RuntimeError(f"{len(errors)} of {self.processes} shards failed"
+                               + ("; resume the run to finish them" if self.checkpoint is not None else ""))
+        return store
+
+    def get_stats(self) -> Dict:
+        """Merged pipeline and scanner statistics of the last run."""
+        return self.stats.copy()
@@ -0,0 +1,658 @@
+﻿"""
+SIEM forwarding.
+Batches findings to Elastic (_bulk), Splunk HEC or Azure Log Analytics over pooled HTTP connections, with retries and a disk spool.
+"""
+
+import base64
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from .spool_queue import SpoolQueue
+except ImportError:
+    from spool_queue import SpoolQueue
+
+logger = logging.getLogger(__name__)
+
+_FLUSH = object()
+_STOP = object()
+
+
+def siem_event(assessment: Dict) -> Dict:
+    """Flat event with the field names the shipped Splunk and Sentinel templates extract."""
+    context = assessment.get("context") or {}
+    findings = context.get("mitre_findings") or []
+    event = {
+        "ip": assessment.get("ip"),
+        "open_ports": assessment.get("open_ports", []),
+        "risk_level": assessment.get("true_risk"),
+        "initial_risk": assessment.get("initial_risk"),
+        "risk_score": assessment.get("risk_score", 0),
+        "risk_adjusted": bool(assessment.get("risk_adjusted")),
+        "network_segment": context.get("network_segment"),
+        "mitre_techniques": ";".join(f.get("technique", "") for f in findings[:5]),
+        "mitre_findings": findings,
+        "verification": assessment.get("verification"),
+        "timestamp": assessment.get("timestamp"),
+        "source": "SentinelSweep-SOC",
+    }
+    if assessment.get("adjustment_reason"):
+        event["adjustment_reason"] = assessment["adjustment_reason"]
+    if assessment.get("alert_reason"):  # Raised by the early alert channel (alerts.py)
+        event["alert"] = True
+        event["alert_reason"] = assessment["alert_reason"]
+    return event
+
+
+def _dumps(obj: Dict) -> bytes:
+    return json.dumps(obj, default=str, separators=(",", ":")).encode("utf-8")
+
+
+class TransientError(Exception):
+    """Delivery failed in a way worth retrying (network error, 429, 5xx)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RejectedError(Exception):
+    """The endpoint refused the batch itself; retrying the same bytes will not help."""
+
+
+# ======================================================
+# Targets
+# ======================================================
+
+class SIEMTarget:
+    """Wire format of one SIEM ingestion API.
+
+    encode() turns an event into its record bytes; body() joins a batch;
+    headers() signs it. retry_indices() picks records to resend from a
+    response that accepted only part of the batch.
+    """
+
+    name = ""
+    content_type = "application/json"
+    gzip = True  # Whether the API accepts Content-Encoding: gzip
+
+    def __init__(self, endpoint: str, api_key: str):
+        self.endpoint = endpoint.rstrip("/")
+        self.api_key = api_key
+
+    @property
+    def url(self) -> str:
+        return self.endpoint
+
+    def encode(self, event: Dict) -> bytes:
+        return _dumps(event)
+
+    def body(self, records: List[bytes]) -> bytes:
+        return b"\n".join(records)
+
+    def headers(self, body: bytes) -> Dict[str, str]:
+        return {}
+
+    def retry_indices(self, response: requests.Response, count: int) -> List[int]:
+        return []
+
+
+class ElasticTarget(SIEMTarget):
+    """Elasticsearch / OpenSearch _bulk API with an API key."""
+
+    name = "elastic"
+    content_type = "application/x-ndjson"
+
+    def __init__(self, endpoint: str, api_key: str, index: str = "sentinelsweep"):
+        super().__init__(endpoint, api_key)
+        self._action = _dumps({"index": {"_index": index}}) + b"\n"
+
+    @property
+    def url(self) -> str:
+        return self.endpoint if self.endpoint.endswith("/_bulk") else self.endpoint + "/_bulk"
+
+    def encode(self, event: Dict) -> bytes:
+        event = dict(event, **{"@timestamp": event.get("timestamp")})
+        return self._action + _dumps(event) + b"\n"
+
+    def body(self, records: List[bytes]) -> bytes:
+        return b"".join(records)  # Each record already ends with the newline _bulk requires
+
+    def headers(self, body: bytes) -> Dict[str, str]:
+        return {"Authorization": f"ApiKey {self.api_key}"}
+
+    def retry_indices(self, response: requests.Response, count: int) -> List[int]:
+        result = response.json()
+        if not result.get("errors"):
+            return []
+        retry, rejected = [], 0
+        for i, item in enumerate(result.get("items", [])[:count]):
+            status = next(iter(item.values()), {}).get("status", 200)
+            if status == 429 or status >= 500:
+                retry.append(i)
+            elif status >= 300:
+                rejected += 1
+        if rejected:
+            logger.warning(f"Elastic rejected {rejected} documents (mapping or validation errors)")
+        return retry
+
+
+class SplunkHECTarget(SIEMTarget):
+    """Splunk HTTP Event Collector, events for the sentinel_sweep sourcetype."""
+
+    name = "splunk"
+
+    def __init__(self, endpoint: str, api_key: str, sourcetype: str = "sentinel_sweep",
+                 index: Optional[str] = None):
+        super().__init__(endpoint, api_key)
+        self.sourcetype = sourcetype
+        self.index = index
+
+    @property
+    def url(self) -> str:
+        if "/services/collector" in self.endpoint:
+            return self.endpoint
+        return self.endpoint + "/services/collector/event"
+
+    def encode(self, event: Dict) -> bytes:
+        wrapper = {"host": event.get("ip"), "source": "sentinelsweep", "sourcetype": self.sourcetype, "event": event}
+        if self.index:
+            wrapper["index"] = self.index
+        return _dumps(wrapper)
+
+    def headers(self, body: bytes) -> Dict[str, str]:
+        return {"Authorization": f"Splunk {self.api_key}"}
+
+
+class LogAnalyticsTarget(SIEMTarget):
+    """Azure Monitor HTTP Data Collector API (the Sentinel SentinelSweep_CL table).
+
+    Requests are signed with HMAC-SHA256 over the body length and date using
+    the workspace's shared key. The API does not take gzip bodies.
+    """
+
+    name = "azure_sentinel"
+    gzip = False
+    API_VERSION = "2016-04-01"
+
+    def __init__(self, endpoint: Optional[str], api_key: str, workspace_id: Optional[str] = None,
+                 log_type: str = "SentinelSweep"):
+        if not workspace_id:
+            if not endpoint:
+                raise ValueError("Log Analytics needs a workspace id or an endpoint")
+            workspace_id = urlparse(endpoint).hostname.split(".")[0]
+        super().__init__(endpoint or f"https://{workspace_id}.ods.opinsights.azure.com", api_key)
+        self.workspace_id = workspace_id
+        self.log_type = log_type
+        self._key = base64.b64decode(api_key)
+
+    @property
+    def url(self) -> str:
+        return f"{self.endpoint}/api/logs?api-version={self.API_VERSION}"
+
+    def encode(self, event: Dict) -> bytes:
+        # Custom log columns are flat; lists become strings (open_ports_s in the analytics rule)
+        return _dumps({k: ";".join(map(str, v)) if k == "open_ports" else v
+                       for k, v in event.items() if k != "mitre_findings"})
+
+    def body(self, records: List[bytes]) -> bytes:
+        return b"[" + b",".join(records) + b"]"
+
+    def signature(self, date: str, length: int) -> str:
+        message = f"POST\n{length}\n{self.content_type}\nx-ms-date:{date}\n/api/logs".encode("utf-8")
+        digest = hmac.new(self._key, message, hashlib.sha256).digest()
+        return f"SharedKey {self.workspace_id}:{base64.b64encode(digest).decode()}"
+
+    def headers(self, body: bytes) -> Dict[str, str]:
+        date = formatdate(usegmt=True)
+        return {
+            "Authorization": self.signature(date, len(body)),
+            "Log-Type": self.log_type,
+            "x-ms-date": date,
+            "time-generated-field": "timestamp",
+        }
+
+
+TARGETS = {
+    "elastic": ElasticTarget,
+    "splunk": SplunkHECTarget,
+    "azure_sentinel": LogAnalyticsTarget,
+    "log_analytics": LogAnalyticsTarget,
+}
+
+
+# ======================================================
+# Forwarder
+# ======================================================
+
+class SIEMForwarder:
+    """Ships findings to a SIEM from a background thread.
+
+    write() only enqueues, so the sweep never waits on the network. When the
+    sender falls `queue_size` events behind (e.g. the endpoint is down and
+    batches sit in backoff), further findings are spooled straight to disk
+    in batches instead of blocking the caller. Batches close at `batch_size` events, `max_bytes` of
+    encoded records or `flush_interval` seconds, whichever comes first.
+    They are gzip-compressed where the API allows and sent over one
+    keep-alive session. Failed deliveries are retried with exponential
+    backoff and jitter (honouring Retry-After); batches that still fail are
+    spooled to disk and replayed after the next successful delivery.
+
+    With a `spool_queue`, write() appends to that durable queue instead of
+    memory and the sender consumes it, committing offsets only after a
+    batch is delivered. The sweep then never blocks on the SIEM, nothing
+    queued is lost to a crash, and a later run picks up the backlog.
+    """
+
+    def __init__(self, target: SIEMTarget, batch_size: int = 500, max_bytes: int = 4 << 20,
+                 flush_interval: float = 5.0, max_retries: int = 5, backoff: float = 0.5,
+                 max_backoff: float = 30.0, timeout: float = 10.0, compress: bool = True,
+                 spool_dir: Optional[str] = "reports/spool", max_spool_bytes: int = 512 << 20,
+                 queue_size: int = 10000, verify: bool = True,
+                 session: Optional[requests.Session] = None, spool_queue: Optional[SpoolQueue] = None,
+                 drain_timeout: float = 30.0):
+        self.target = target
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.compress = compress and target.gzip
+        self.verify = verify
+        self.max_spool_bytes = max_spool_bytes
+        self.spool_dir = Path(spool_dir) / target.name if spool_dir else None
+        if self.spool_dir is not None:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+
+        if session is None:
+            # One sender thread: a single kept-alive connection per endpoint is all it needs
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session = session
+
+        self.stats = {
+            'events_queued': 0,
+            'events_sent': 0,
+            'batches_sent': 0,
+            'retries': 0,
+            'events_rejected': 0,
+            'events_spooled': 0,
+            'events_replayed': 0,
+            'events_overflowed': 0,
+            'bytes_raw': 0,
+            'bytes_sent': 0,
+        }
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._spool_seq = 0
+        self._spool_lock = threading.Lock()  # The sweep's thread spools overflow while the sender spools failures
+        self._overflow: List[bytes] = []
+        self._overflow_lock = threading.Lock()
+        self._closed = False
+        self.spool_queue = spool_queue
+        self.drain_timeout = drain_timeout
+        self.owns_queue = False  # Set when the forwarder should close spool_queue itself
+        self._consumer = spool_queue.consumer(f"siem-{target.name}") if spool_queue is not None else None
+        self._stopping = threading.Event()
+        run = self._run_durable if spool_queue is not None else self._run
+        self._thread = threading.Thread(target=run, name=f"siem-{target.name}", daemon=True)
+        self._thread.start()
+
+    # ======================================================
+    # Producer side
+    # ======================================================
+
+    def write(self, assessment: Dict) -> None:
+        """Queue one finding. Never blocks: with the sender `queue_size` events behind, it is spooled."""
+        if self._closed:
+            raise RuntimeError("SIEM forwarder is closed")
+        if self.spool_queue is not None:
+            self.spool_queue.append(assessment)
+        else:
+            try:
+                self._queue.put_nowait(assessment)
+            except queue.Full:
+                self._spill(assessment)
+        self.stats['events_queued'] += 1
+
+    def _spill(self, assessment: Dict) -> None:
+        """Collect a finding the sender has no room for; spool a batch_size batch of them at a time."""
+        try:
+            record = self.target.encode(siem_event(assessment))
+        except Exception as e:
+            logger.error(f"Could not encode finding for {self.target.name}: {e}")
+            return
+        with self._overflow_lock:
+            self._overflow.append(record)
+            self.stats['events_overflowed'] += 1
+            if len(self._overflow) < self.batch_size:
+                return
+            batch, self._overflow = self._overflow, []
+        self._spool(batch)
+
+    def _spill_rest(self) -> None:
+        with self._overflow_lock:
+            batch, self._overflow = self._overflow, []
+        if batch:
+            self._spool(batch)
+
+    def flush(self) -> None:
+        """Send everything queued so far and wait for it."""
+        if self.spool_queue is None:
+            self._queue.put(_FLUSH)
+            self._queue.join()
+            self._spill_rest()
+            return
+        self.spool_queue.sync()
+        end = self.spool_queue.end_offset
+        while self._thread.is_alive() and (self.spool_queue.committed(self._consumer.name) or 0) < end:
+            time.sleep(0.01)
+
+    def close(self, metadata: Optional[Dict] = None) -> Dict:
+        """Drain the queue, send or spool what is left and stop. Returns the stats.
+
+        With a spool queue, delivery continues for up to `drain_timeout`
+        seconds; whatever is still queued then waits for the next run.
+        """
+        if not self._closed:
+            self._closed = True
+            if self.spool_queue is not None:
+                self.spool_queue.sync()
+                self._stopping.set()
+            else:
+                self._queue.put(_STOP)
+            self._thread.join()
+            self._spill_rest()
+            self.session.close()
+            if self._consumer is not None:
+                self._consumer.close()
+            if self.owns_queue:
+                self.spool_queue.close()
+        return self.get_stats()
+
+    def get_stats(self) -> Dict:
+        stats = self.stats.copy()
+        stats['spool_files'] = len(self._spool_files())
+        if self._consumer is not None:
+            stats['queue_backlog'] = self._consumer.lag
+        return stats
+
+    def __enter__(self) -> 'SIEMForwarder':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ======================================================
+    # Sender thread
+    # ======================================================
+
+    def _run(self) -> None:
+        self._replay()
+        batch: List[bytes] = []
+        size = 0
+        deadline: Optional[float] = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item, dequeued = _FLUSH, False  # flush_interval elapsed
+            else:
+                dequeued = True
+
+            try:
+                if item is _STOP:
+                    break
+                if item is not _FLUSH:
+                    try:
+                        record = self.target.encode(siem_event(item))
+                    except Exception as e:
+                        logger.error(f"Could not encode finding for {self.target.name}: {e}")
+                        continue
+                    batch.append(record)
+                    size += len(record)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    if len(batch) < self.batch_size and size < self.max_bytes and time.monotonic() < deadline:
+                        continue
+                if batch:
+                    self._ship(batch)
+                batch, size, deadline = [], 0, None
+            except Exception:
+                # Never let the sender die: write() would then block forever on a full queue
+                logger.exception(f"{self.target.name} sender error; spooling {len(batch)} events")
+                if batch:
+                    self._spool(batch)
+                batch, size, deadline = [], 0, None
+            finally:
+                if dequeued:
+                    self._queue.task_done()  # After shipping, so flush() returns once the batch is out
+
+        if batch:
+            self._ship(batch)
+
+    def _run_durable(self) -> None:
+        self._replay()
+        consumer, stop_by = self._consumer, None
+        while True:
+            if self._stopping.is_set():
+                stop_by = stop_by or time.monotonic() + self.drain_timeout
+                if consumer.position >= self.spool_queue.end_offset or time.monotonic() >= stop_by:
+                    break
+            try:
+                items = consumer.poll(self.batch_size, timeout=0.1 if stop_by else self.flush_interval)
+                if not items:
+                    continue
+                # Batch up to batch_size or flush_interval after the first record, as in memory mode
+                deadline = time.monotonic() + self.flush_interval
+                while len(items) < self.batch_size and not self._stopping.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    items += consumer.poll(self.batch_size - len(items), timeout=min(remaining, 0.1))
+                delivered = self._ship_durable(items)
+            except Exception:
+                logger.exception(f"{self.target.name} sender error; the batch stays queued")
+                delivered = False
+
+            if not delivered:
+                consumer.seek(consumer.spool.committed(consumer.name))
+                if self._stopping.wait(self.max_backoff):
+                    break  # Endpoint down while closing: leave the backlog for the next run
+
+    def _ship_durable(self, items: List) -> bool:
+        """Deliver (offset, finding) pairs in max_bytes slices, committing after each."""
+        batch: List[bytes] = []
+        size = 0
+        for i, (offset, finding) in enumerate(items):
+            record = self.target.encode(siem_event(finding))
+            batch.append(record)
+            size += len(record)
+            if size >= self.max_bytes or i == len(items) - 1:
+                if not self._deliver(batch):
+                    return False
+                self._consumer.commit(offset + 1)
+                batch, size = [], 0
+        return True
+
+    def _ship(self, records: List[bytes]) -> None:
+        if self._deliver(records):
+            self._replay()
+        else:
+            self._spool(records)
+
+    def _deliver(self, records: List[bytes]) -> bool:
+        """Send one batch, retrying transient failures. False means it should be spooled."""
+        pending = records
+        for attempt in range(self.max_retries + 1):
+            try:
+                pending = self._post(pending)
+                if not pending:
+                    return True
+                delay = self._backoff(attempt)
+                logger.warning(f"{self.target.name}: {len(pending)} records to resend")
+            except TransientError as e:
+                delay = e.retry_after if e.retry_after is not None else self._backoff(attempt)
+                logger.warning(f"{self.target.name} delivery failed ({e}); retry in {delay:.1f}s")
+            except RejectedError as e:
+                if e.args and e.args[0] == 413 and len(pending) > 1:
+                    # Too large for the endpoint: send the halves separately
+                    half = len(pending) // 2
+                    first, second = pending[:half], pending[half:]
+                    sent_first, sent_second = self._deliver(first), self._deliver(second)
+                    records[:] = (first if not sent_first else []) + (second if not sent_second else [])
+                    return sent_first and sent_second
+                logger.error(f"{self.target.name} rejected a batch of {len(pending)} events: {e}")
+                self.stats['events_rejected'] += len(pending)
+                return True  # Dropped; resending the same bytes cannot succeed
+            if attempt < self.max_retries:
+                self.stats['retries'] += 1
+                time.sleep(delay)
+        records[:] = pending  # Only what is still undelivered gets spooled
+        return False
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def _post(self, records: List[bytes]) -> List[bytes]:
+        """POST one batch. Returns the records to resend (empty when all were accepted)."""
+        body = self.target.body(records)
+        headers = {"Content-Type": self.target.content_type}
+        payload = body
+        if self.compress:
+            payload = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        headers.update(self.target.headers(payload))
+
+        try:
+            response = self.session.post(self.target.url, data=payload, headers=headers,
+                                         timeout=self.timeout, verify=self.verify)
+        except requests.RequestException as e:
+            raise TransientError(type(e).__name__)
+
+        status = response.status_code
+        if status == 429 or status >= 500:
+            retry_after = response.headers.get("Retry-After")
+            raise TransientError(f"HTTP {status}",
+                                 float(retry_after) if retry_after and retry_after.isdigit() else None)
+        if status in (401, 403, 404):
+            # Credentials or endpoint are wrong; keep the data until they are fixed
+            raise TransientError(f"HTTP {status}")
+        if status >= 400:
+            raise RejectedError(status, response.text[:200])
+
+        try:
+            retry = self.target.retry_indices(response, len(records))
+        except (requests.RequestException, ValueError, AttributeError, TypeError) as e:
+            # A 2xx we cannot read (truncated, not JSON, wrong shape): delivery is unconfirmed
+            raise TransientError(f"unreadable response: {type(e).__name__}")
+        accepted = len(records) - len(retry)
+        self.stats['events_sent'] += accepted
+        self.stats['batches_sent'] += 1
+        self.stats['bytes_raw'] += len(body)
+        self.stats['bytes_sent'] += len(payload)
+        return [records[i] for i in retry]
+
+    # ======================================================
+    # Disk spool
+    # ======================================================
+
+    def _spool_files(self) -> List[Path]:
+        if self.spool_dir is None or not self.spool_dir.exists():
+            return []
+        return sorted(Path(entry.path) for entry in os.scandir(self.spool_dir) if entry.name.endswith(".json.gz"))
+
+    def _spool(self, records: List[bytes]) -> None:
+        if self.spool_dir is None:
+            logger.error(f"{self.target.name} unreachable; dropping {len(records)} events (no spool)")
+            return
+        with self._spool_lock:
+            self._spool_seq += 1
+            path = self.spool_dir / f"{time.time_ns():020d}_{self._spool_seq:06d}.json.gz"
+        tmp = path.with_suffix(".tmp")
+        try:
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump([record.decode("utf-8") for record in records], f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"Could not spool {len(records)} {self.target.name} events, dropping them: {e}")
+            return
+        with self._spool_lock:
+            self.stats['events_spooled'] += len(records)
+        logger.warning(f"{self.target.name} unreachable; spooled {len(records)} events to {path.name}")
+        try:
+            self._trim_spool()
+        except OSError as e:
+            logger.error(f"Could not trim the {self.target.name} spool: {e}")
+
+    def _trim_spool(self) -> None:
+        files = self._spool_files()
+        total = sum(f.stat().st_size for f in files)
+        while files and total > self.max_spool_bytes:
+            oldest = files.pop(0)
+            total -= oldest.stat().st_size
+            oldest.unlink()
+            logger.error(f"SIEM spool over {self.max_spool_bytes} bytes; dropped {oldest.name}")
+
+    def _replay(self) -> None:
+        """Resend spooled batches, oldest first, until one fails. Errors leave the files for later."""
+        try:
+            for path in self._spool_files():
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    records = [record.encode("utf-8") for record in json.load(f)]
+                if not self._deliver(records):
+                    if records:
+                        with gzip.open(path, "wt", encoding="utf-8") as f:
+                            json.dump([record.decode("utf-8") for record in records], f)
+                    return
+                path.unlink()
+                self.stats['events_replayed'] += len(records)
+                logger.info(f"Replayed {len(records)} spooled events from {path.name}")
+        except Exception as e:
+            logger.error(f"Could not replay the {self.target.name} spool: {e}")
+
+
+def create_forwarder(siem_type: str, endpoint: Optional[str], api_key: Optional[str],
+                     workspace_id: Optional[str] = None, index: Optional[str] = None,
+                     queue_dir: Optional[str] = None, **options) -> SIEMForwarder:
+    """Forwarder for a SIEM_TYPE (elastic, splunk, azure_sentinel) from config values.
+
+    With `queue_dir`, findings go through a durable SpoolQueue there, owned by the forwarder.
+    """
+    name = (siem_type or "").strip().lower()
+    if name not in TARGETS:
+        raise ValueError(f"Unknown SIEM_TYPE: {siem_type!r} (expected one of {', '.join(TARGETS)})")
+    if not api_key:
+        raise ValueError("SIEM_API_KEY is not set")
+    cls = TARGETS[name]
+    if cls is LogAnalyticsTarget:
+        target = LogAnalyticsTarget(endpoint, api_key, workspace_id=workspace_id)
+    elif not endpoint:
+        raise ValueError("SIEM_ENDPOINT is not set")
+    elif index:
+        target = cls(endpoint, api_key, index=index)
+    else:
+        target = cls(endpoint, api_key)
+    if not queue_dir:
+        return SIEMForwarder(target, **options)
+    forwarder = SIEMForwarder(target, spool_queue=SpoolQueue(queue_dir), **options)
+    forwarder.owns_queue = True
+    return forwarder
@@ -0,0 +1,201 @@
+﻿"""
+Local SIEM stand-in.
+A small HTTP server that speaks the Elastic _bulk, Splunk HEC and Log Analytics ingestion APIs, for tests and dry runs.
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs
+
+    def log_message(self, format, *args) -> None:
+        logger.debug(format % args)
+
+    def do_POST(self) -> None:
+        mock: 'MockSIEM' = self.server.mock
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = self.path.split("?")[0]
+        mock._note_request(self, path, len(body))
+
+        failure = mock._next_failure()
+        if failure:
+            status, retry_after = failure
+            self._reply(status, {"error": "injected failure"}, {"Retry-After": str(retry_after)} if retry_after else None)
+            return
+
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+
+        if path.endswith("/_bulk"):
+            self._bulk(mock, body)
+        elif path.startswith("/services/collector"):
+            self._hec(mock, body)
+        elif path == "/api/logs":
+            self._log_analytics(mock, body)
+        else:
+            self._reply(404, {"error": "unknown API"})
+
+    def _reply(self, status: int, payload: Optional[Dict] = None, headers: Optional[Dict] = None) -> None:
+        data = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _bulk(self, mock: 'MockSIEM', body: bytes) -> None:
+        if self.headers.get("Authorization") != f"ApiKey {mock.api_key}":
+            self._reply(401, {"error": "security_exception"})
+            return
+        lines = [line for line in body.split(b"\n") if line]
+        docs = [json.loads(line) for line in lines[1::2]]
+        throttled = mock._take_throttled(len(docs))
+        items = []
+        for i, doc in enumerate(docs):
+            if i < throttled:
+                items.append({"index": {"status": 429, "error": {"type": "es_rejected_execution_exception"}}})
+            else:
+                mock._store("elastic", doc)
+                items.append({"index": {"status": 201, "result": "created"}})
+        self._reply(200, {"took": 1, "errors": bool(throttled), "items": items})
+
+    def _hec(self, mock: 'MockSIEM', body: bytes) -> None:
+        if self.headers.get("Authorization") != f"Splunk {mock.api_key}":
+            self._reply(401, {"text": "Invalid token", "code": 4})
+            return
+        decoder, text, pos = json.JSONDecoder(), body.decode("utf-8"), 0
+        while True:
+            while pos < len(text) and text[pos].isspace():
+                pos += 1
+            if pos >= len(text):
+                break
+            event, pos = decoder.raw_decode(text, pos)
+            mock._store("splunk", event)
+        self._reply(200, {"text": "Success", "code": 0})
+
+    def _log_analytics(self, mock: 'MockSIEM', body: bytes) -> None:
+        date = self.headers.get("x-ms-date", "")
+        message = f"POST\n{len(body)}\napplication/json\nx-ms-date:{date}\n/api/logs".encode("utf-8")
+        digest = hmac.new(base64.b64decode(mock.shared_key), message, hashlib.sha256).digest()
+        expected = f"SharedKey {mock.workspace_id}:{base64.b64encode(digest).decode()}"
+        if self.headers.get("Authorization") != expected:
+            self._reply(403, {"Error": "InvalidAuthorization"})
+            return
+        for record in json.loads(body):
+            mock._store("log_analytics", dict(record, _log_type=self.headers.get("Log-Type")))
+        self._reply(200)
+
+
+class MockSIEM:
+    """Threaded mock of the three ingestion APIs on 127.0.0.1.
+
+    Received events are kept per API in `events`; every request is logged
+    in `requests`. fail_next() and throttle_next() inject outages, 429s and
+    partial bulk failures.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, api_key: str = "test-key",
+                 workspace_id: str = "test-workspace", shared_key: Optional[str] = None):
+        self.api_key = api_key
+        self.workspace_id = workspace_id
+        self.shared_key = shared_key or base64.b64encode(b"sentinelsweep-test-key").decode()
+        self.events: Dict[str, List[Dict]] = {"elastic": [], "splunk": [], "log_analytics": []}
+        self.requests: List[Dict] = []
+        self.connections = set()
+        self._failures: List[Tuple[int, Optional[int]]] = []
+        self._throttle = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.mock = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockSIEM':
+        self._thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05},
+                                        name="mock-siem", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'MockSIEM':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def fail_next(self, count: int = 1, status: int = 503, retry_after: Optional[int] = None) -> None:
+        """Answer the next `count` requests with `status` instead of accepting them."""
+        with self._lock:
+            self._failures.extend([(status, retry_after)] * count)
+
+    def recover(self) -> None:
+        """Drop any injected failures that have not been used yet."""
+        with self._lock:
+            self._failures.clear()
+            self._throttle = 0
+
+    def throttle_next(self, documents: int) -> None:
+        """Reject the next `documents` bulk items with 429 inside an otherwise successful response."""
+        with self._lock:
+            self._throttle += documents
+
+    def _next_failure(self) -> Optional[Tuple[int, Optional[int]]]:
+        with self._lock:
+            return self._failures.pop(0) if self._failures else None
+
+    def _take_throttled(self, count: int) -> int:
+        with self._lock:
+            taken = min(count, self._throttle)
+            self._throttle -= taken
+            return taken
+
+    def _note_request(self, handler: BaseHTTPRequestHandler, path: str, size: int) -> None:
+        with self._lock:
+            self.connections.add(handler.client_address)
+            self.requests.append({"path": path, "bytes": size,
+                                  "encoding": handler.headers.get("Content-Encoding")})
+
+    def _store(self, api: str, event: Dict) -> None:
+        with self._lock:
+            self.events[api].append(event)
+
+
+def main() -> None:
+    """Run the mock in the foreground: python src/siem_mock.py --port 9200."""
+    parser = argparse.ArgumentParser(description="Local SIEM ingestion mock")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--api-key", default="test-key")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG)
+    mock = MockSIEM(port=args.port, api_key=args.api_key)
+    print(f"Mock SIEM on {mock.url} (key {mock.api_key}, Log Analytics shared key {mock.shared_key})")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        mock.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+﻿"""
+Durable spool queue.
+Append-only segment files with CRC-framed records, batched fsync and per-consumer committed offsets.
+"""
+
+import bisect
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<II")  # payload length, crc32(payload)
+SEGMENT_SUFFIX = ".seg"
+OFFSETS_FILE = "offsets.json"
+
+
+def _segment_name(base: int) -> str:
+    return f"{base:020d}{SEGMENT_SUFFIX}"
+
+
+def _scan(path: Path) -> Tuple[int, int]:
+    """(records, valid bytes) of a segment; stops at the first torn or corrupt record."""
+    count = good = 0
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                break
+            length, crc = _HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            count += 1
+            good += _HEADER.size + length
+    return count, good
+
+
+class SpoolQueue:
+    """Write-ahead queue of findings on disk.
+
+    Records are JSON, framed as [length][crc32][payload] and appended to
+    segment files named by the offset of their first record. Appends are
+    fsynced in batches (every `fsync_every` records or `fsync_interval`
+    seconds); consumers only see records up to the last fsync, so nothing
+    is delivered that a crash could take back. Each named consumer commits
+    the offset it has processed; segments every consumer has passed are
+    deleted. On open, a torn tail left by a crash is truncated.
+    """
+
+    def __init__(self, directory: str = "reports/queue", segment_bytes: int = 64 << 20,
+                 fsync_every: int = 1000, fsync_interval: float = 1.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._appended = threading.Condition(self._lock)
+        self._offsets: Dict[str, int] = self._load_offsets()
+        self._segments: List[int] = sorted(
+            int(entry.name[:-len(SEGMENT_SUFFIX)]) for entry in os.scandir(self.directory)
+            if entry.name.endswith(SEGMENT_SUFFIX))
+        self.stats = {'appended': 0, 'fsyncs': 0, 'segments_deleted': 0, 'truncated_bytes': 0}
+        self._recover()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.closed = False
+
+    # ======================================================
+    # Opening and recovery
+    # ======================================================
+
+    def _recover(self) -> None:
+        if not self._segments:
+            self._segments = [max(self._offsets.values(), default=0)]
+            self._end = self._segments[0]
+        else:
+            base = self._segments[-1]
+            path = self.directory / _segment_name(base)
+            count, good = _scan(path)
+            torn = path.stat().st_size - good
+            if torn:
+                with open(path, "r+b") as f:
+                    f.truncate(good)
+                self.stats['truncated_bytes'] = torn
+                logger.warning(f"Spool queue: truncated {torn} bytes of torn records in {path.name}")
+            self._end = base + count
+            committed = max(self._offsets.values(), default=0)
+            if committed > self._end:
+                # Offsets were committed past what survived; continue numbering after them
+                self._segments.append(committed)
+                self._end = committed
+        self._durable = self._end
+        self._file = open(self.directory / _segment_name(self._segments[-1]), "ab", buffering=0)
+        self._size = self._file.tell()
+
+    def _load_offsets(self) -> Dict[str, int]:
+        path = self.directory / OFFSETS_FILE
+        if not path.exists():
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_offsets(self) -> None:
+        path = self.directory / OFFSETS_FILE
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._offsets, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    # ======================================================
+    # Producer side
+    # ======================================================
+
+    def append(self, record: Dict) -> int:
+        """Append one record; returns its offset."""
+        payload = json.dumps(record, default=str, separators=(",", ":")).encode("utf-8")
+        frame = _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self.closed:
+                raise RuntimeError("spool queue is closed")
+            if self._size and self._size + len(frame) > self.segment_bytes:
+                self._roll()
+            self._file.write(frame)
+            self._size += len(frame)
+            offset = self._end
+            self._end += 1
+            self._unsynced += 1
+            self.stats['appended'] += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+        return offset
+
+    def extend(self, records: Iterable[Dict]) -> None:
+        for record in records:
+            self.append(record)
+
+    def sync(self) -> None:
+        """fsync pending appends and make them visible to consumers."""
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+            self.stats['fsyncs'] += 1
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        if self._durable != self._end:
+            self._durable = self._end
+            self._appended.notify_all()
+
+    def _roll(self) -> None:
+        self._sync()
+        self._file.close()
+        self._segments.append(self._end)
+        self._file = open(self.directory / _segment_name(self._end), "ab", buffering=0)
+        self._size = 0
+
+    # ======================================================
+    # Consumer side
+    # ======================================================
+
+    @property
+    def end_offset(self) -> int:
+        return self._end
+
+    def consumer(self, name: str) -> 'SpoolConsumer':
+        """Reader that resumes from `name`'s committed offset (the oldest retained record for a new name)."""
+        with self._lock:
+            start = self._offsets.get(name, self._segments[0])
+            self._offsets.setdefault(name, start)
+            self._save_offsets()
+        return SpoolConsumer(self, name, start)
+
+    def committed(self, name: str) -> Optional[int]:
+        return self._offsets.get(name)
+
+    def _commit(self, name: str, offset: int) -> None:
+        with self._lock:
+            if offset <= self._offsets.get(name, -1):
+                return
+            self._offsets[name] = offset
+            self._save_offsets()
+            self._collect()
+
+    def _collect(self) -> None:
+        """Delete segments that every consumer has read past."""
+        low = min(self._offsets.values(), default=0)
+        while len(self._segments) > 1 and self._segments[1] <= low:
+            base = self._segments.pop(0)
+            (self.directory / _segment_name(base)).unlink(missing_ok=True)
+            self.stats['segments_deleted'] += 1
+
+    def _wait(self, offset: int, timeout: float) -> bool:
+        """Block until a durable record at `offset` exists; triggers the fsync if it is only pending."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._durable <= offset:
+                if self._end > offset:
+                    self._sync()  # The consumer caught up with unsynced appends: sync now rather than wait
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.closed:
+                    return False
+                self._appended.wait(remaining)
+            return True
+
+    def _locate(self, offset: int) -> int:
+        with self._lock:
+            return self._segments[max(0, bisect.bisect_right(self._segments, offset) - 1)]
+
+    def _next_segment(self, base: int) -> Optional[int]:
+        with self._lock:
+            i = bisect.bisect_right(self._segments, base)
+            return self._segments[i] if i < len(self._segments) else None
+
+    def close(self) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            self._sync()
+            self._file.close()
+            self.closed = True
+            self._appended.notify_all()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = self.stats.copy()
+            stats['end_offset'] = self._end
+            stats['segments'] = len(self._segments)
+            stats['lag'] = {name: self._end - offset for name, offset in self._offsets.items()}
+        return stats
+
+    def __enter__(self) -> 'SpoolQueue':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class SpoolConsumer:
+    """Sequential reader for one named consumer of a SpoolQueue.
+
+    poll() reads forward from the current position; commit() persists how
+    far processing got, and seek() rewinds to re-read records whose
+    processing failed. Delivery is at-least-once.
+    """
+
+    def __init__(self, spool: SpoolQueue, name: str, position: int):
+        self.spool = spool
+        self.name = name
+        self.position = position
+        self._file = None
+        self._segment: Optional[int] = None
+        self._cursor = 0  # Offset of the next record at the file's current position
+
+    def seek(self, offset: int) -> None:
+        self.position = offset
+        self._close_file()
+
+    def commit(self, offset: Optional[int] = None) -> None:
+        """Mark everything before `offset` (default: the current position) as processed."""
+        self.spool._commit(self.name, self.position if offset is None else offset)
+
+    @property
+    def lag(self) -> int:
+        return self.spool.end_offset - (self.spool.committed(self.name) or 0)
+
+    def poll(self, max_records: int = 500, timeout: float = 0.0) -> List[Tuple[int, Dict]]:
+        """Up to `max_records` (offset, record) pairs, waiting up to `timeout` seconds for the first."""
+        records: List[Tuple[int, Dict]] = []
+        while len(records) < max_records:
+            if self.position >= self.spool._durable and not self.spool._wait(self.position,
+                                                                             0.0 if records else timeout):
+                break
+            record = self._read()
+            if record is None:
+                break
+            records.append((self.position, record))
+            self.position += 1
+        return records
+
+    def _read(self) -> Optional[Dict]:
+        if self._file is None or self._cursor != self.position:
+            self._open(self.position)
+        header = self._file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            following = self.spool._next_segment(self._segment)
+            if following is None or following > self.position:
+                return None
+            self._open(self.position)
+            return self._read()
+        length, crc = _HEADER.unpack(header)
+        payload = self._file.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            raise IOError(f"Corrupt record at offset {self.position} in {self.spool.directory}")
+        self._cursor += 1
+        return json.loads(payload)
+
+    def _open(self, offset: int) -> None:
+        self._close_file()
+        self._segment = self.spool._locate(offset)
+        self._file = open(self.spool.directory / _segment_name(self._segment), "rb")
+        self._cursor = self._segment
+        while self._cursor < offset:  # Skip records by their headers, without parsing payloads
+            header = self._file.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise IOError(f"Offset {offset} is past the end of segment {self._segment}")
+            self._file.seek(_HEADER.unpack(header)[0], os.SEEK_CUR)
+            self._cursor += 1
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self) -> None:
+        self._close_file()
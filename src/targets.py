@@ -0,0 +1,288 @@
+﻿"""
+Lazy target expansion for very large networks.
+CIDRs, ranges and exclusions are kept as merged integer intervals; addresses are produced on demand.
+"""
+
+import bisect
+import ipaddress
+import math
+import random
+import socket
+import struct
+from collections.abc import Sequence
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+Interval = Tuple[int, int]  # Inclusive start/end
+
+# Upper bound on the blocks TargetSpace.shard deals out; huge IPv6 ranges use coarser blocks
+_MAX_SHARD_BLOCKS = 1 << 20
+
+
+def ip_to_int(ip: str) -> int:
+    """Dotted IPv4 (or IPv6) string to integer."""
+    try:
+        return struct.unpack('!I', socket.inet_aton(ip))[0] if ':' not in ip else int(ipaddress.IPv6Address(ip))
+    except OSError:
+        raise ValueError(f"Invalid address: {ip!r}")
+
+
+def int_to_ip(value: int, version: int = 4) -> str:
+    """Integer to dotted IPv4 (or IPv6) string."""
+    if version == 4:
+        return socket.inet_ntoa(struct.pack('!I', value))
+    return str(ipaddress.IPv6Address(value))
+
+
+def _parse_spec(spec: str) -> Tuple[int, Interval]:
+    """Parse one CIDR, range (a-b or a-lastoctet) or single address into (version, interval)."""
+    spec = spec.strip()
+    if '-' in spec:
+        start_s, end_s = (part.strip() for part in spec.split('-', 1))
+        start = ipaddress.ip_address(start_s)
+        if end_s.isdigit() and start.version == 4:
+            if int(end_s) > 255:
+                # Would otherwise spill into the next /24, which the operator never named
+                raise ValueError(f"Invalid range: {spec!r} (last octet above 255)")
+            end = ipaddress.ip_address(int(start) & ~0xFF | int(end_s))
+        else:
+            end = ipaddress.ip_address(end_s)
+        if start.version != end.version or int(end) < int(start):
+            raise ValueError(f"Invalid range: {spec!r}")
+        return start.version, (int(start), int(end))
+
+    network = ipaddress.ip_network(spec, strict=False)
+    first, last = int(network.network_address), int(network.broadcast_address)
+    # Mirror ip_network().hosts(): drop network/broadcast except on point-to-point prefixes
+    if network.version == 4 and network.prefixlen < 31:
+        first, last = first + 1, last - 1
+    elif network.version == 6 and network.prefixlen < 127:
+        first += 1
+    return network.version, (first, last)
+
+
+def _merge(intervals: List[Interval]) -> List[Interval]:
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _subtract(ranges: List[Interval], holes: List[Interval]) -> List[Interval]:
+    result: List[Interval] = []
+    holes = _merge(holes)
+    for start, end in ranges:
+        for h_start, h_end in holes:
+            if h_end < start or h_start > end:
+                continue
+            if h_start > start:
+                result.append((start, h_start - 1))
+            start = h_end + 1
+            if start > end:
+                break
+        if start <= end:
+            result.append((start, end))
+    return result
+
+
+def _split_specs(specs: Union[str, Iterable[str], None]) -> List[str]:
+    if specs is None:
+        return []
+    if isinstance(specs, str):
+        specs = specs.split(',')
+    return [s.strip() for s in specs if s and s.strip()]
+
+
+class _IntSequence(Sequence):
+    """Shared helpers for sequences of integer addresses."""
+
+    version = 4
+
+    def hosts(self) -> 'HostSequence':
+        """View of this sequence as address strings."""
+        return HostSequence(self)
+
+    def permuted(self, seed: Optional[int] = None) -> 'PermutedTargets':
+        """Pseudo-random order over the same addresses, without materialising them."""
+        return PermutedTargets(self, seed)
+
+
+class TargetSpace(_IntSequence):
+    """Set of target addresses from CIDRs, ranges and exclusions.
+
+    Stored as merged integer intervals, so a /8 costs the same memory as a /30.
+    Supports len(), indexing and lazy iteration over integer addresses.
+    """
+
+    def __init__(self, specs: Union[str, Iterable[str]], exclude: Union[str, Iterable[str], None] = None):
+        versions = set()
+        intervals: List[Interval] = []
+        for spec in _split_specs(specs):
+            version, interval = _parse_spec(spec)
+            versions.add(version)
+            intervals.append(interval)
+        if len(versions) > 1:
+            raise ValueError("Cannot mix IPv4 and IPv6 targets in one TargetSpace")
+        self.version = versions.pop() if versions else 4
+
+        holes = []
+        for spec in _split_specs(exclude):
+            version, interval = _parse_spec(spec)
+            if version == self.version:
+                holes.append(interval)
+
+        self._set_ranges(_subtract(_merge(intervals), holes))
+
+    @classmethod
+    def from_ranges(cls, ranges: List[Interval], version: int = 4) -> 'TargetSpace':
+        """TargetSpace over already merged, sorted intervals."""
+        space = cls.__new__(cls)
+        space.version = version
+        space._set_ranges(ranges)
+        return space
+
+    def _set_ranges(self, ranges: List[Interval]) -> None:
+        self._ranges = ranges
+        self._offsets: List[int] = []
+        total = 0
+        for start, end in self._ranges:
+            self._offsets.append(total)
+            total += end - start + 1
+        self.size = total
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[int]:
+        for start, end in self._ranges:
+            yield from range(start, end + 1)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("target index out of range")
+        slot = bisect.bisect_right(self._offsets, index) - 1
+        return self._ranges[slot][0] + (index - self._offsets[slot])
+
+    def __contains__(self, address) -> bool:
+        if isinstance(address, str):
+            address = ip_to_int(address)
+        slot = bisect.bisect_right(self._ranges, (address, float('inf'))) - 1
+        return slot >= 0 and self._ranges[slot][0] <= address <= self._ranges[slot][1]
+
+    @property
+    def ranges(self) -> List[Interval]:
+        return list(self._ranges)
+
+    def shard(self, index: int, count: int) -> 'TargetSpace':
+        """Shard `index` of `count`: whole /24s (/64s for IPv6) dealt out round-robin.
+
+        Each subnet lands in exactly one shard, so per-subnet pacing and RTT
+        statistics stay exact per worker. Ranges with too few subnets to go
+        round are dealt in smaller blocks, huge IPv6 ranges in larger ones.
+        """
+        if not 0 <= index < count:
+            raise ValueError(f"shard {index} of {count}")
+        if count == 1:
+            return self
+
+        def blocks(bits: int) -> int:
+            return sum((end >> bits) - (start >> bits) + 1 for start, end in self._ranges)
+
+        bits = 8 if self.version == 4 else 64
+        while blocks(bits) > _MAX_SHARD_BLOCKS:
+            bits += 8
+        while bits > 0 and blocks(bits) < count * 4:
+            bits -= 1
+
+        ranges: List[Interval] = []
+        for start, end in self._ranges:
+            block = (start >> bits) + (index - (start >> bits)) % count
+            while block <= end >> bits:
+                ranges.append((max(start, block << bits), min(end, ((block + 1) << bits) - 1)))
+                block += count
+        return TargetSpace.from_ranges(_merge(ranges), self.version)
+
+
+class PermutedTargets(_IntSequence):
+    """Affine permutation i -> (a*i + b) mod n over another address sequence.
+
+    The multiplier is coprime to n and close to n/phi, so consecutive targets
+    land far apart in the address space and load is spread across subnets.
+    """
+
+    def __init__(self, base: Sequence, seed: Optional[int] = None):
+        self.base = base
+        self.version = getattr(base, 'version', 4)
+        self.seed = seed
+        n = len(base)
+        rng = random.Random(seed)
+        self._n = n
+        if n <= 1:
+            self._a, self._b = 1, 0
+            return
+        a = max(1, int(n / 1.6180339887) + rng.randrange(max(1, n // 16)))
+        while math.gcd(a, n) != 1:
+            a += 1
+        self._a = a % n or 1
+        self._b = rng.randrange(n)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._n))]
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError("target index out of range")
+        return self.base[(self._a * index + self._b) % self._n]
+
+    def __iter__(self) -> Iterator[int]:
+        for i in range(self._n):
+            yield self.base[(self._a * i + self._b) % self._n]
+
+    def __contains__(self, address) -> bool:
+        return address in self.base
+
+
+class HostSequence(Sequence):
+    """Integer address sequence presented as address strings.
+
+    This is what DefenderSafeScanner.validate_cidr returns: it behaves like the
+    old list of strings (len, indexing, slicing) without ever building it.
+    """
+
+    def __init__(self, addresses: Sequence):
+        self.addresses = addresses
+        self.version = getattr(addresses, 'version', 4)
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [int_to_ip(a, self.version) for a in self.addresses[index]]
+        return int_to_ip(self.addresses[index], self.version)
+
+    def __iter__(self) -> Iterator[str]:
+        version = self.version
+        for address in self.addresses:
+            yield int_to_ip(address, version)
+
+    def __contains__(self, ip) -> bool:
+        return ip_to_int(ip) in self.addresses if isinstance(ip, str) else False
+
+    def permuted(self, seed: Optional[int] = None) -> 'HostSequence':
+        """Same hosts in a pseudo-random, subnet-interleaved order."""
+        return HostSequence(PermutedTargets(self.addresses, seed))
+
+    def shard(self, index: int, count: int) -> 'HostSequence':
+        """This worker's share of the hosts (see TargetSpace.shard); shard before permuting."""
+        return HostSequence(self.addresses.shard(index, count))
@@ -2,10 +2,26 @@
 Minimal Triage Engine - Just Works Version
 """
 
+import asyncio
 import socket
 from typing import Dict, Optional
 import ipaddress
 
+# Per-protocol banner probe: (bytes to send, read deadline in seconds).
+# Server-speaks-first protocols send nothing and get a short deadline.
+BANNER_PROBES = {
+    21: (b'', 1.0),      # FTP
+    22: (b'', 1.0),      # SSH
+    23: (b'', 1.0),      # Telnet
+    25: (b'', 1.5),      # SMTP
+    3306: (b'', 1.0),    # MySQL
+    80: (b'\n', 2.0),    # HTTP
+    8080: (b'\n', 2.0),  # HTTP-Alt
+}
+DEFAULT_BANNER_PROBE = (b'\n', 2.0)
+
+_NOT_GRABBED = object()  # triage_service default: banner still has to be fetched
+
 class TriageEngine:
     def __init__(self, config: Optional[Dict] = None):
         self.config = config or {}
@@ -16,14 +32,29 @@ class TriageEngine:
             'errors': 0
         }
         
-    def triage_service(self, ip: str, port: int) -> Dict:
-        """Simple triage that always works."""
+    def triage_service(self, ip: str, port: int, sock: Optional[socket.socket] = None,
+                       banner=_NOT_GRABBED) -> Dict:
+        """Simple triage that always works.
+        
+        `sock` is an already-connected socket handed over by the scanner, used
+        for the banner read instead of opening a second connection. A `banner`
+        already read by the caller (None meaning "nothing received") skips the
+        read entirely.
+        """
         
         # Update stats
         self.stats['services_triaged'] += 1
+        result = self._new_result(ip, port)
         
+        # Add service-specific banner grabbing
+        if banner is _NOT_GRABBED:
+            banner = self._grab_banner(ip, port, sock=sock)
+        self._apply_banner(result, banner)
+        return result
+    
+    def _new_result(self, ip: str, port: int) -> Dict:
         # ALWAYS initialize all required keys
-        result = {
+        return {
             'ip': ip,
             'port': port,
             'service_guess': self._guess_service(port),
@@ -37,9 +68,10 @@ class TriageEngine:
             'checks_failed': [],  # Always exists
             'network_context': self._get_network_context(ip)
         }
-        
-        # Add service-specific banner grabbing
-        banner = self._grab_banner(ip, port)
+    
+    def _apply_banner(self, result: Dict, banner: Optional[str]) -> None:
+        """Record a banner and apply the banner-based risk rules."""
+        ip, port = result['ip'], result['port']
         if banner:
             result['banner'] = banner
             result['verification'] = f'Banner: {banner[:50]}...'
@@ -61,25 +93,50 @@ class TriageEngine:
                 result['final_risk'] = 'MEDIUM'
                 result['adjustment_reason'] = 'Default web page detected'
                 self.stats['risks_adjusted'] += 1
-        
-        return result
     
-    def _grab_banner(self, ip: str, port: int, timeout: int = 2) -> Optional[str]:
-        """Simple banner grabber."""
+    def _grab_banner(self, ip: str, port: int, timeout: Optional[float] = None,
+                     sock: Optional[socket.socket] = None) -> Optional[str]:
+        """Simple banner grabber, reusing the scanner's connection when given one."""
+        payload, deadline = BANNER_PROBES.get(port, DEFAULT_BANNER_PROBE)
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(timeout)
-            sock.connect((ip, port))
+            if sock is None:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.settimeout(timeout or deadline)
+                sock.connect((ip, port))
+            else:
+                sock.setblocking(True)
+                sock.settimeout(timeout or deadline)
             
-            # Send newline for most services
-            sock.send(b'\n')
+            if payload:
+                sock.send(payload)
             
             # Try to receive banner
             banner = sock.recv(256).decode('utf-8', errors='ignore').strip()
-            sock.close()
             return banner if banner else None
         except:
             return None
+        finally:
+            if sock is not None:
+                sock.close()
+    
+    async def grab_banner_async(self, sock: socket.socket, port: int) -> Optional[str]:
+        """Read a banner from a connected non-blocking socket, then close it.
+        
+        Lets many banner reads run concurrently on one event loop, each bounded
+        by its protocol's read deadline.
+        """
+        loop = asyncio.get_running_loop()
+        payload, deadline = BANNER_PROBES.get(port, DEFAULT_BANNER_PROBE)
+        try:
+            if payload:
+                await asyncio.wait_for(loop.sock_sendall(sock, payload), deadline)
+            data = await asyncio.wait_for(loop.sock_recv(sock, 256), deadline)
+            banner = data.decode('utf-8', errors='ignore').strip()
+            return banner if banner else None
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            sock.close()
     
     def _guess_service(self, port: int) -> str:
         common = {
@@ -0,0 +1,142 @@
+﻿"""
+Tests for the early alert channel and its sinks.
+"""
+
+import json
+import socket
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from src.alerts import AlertChannel, AlertSink, SyslogSink, WebhookSink, create_alert_channel
+from src.risk_engine import SOCRiskEngine
+from src.siem_mock import MockSIEM
+
+
+class RecordingSink(AlertSink):
+    """Keeps every batch it is sent; fails on demand."""
+
+    name = "recording"
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    def send(self, alerts):
+        if self.fail:
+            raise RuntimeError("sink down")
+        self.batches.append(alerts)
+
+    @property
+    def alerts(self):
+        return [alert for batch in self.batches for alert in batch]
+
+
+class _Webhook(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.server.bodies.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+        self.send_response(204)
+        self.end_headers()
+
+
+class TestAlertChannel(unittest.TestCase):
+    """Test alert selection, RDP+SMB correlation, de-duplication and batching."""
+
+    def setUp(self):
+        self.engine = SOCRiskEngine()
+
+    def test_high_findings_alert_once(self):
+        """HIGH and above raise one alert per finding; repeats and MEDIUM findings do not."""
+        sink = RecordingSink()
+        with AlertChannel([sink], min_risk='HIGH', flush_interval=0.05) as channel:
+            smb = self.engine.assess_exposure("10.0.0.5", [445])
+            channel.observe(smb)
+            channel.observe(smb)  # e.g. pushed again by a re-dispatched unit
+            channel.observe(self.engine.assess_exposure("10.0.0.6", [22]))
+        self.assertEqual([(a['ip'], a['true_risk']) for a in sink.alerts], [("10.0.0.5", "HIGH")])
+        self.assertEqual(channel.get_stats()['duplicates'], 1)
+
+    def test_rdp_and_smb_on_one_host_escalate(self):
+        """Separate HIGH findings for 445 and 3389 on one host raise a correlated CRITICAL alert."""
+        sink = RecordingSink()
+        with AlertChannel([sink], min_risk='CRITICAL', flush_interval=0.05) as channel:
+            channel.observe(self.engine.assess_exposure("10.0.0.5", [445]))
+            channel.observe(self.engine.assess_exposure("10.0.0.9", [3389]))
+            channel.observe(self.engine.assess_exposure("10.0.0.5", [3389]))
+            channel.observe(self.engine.assess_exposure("10.0.0.5", [22]))  # Still CRITICAL: not raised again
+            lowered = self.engine.assess_exposure("10.0.0.9", [445], {'final_risk': 'LOW'})
+            channel.observe(lowered)  # Triage cleared it, so no escalation for .9
+        self.assertEqual(len(sink.alerts), 1)
+        alert = sink.alerts[0]
+        self.assertEqual((alert['ip'], alert['open_ports'], alert['true_risk']), ("10.0.0.5", [445, 3389], "CRITICAL"))
+        self.assertEqual(alert['alert_reason'], "CRITICAL: Both RDP and SMB exposed")
+        self.assertEqual(channel.get_stats()['correlated'], 1)
+
+    def test_batches_and_failing_sink(self):
+        """Alerts are batched by size, and a failing sink does not hold up the others."""
+        sink, broken = RecordingSink(), RecordingSink(fail=True)
+        with AlertChannel([broken, sink], batch_size=3, flush_interval=30) as channel:
+            for i in range(7):
+                channel.observe(self.engine.assess_exposure(f"10.0.1.{i}", [3389]))
+        self.assertEqual([len(batch) for batch in sink.batches], [3, 3, 1])
+        stats = channel.get_stats()
+        self.assertEqual((stats['alerts'], stats['batches_sent'], stats['send_failures']), (7, 3, 3))
+
+
+class TestAlertSinks(unittest.TestCase):
+    """Test delivery to the webhook, syslog, file and SIEM sinks."""
+
+    def setUp(self):
+        self.finding = SOCRiskEngine().assess_exposure("10.0.0.5", [445, 3389])
+
+    def test_webhook_and_syslog(self):
+        """The webhook gets a JSON batch; syslog gets one message per alert."""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Webhook)
+        server.bodies = []
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(2)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/hook"
+            sinks = [WebhookSink(url), SyslogSink(f"127.0.0.1:{receiver.getsockname()[1]}")]
+            with AlertChannel(sinks, flush_interval=0.05) as channel:
+                channel.observe(self.finding)
+            message = receiver.recv(65535).decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+            receiver.close()
+        self.assertEqual(len(server.bodies), 1)
+        event = server.bodies[0]["alerts"][0]
+        self.assertEqual((event["ip"], event["risk_level"], event["alert"]), ("10.0.0.5", "CRITICAL", True))
+        self.assertIn("sentinelsweep: CRITICAL 10.0.0.5 ports=445,3389", message)
+        self.assertTrue(message.startswith("<130>"))  # local0.crit
+
+    def test_file_and_siem_from_config(self):
+        """create_alert_channel builds the file sink and a dedicated SIEM forwarder."""
+        directory = tempfile.mkdtemp()
+        path = Path(directory) / "alerts.ndjson"
+        with MockSIEM() as mock:
+            channel = create_alert_channel("file, siem", alert_file=str(path), flush_interval=0.05,
+                                           siem_options=dict(siem_type="elastic", endpoint=mock.url,
+                                                             api_key="test-key", spool_dir=directory))
+            channel.observe(self.finding)
+            channel.close()
+            events = mock.events["elastic"]
+        self.assertEqual([(e["ip"], e["alert"]) for e in events], [("10.0.0.5", True)])
+        self.assertTrue((Path(directory) / "alerts" / "elastic").is_dir())  # Apart from the main forwarder's spool
+        self.assertFalse((Path(directory) / "elastic").exists())
+        lines = path.read_text().splitlines()
+        self.assertEqual(json.loads(lines[0])["alert_reason"], "CRITICAL exposure")
+        with self.assertRaises(ValueError):
+            create_alert_channel("pager")
+
+
+if __name__ == '__main__':
+    unittest.main()
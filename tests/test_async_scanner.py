@@ -0,0 +1,76 @@
+﻿"""
+Tests for the asyncio scan engine.
+"""
+
+import asyncio
+import socket
+import time
+import unittest
+
+from src.async_scanner import AsyncScanner
+
+
+def _listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(64)
+    return sock, sock.getsockname()[1]
+
+
+def _closed_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class TestAsyncScanner(unittest.TestCase):
+    """Test the asyncio scanner against local listeners."""
+
+    def setUp(self):
+        self.listener, self.open_port = _listener()
+        self.closed_port = _closed_port()
+        self.scanner = AsyncScanner(timeout=0.5, max_concurrency=16)
+
+    def tearDown(self):
+        self.listener.close()
+
+    def test_scan_host_matches_sync_shape(self):
+        """Open ports come back sorted and stats use the scanner keys."""
+        open_ports = self.scanner.scan_host("127.0.0.1", [self.closed_port, self.open_port])
+
+        self.assertEqual(open_ports, [self.open_port])
+        stats = self.scanner.get_stats()
+        self.assertEqual(stats['hosts_scanned'], 1)
+        self.assertEqual(stats['ports_checked'], 2)
+        self.assertEqual(stats['open_ports_found'], 1)
+
+    def test_scan_host_honours_legacy_delay(self):
+        """An explicit delay paces probes to the host like DefenderSafeScanner."""
+        start = time.monotonic()
+        open_ports = self.scanner.scan_host("127.0.0.1", [self.closed_port, self.open_port, self.closed_port],
+                                            delay=0.1)
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+        self.assertEqual(open_ports, [self.open_port])
+
+    def test_scan_hosts_streams_every_host(self):
+        """Each host is yielded exactly once with its open ports."""
+        hosts = ["127.0.0.1"] + [f"127.0.0.{i}" for i in range(2, 6)]
+
+        async def collect():
+            return [item async for item in self.scanner.scan_hosts(iter(hosts), [self.open_port])]
+
+        results = dict(asyncio.run(collect()))
+        self.assertEqual(set(results), set(hosts))
+        self.assertEqual(results["127.0.0.1"], [self.open_port])
+        self.assertEqual(self.scanner.get_stats()['ports_checked'], len(hosts))
+
+    def test_scan_network_reports_only_exposed_hosts(self):
+        """scan_network drops hosts with nothing open."""
+        found = self.scanner.scan_network(["127.0.0.1"], [self.open_port, self.closed_port])
+        self.assertEqual(found, {"127.0.0.1": [self.open_port]})
+
+
+if __name__ == '__main__':
+    unittest.main()
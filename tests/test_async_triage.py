@@ -0,0 +1,159 @@
+﻿"""
+Tests for the async triage engine and protocol probe modules.
+"""
+
+import asyncio
+import socket
+import struct
+import threading
+import unittest
+
+from src.async_scanner import AsyncScanner
+from src.async_triage import AsyncTriageEngine
+from src.pipeline import SweepPipeline
+from src.probes import (MongoDBProbe, PostgreSQLProbe, RDPProbe, SMBProbe, SSHProbe, default_probes,
+                        probes_by_port)
+from src.probes.mongodb import decode_document, encode_document
+from src.rate_limiter import ProbePacer
+from src.risk_engine import SOCRiskEngine
+
+
+class ScriptedServer:
+    """Local server that optionally reads a request, then sends a canned reply and closes."""
+
+    def __init__(self, reply: bytes, read_request: bool = False):
+        self.reply = reply
+        self.read_request = read_request
+        self.requests = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with conn:
+                conn.settimeout(2)
+                if self.read_request:
+                    self.requests.append(conn.recv(4096))
+                conn.sendall(self.reply)
+
+    def close(self):
+        self.sock.close()
+
+
+def smb2_negotiate_response(dialect: int, security_mode: int) -> bytes:
+    header = struct.pack('<4sHHIHHIIQIIQ16s', b'\xfeSMB', 64, 0, 0, 0, 1, 1, 0, 0, 0, 0, 0, b'\x00' * 16)
+    body = struct.pack('<HHH', 65, security_mode, dialect) + b'\x00' * 58
+    return struct.pack('>I', len(header + body)) + header + body
+
+
+def rdp_confirm(selected: int) -> bytes:
+    payload = bytes([14, 0xD0, 0, 0, 0, 0, 0]) + struct.pack('<BBHI', 0x02, 0, 8, selected)
+    return struct.pack('>BBH', 3, 0, 4 + len(payload)) + payload
+
+
+def on_port(probe, port):
+    probe.ports = (port,)
+    return probe
+
+
+class TestAsyncTriage(unittest.TestCase):
+    """Test protocol probes against scripted services."""
+
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.close()
+
+    def triage(self, probe, reply, read_request=False):
+        server = ScriptedServer(reply, read_request)
+        self.servers.append(server)
+        engine = AsyncTriageEngine(probes=[on_port(probe, server.port)], timeout=1.0)
+        return engine, asyncio.run(engine.triage_service_async('127.0.0.1', server.port)), server
+
+    def test_ssh_facts_and_outdated_version(self):
+        """SSH identification is parsed and old OpenSSH raises the risk."""
+        _, result, _ = self.triage(SSHProbe(), b"SSH-2.0-OpenSSH_7.2p2 Ubuntu\r\n")
+        self.assertEqual(result['details']['protocol'], '2.0')
+        self.assertEqual(result['details']['software'], 'OpenSSH_7.2p2')
+        self.assertEqual(result['final_risk'], 'HIGH')
+        self.assertEqual(result['reliability'], 'HIGH')
+        self.assertIn('SSH probe', result['checks_passed'])
+
+    def test_smb_signing_not_required(self):
+        """SMB2 negotiate reports dialect and flags missing signing."""
+        _, result, server = self.triage(SMBProbe(), smb2_negotiate_response(0x0302, 0x01), read_request=True)
+        self.assertEqual(result['details'], {'dialect': '3.0.2', 'signing_required': False})
+        self.assertEqual(result['final_risk'], 'HIGH')
+        self.assertTrue(server.requests[0][4:8] == b'\xfeSMB')
+
+    def test_rdp_nla_detection(self):
+        """RDP negotiation selecting CredSSP counts as NLA."""
+        _, result, _ = self.triage(RDPProbe(), rdp_confirm(0x2), read_request=True)
+        self.assertTrue(result['details']['nla'])
+        self.assertEqual(result['final_risk'], 'MEDIUM')
+        self.assertEqual(result['adjustment_reason'], 'RDP with NLA detected')
+
+    def test_postgresql_without_tls(self):
+        """SSLRequest answered with 'N' means no TLS."""
+        _, result, server = self.triage(PostgreSQLProbe(), b'N', read_request=True)
+        self.assertEqual(result['details'], {'ssl_supported': False})
+        self.assertEqual(result['final_risk'], 'HIGH')
+        self.assertEqual(server.requests[0], struct.pack('!II', 8, 80877103))
+
+    def test_mongodb_hello(self):
+        """OP_MSG hello reply is decoded into wire-version facts."""
+        document = encode_document({'ok': 1, 'maxWireVersion': 17, 'setName': 'rs0'})
+        body = struct.pack('<I', 0) + b'\x00' + document
+        reply = struct.pack('<iiii', 16 + len(body), 2, 1, 2013) + body
+        _, result, _ = self.triage(MongoDBProbe(), reply, read_request=True)
+        self.assertEqual(result['details']['maxWireVersion'], 17)
+        self.assertEqual(result['details']['setName'], 'rs0')
+        self.assertEqual(decode_document(document), {'ok': 1, 'maxWireVersion': 17, 'setName': 'rs0'})
+
+    def test_probe_failure_keeps_default_risk(self):
+        """A service that answers garbage is recorded as a failed check."""
+        engine, result, _ = self.triage(RDPProbe(), b'\x00garbage', read_request=True)
+        self.assertIn('RDP probe', result['checks_failed'])
+        self.assertEqual(result['adjustment_reason'], 'Initial assessment')
+        self.assertEqual(engine.get_stats()['probe_failures'], 1)
+
+    def test_unmapped_port_uses_banner_rules(self):
+        """Ports without a probe module fall back to a banner read."""
+        server = ScriptedServer(b"hello from a custom service\r\n")
+        self.servers.append(server)
+        engine = AsyncTriageEngine(probes=[], timeout=1.0)
+        result = asyncio.run(engine.triage_service_async('127.0.0.1', server.port))
+        self.assertEqual(result['banner'], 'hello from a custom service')
+        self.assertEqual(result['details'], {})
+
+    def test_default_registry_covers_protocols(self):
+        """Every built-in protocol is registered on its well-known port."""
+        names = {port: probe.name for port, probe in probes_by_port(default_probes()).items()}
+        for port, name in [(22, 'SSH'), (80, 'HTTP'), (443, 'TLS'), (445, 'SMB'), (3389, 'RDP'), (21, 'FTP'),
+                           (25, 'SMTP'), (3306, 'MySQL'), (5432, 'PostgreSQL'), (27017, 'MongoDB')]:
+            self.assertEqual(names[port], name)
+
+    def test_pipeline_runs_probe_on_handed_off_socket(self):
+        """The pipeline feeds probe verdicts into the assessment's true_risk."""
+        server = ScriptedServer(b"SSH-1.5-legacy\r\n")
+        self.servers.append(server)
+        engine = AsyncTriageEngine(probes=[on_port(SSHProbe(), server.port)])
+        scanner = AsyncScanner(timeout=0.5, max_concurrency=4, pacer=ProbePacer())
+        pipeline = SweepPipeline(scanner, SOCRiskEngine(), engine)
+        findings = pipeline.run(['127.0.0.1'], [server.port])
+        self.assertEqual(len(findings), 1)
+        self.assertEqual(findings[0]['true_risk'], 'HIGH')
+        self.assertEqual(findings[0]['context']['triage_details']['protocol'], '1.5')
+
+
+if __name__ == '__main__':
+    unittest.main()
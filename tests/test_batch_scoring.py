@@ -0,0 +1,63 @@
+﻿"""
+Tests for vectorised batch risk scoring.
+"""
+
+import random
+import unittest
+
+import numpy as np
+
+from src.finding_store import FindingStore
+from src.risk_engine import MITRE_ATTACK_MAP, SOCRiskEngine
+
+
+def _strip(assessments):
+    for a in assessments:
+        a.pop('timestamp', None)
+    return assessments
+
+
+class TestAssessBatch(unittest.TestCase):
+    """assess_batch must agree with assess_exposure host for host."""
+
+    def setUp(self):
+        self.engine = SOCRiskEngine()
+        rng = random.Random(42)
+        candidates = sorted(MITRE_ATTACK_MAP) + [3306, 9999]
+        prefixes = ["192.168.10.", "192.168.20.", "10.0.4.", "172.16.1.", "192.168.100."]
+        self.ips = [rng.choice(prefixes) + str(i % 250 + 1) for i in range(300)]
+        self.open_lists = [sorted(rng.sample(candidates, rng.randint(0, 5))) for _ in self.ips]
+        self.open_lists[0] = [445, 3389]
+
+    def expected(self):
+        return _strip([self.engine.assess_exposure(ip, ports) for ip, ports in zip(self.ips, self.open_lists)])
+
+    def test_ragged_lists(self):
+        """Per-host lists of open ports."""
+        self.assertEqual(_strip(self.engine.assess_batch(self.ips, self.open_lists)), self.expected())
+
+    def test_boolean_matrix(self):
+        """Boolean matrix with column labels."""
+        ports = sorted({p for row in self.open_lists for p in row})
+        matrix = np.array([[p in row for p in ports] for row in self.open_lists])
+        self.assertEqual(_strip(self.engine.assess_batch(self.ips, matrix, ports)), self.expected())
+
+    def test_into_store(self):
+        """Bulk rows in a FindingStore match assess_exposure and summarise identically."""
+        store = self.engine.assess_batch(self.ips, self.open_lists, store=FindingStore())
+        self.assertEqual(_strip(list(store)), self.expected())
+        self.assertEqual(self.engine.generate_executive_summary(store),
+                         self.engine.generate_executive_summary(self.expected()))
+        self.assertEqual(store[0]['true_risk'], 'CRITICAL')
+
+    def test_ipv6_hosts(self):
+        """IPv6 rows are scored like IPv4 ones, both as dicts and into a store."""
+        self.ips[1:3] = ["2001:db8::1", "::1"]
+        self.assertEqual(_strip(self.engine.assess_batch(self.ips, self.open_lists)), self.expected())
+        store = self.engine.assess_batch(self.ips, self.open_lists, store=FindingStore())
+        self.assertEqual(_strip(list(store)), self.expected())
+        self.assertEqual(store[1]['context']['network_segment'], 'General_Network')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+﻿"""
+Tests for scan checkpoints and resumed runs.
+"""
+
+import json
+import socket
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.async_scanner import AsyncScanner
+from src.checkpoint import ScanCheckpoint, open_checkpoint
+from src.finding_store import FindingStore
+from src.pipeline import SweepPipeline
+from src.rate_limiter import ProbePacer
+from src.risk_engine import SOCRiskEngine
+
+
+class CountingScanner(AsyncScanner):
+    """AsyncScanner that records every (host, port) it probes."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.probed = []
+
+    async def probe(self, host, port):
+        self.probed.append((host, port))
+        return await super().probe(host, port)
+
+
+class Interrupted(Exception):
+    pass
+
+
+class TestScanCheckpoint(unittest.TestCase):
+    """Test saving progress and resuming without re-probing finished work."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(64)
+        self.open_port = self.listener.getsockname()[1]
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(("127.0.0.1", 0))
+        self.closed_port = closed.getsockname()[1]
+        closed.close()
+        self.ports = [self.open_port, self.closed_port]
+        self.network = "127.0.0.1-127.0.0.40"
+
+    def tearDown(self):
+        self.listener.close()
+
+    def sweep(self, checkpoint, store, stop_after=None):
+        scanner = CountingScanner(timeout=0.5, max_concurrency=4, pacer=ProbePacer())
+
+        def on_probe(host, port, is_open):
+            if stop_after is not None and len(scanner.probed) >= stop_after:
+                raise Interrupted()
+
+        pipeline = SweepPipeline(scanner, SOCRiskEngine(), store=store, checkpoint=checkpoint, on_probe=on_probe)
+        try:
+            pipeline.run(checkpoint.targets(scanner), checkpoint.ports)
+        except Interrupted:
+            pass
+        checkpoint.close()
+        return scanner.probed
+
+    def test_resume_skips_finished_work(self):
+        """A resumed run probes only what the interrupted one had not finished."""
+        checkpoint = ScanCheckpoint.create(self.directory, "sentinel_20260101_020000", self.network, self.ports)
+        first = self.sweep(checkpoint, FindingStore(), stop_after=30)
+        state = json.loads((checkpoint.path / "state.json").read_text())
+        self.assertGreater(state["next_host"], 0)
+        self.assertLess(state["next_host"], 40)
+
+        checkpoint = ScanCheckpoint.load(self.directory, "sentinel_20260101_020000")
+        store = FindingStore()
+        checkpoint.restore(store)
+        second = self.sweep(checkpoint, store)
+
+        everything = {(f"127.0.0.{i}", port) for i in range(1, 41) for port in self.ports}
+        self.assertEqual(set(first) | set(second), everything)
+        # Only work that was in flight when the run stopped is probed twice
+        self.assertLessEqual(len(set(first) & set(second)), 4)
+        self.assertEqual([(a['ip'], a['open_ports']) for a in store], [("127.0.0.1", [self.open_port])])
+
+    def test_findings_restored_without_reprobing(self):
+        """Findings saved before the interruption are restored and their ports are not probed again."""
+        checkpoint = ScanCheckpoint.create(self.directory, "sentinel_20260101_020000", "127.0.0.1",
+                                           self.ports, interval=0)
+        checkpoint.targets(AsyncScanner())
+        hosts = ["127.0.0.1"]
+        list(checkpoint.work(hosts, self.ports))
+        finding = SOCRiskEngine().assess_exposure("127.0.0.1", [self.open_port])
+        checkpoint.finished("127.0.0.1", self.open_port, finding)
+        checkpoint._findings_file.write('{"ip": "torn')  # Written after the last save
+        checkpoint.close()
+
+        checkpoint = ScanCheckpoint.load(self.directory, "sentinel_20260101_020000")
+        store = FindingStore()
+        self.assertEqual(checkpoint.restore(store), 1)
+        probed = self.sweep(checkpoint, store)
+        self.assertEqual(probed, [("127.0.0.1", self.closed_port)])
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store[0]['true_risk'], finding['true_risk'])
+
+    def test_resumed_run_keeps_target_order_and_name(self):
+        """The seed makes a shuffled order repeatable; the run id gives back the report timestamp."""
+        first = open_checkpoint(self.directory, None, "20260101_020000", "10.0.0.0/24", [22])
+        order = list(first.targets(AsyncScanner()))
+        self.assertNotEqual(order, sorted(order, key=lambda ip: int(ip.rsplit(".", 1)[1])))
+        first.close()
+        resumed = open_checkpoint(self.directory, "sentinel_20260101_020000", "20260102_020000", "ignored", [80])
+        self.assertEqual(list(resumed.targets(AsyncScanner())), order)
+        self.assertEqual(resumed.ports, [22])
+        self.assertEqual(resumed.timestamp, "20260101_020000")
+
+        resumed.finish()
+        self.assertFalse(Path(self.directory, "sentinel_20260101_020000").exists())
+        with self.assertRaises(FileNotFoundError):
+            ScanCheckpoint.load(self.directory, "sentinel_20260101_020000")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+﻿"""
+Tests for chunked compressed report output.
+"""
+
+import csv
+import gzip
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.compressed_io import index_path, iter_records, load_index, normalise_codec, read_chunks
+from src.finding_store import FindingStore
+from src.report_writers import CSVWriter, JSONArrayWriter, NDJSONWriter
+from src.reporter import SOCReporter
+from src.risk_engine import SOCRiskEngine
+
+
+class TestCompressedWriters(unittest.TestCase):
+    """Test gzip chunking, the sidecar index and range reads."""
+
+    def setUp(self):
+        self.engine = SOCRiskEngine()
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.assessments = [self.engine.assess_exposure(f"10.0.{i // 250}.{i % 250 + 1}", [22, 3389])
+                            for i in range(2000)]
+
+    def _write(self, cls, name, chunk_size=16 << 10):
+        with cls(self.output_dir / name, compression="gzip", chunk_size=chunk_size) as writer:
+            for a in self.assessments:
+                writer.write(a)
+        return writer.path
+
+    def test_file_is_plain_gzip(self):
+        """The chunk members decompress as one ordinary gzip stream."""
+        path = self._write(JSONArrayWriter, "run.json")
+        self.assertEqual(path.name, "run.json.gz")
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            document = json.load(f)
+        self.assertEqual(len(document["assessments"]), 2000)
+        self.assertEqual(document["assessments"][0], json.loads(json.dumps(self.assessments[0], default=str)))
+
+    def test_index_describes_chunks(self):
+        """Offsets are contiguous and every record is counted once."""
+        path = self._write(NDJSONWriter, "run.ndjson")
+        index = load_index(path)
+        self.assertEqual(index["codec"], "gzip")
+        self.assertEqual(index["format"], "ndjson")
+        self.assertEqual(index["record_count"], 2000)
+        self.assertGreater(len(index["chunks"]), 3)
+        offset = 0
+        for chunk in index["chunks"]:
+            self.assertEqual(chunk["offset"], offset)
+            offset += chunk["length"]
+        self.assertEqual(offset, path.stat().st_size)
+        self.assertTrue((self.output_dir / "run.meta.json").exists())
+
+    def test_range_read_touches_only_matching_chunks(self):
+        """A /24 lookup decompresses a subset of chunks and returns exactly that subnet."""
+        for cls, name in ((NDJSONWriter, "run.ndjson"), (JSONArrayWriter, "run.json"), (CSVWriter, "run.csv")):
+            path = self._write(cls, name)
+            record_chunks = [c for c in load_index(path)["chunks"] if c["records"]]
+            read = list(read_chunks(path, cidr="10.0.3.0/24"))
+            self.assertLess(len(read), len(record_chunks), name)
+            records = list(iter_records(path, cidr="10.0.3.0/24"))
+            self.assertEqual(len(records), 250, name)
+            self.assertTrue(all(r["ip"].startswith("10.0.3.") for r in records), name)
+
+    def test_csv_header_is_its_own_chunk(self):
+        """CSV rows come back keyed by the header written in the first chunk."""
+        path = self._write(CSVWriter, "run.csv")
+        self.assertEqual(load_index(path)["chunks"][0]["records"], 0)
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+            rows = list(csv.reader(io.StringIO(f.read())))
+        self.assertEqual(len(rows), 2001)
+        record = next(iter_records(path, start="10.0.0.1", end="10.0.0.1"))
+        self.assertEqual(record["ports"], "22;3389")
+
+    def test_unknown_codec_rejected(self):
+        """Unknown compression names fail early; none disables compression."""
+        self.assertIsNone(normalise_codec("none"))
+        self.assertIsNone(normalise_codec(None))
+        self.assertEqual(normalise_codec("GZ"), "gzip")
+        with self.assertRaises(ValueError):
+            normalise_codec("lz4")
+
+    def test_reporter_writes_compressed_reports_in_ip_order(self):
+        """Reports from a shuffled store come out sorted, so chunk ranges do not overlap."""
+        store = FindingStore()
+        store.extend(reversed(self.assessments))
+        reporter = SOCReporter(output_dir=str(self.output_dir), compression="gzip")
+        stream = reporter.open_stream()
+        self.assertEqual(stream.formats, ["ndjson"])
+        stream.write_all(store)
+        paths = reporter.generate_reports(store, stream=stream)
+
+        self.assertTrue(paths["json"].endswith(".json.gz"))
+        self.assertTrue(paths["csv"].endswith(".csv.gz"))
+        self.assertTrue(paths["html"].endswith(".html"))
+        self.assertTrue(index_path(Path(paths["csv"])).exists())
+        with gzip.open(paths["json"], "rt", encoding="utf-8") as f:
+            ips = [a["ip"] for a in json.load(f)["assessments"]]
+        self.assertEqual(ips[:2], ["10.0.0.1", "10.0.0.2"])
+        self.assertEqual(len(ips), 2000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+﻿"""
+Tests for the host discovery pre-pass.
+"""
+
+import asyncio
+import socket
+import unittest
+
+from src.async_scanner import AsyncScanner
+from src.discovery import HostDiscovery
+from src.pipeline import SweepPipeline
+from src.rate_limiter import ProbePacer
+from src.risk_engine import SOCRiskEngine
+
+
+def _closed_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class TestHostDiscovery(unittest.TestCase):
+    """Test live/dead decisions and the pipeline's discovery stage against local ports."""
+
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(64)
+        self.open_port = self.listener.getsockname()[1]
+        # A listener whose backlog is full silently drops SYNs, like a host that is not there
+        self.blackhole = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.blackhole.bind(("127.0.0.1", 0))
+        self.blackhole.listen(0)
+        self.silent_port = self.blackhole.getsockname()[1]
+        self.backlog = []
+        for _ in range(3):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.settimeout(0.1)
+            sock.connect_ex(("127.0.0.1", self.silent_port))
+            self.backlog.append(sock)
+        self.scanner = AsyncScanner(timeout=0.2, max_concurrency=16, pacer=ProbePacer())
+
+    def tearDown(self):
+        for sock in self.backlog:
+            sock.close()
+        self.blackhole.close()
+        self.listener.close()
+
+    def test_rst_means_alive(self):
+        """A refused ping proves the host exists and marks that port closed."""
+        closed = _closed_port()
+        discovery = HostDiscovery(self.scanner, [closed, self.silent_port])
+        answers = asyncio.run(discovery.check("127.0.0.1"))
+        self.assertEqual(answers, {closed: False})
+        stats = discovery.get_stats()
+        self.assertEqual((stats['hosts_alive'], stats['alive_by_rst'], stats['hosts_dead']), (1, 1, 0))
+
+    def test_silent_host_is_dead(self):
+        """No answer on any ping port means the host is treated as dead."""
+        discovery = HostDiscovery(self.scanner, [self.silent_port])
+        self.assertEqual(asyncio.run(discovery.check("127.0.0.1")), {})
+        self.assertEqual(discovery.get_stats()['hosts_dead'], 1)
+
+    def test_pipeline_scans_only_live_hosts(self):
+        """Dead hosts never reach the probe stage; refused ping ports are not probed again."""
+        closed = _closed_port()
+        ports = [self.open_port, closed]
+
+        live = SweepPipeline(self.scanner, SOCRiskEngine(),
+                             discovery=HostDiscovery(self.scanner, [closed]))
+        findings = live.run(["127.0.0.1"], ports)
+        self.assertEqual([f['open_ports'] for f in findings], [[self.open_port]])
+        stats = live.get_stats()
+        self.assertEqual((stats['work_items'], stats['probes_skipped'], stats['hosts_alive']), (1, 1, 1))
+
+        probed = []
+        dead = SweepPipeline(self.scanner, SOCRiskEngine(),
+                             discovery=HostDiscovery(self.scanner, [self.silent_port]),
+                             on_probe=lambda host, port, is_open: probed.append((port, is_open)))
+        self.assertEqual(dead.run(["127.0.0.1"], ports), [])
+        stats = dead.get_stats()
+        self.assertEqual((stats['work_items'], stats['probes_skipped'], stats['hosts_dead']), (0, 2, 1))
+        self.assertEqual(sorted(probed), sorted((port, False) for port in ports))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+﻿"""
+Tests for the distributed coordinator and scan workers.
+"""
+
+import multiprocessing
+import socket
+import time
+import unittest
+
+import requests
+
+from src.distributed import Coordinator, ScanWorker, build_plan, run_worker
+
+SETTINGS = {'timeout': 0.5, 'max_concurrency': 32, 'host_rate': 0, 'triage_concurrency': 4}
+
+
+class TestDistributedScan(unittest.TestCase):
+    """Test the lease protocol with local workers."""
+
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(64)
+        self.open_port = self.listener.getsockname()[1]
+        self.units = build_plan("127.0.0.0/26", [self.open_port], unit_hosts=16)
+
+    def tearDown(self):
+        self.listener.close()
+
+    def test_plan_units_cover_the_network(self):
+        """Units are shards of each spec and together hold every address once."""
+        units = build_plan("10.0.0.0/23, 10.1.0.0/24", [22], exclude="10.0.1.0/25", unit_hosts=256)
+        self.assertEqual([(u["network"], u["shard"]) for u in units],
+                         [("10.0.0.0/23", [0, 2]), ("10.0.0.0/23", [1, 2]), ("10.1.0.0/24", [0, 1])])
+        self.assertEqual(len(self.units), 4)
+
+    def test_worker_processes_complete_the_plan(self):
+        """Several worker processes share the units; findings arrive once at the coordinator."""
+        with Coordinator(self.units, SETTINGS, port=0, token="secret") as coordinator:
+            ctx = multiprocessing.get_context("spawn")
+            workers = [ctx.Process(target=run_worker, args=(coordinator.url,),
+                                   kwargs={"token": "secret", "worker_id": f"node-{i}", "push_interval": 0.2})
+                       for i in range(2)]
+            for worker in workers:
+                worker.start()
+            self.assertTrue(coordinator.wait(timeout=60))
+            for worker in workers:
+                worker.join(timeout=10)
+            status = coordinator.status()
+        self.assertEqual(status["units"]["done"], 4)
+        self.assertEqual([(a['ip'], a['open_ports']) for a in coordinator.store], [("127.0.0.1", [self.open_port])])
+        self.assertTrue(all(worker.exitcode == 0 for worker in workers))
+
+    def test_expired_lease_is_redispatched(self):
+        """A dead worker's unit goes to another worker and its partial findings are dropped."""
+        with Coordinator(self.units[:1], SETTINGS, port=0, lease_ttl=0.3) as coordinator:
+            lease = requests.post(f"{coordinator.url}/lease", json={"worker": "dead"}).json()
+            requests.post(f"{coordinator.url}/findings",
+                          json={"lease": lease["lease"], "findings": [{"ip": "10.9.9.9", "open_ports": [1]}]})
+            time.sleep(0.4)
+
+            stats = ScanWorker(coordinator.url, worker_id="alive", push_interval=0.1).run()
+            self.assertEqual(stats['units_completed'], 1)
+            late = requests.post(f"{coordinator.url}/complete", json={"lease": lease["lease"], "findings": []})
+            self.assertEqual(late.status_code, 409)
+            status = coordinator.status()
+        self.assertEqual(status["redispatched"], 1)
+        self.assertEqual([a['ip'] for a in coordinator.store], ["127.0.0.1"])
+
+    def test_token_and_network_restrictions(self):
+        """Requests need the token; a worker only gets units inside its networks."""
+        with Coordinator(self.units, SETTINGS, port=0, token="secret") as coordinator:
+            self.assertEqual(requests.get(f"{coordinator.url}/status").status_code, 401)
+            headers = {"Authorization": "Bearer secret"}
+            elsewhere = requests.post(f"{coordinator.url}/lease", headers=headers,
+                                      json={"worker": "site-b", "networks": ["10.0.0.0/8"]}).json()
+            self.assertIsNone(elsewhere["lease"])
+            here = requests.post(f"{coordinator.url}/lease", headers=headers,
+                                 json={"worker": "site-a", "networks": ["127.0.0.0/24"]}).json()
+            self.assertEqual(here["unit"]["id"], "u0")
+            self.assertEqual(here["settings"]["timeout"], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+﻿"""
+Tests for per-host drift detection.
+"""
+
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from src.finding_store import FindingStore
+from src.reporter import BaselineWriter, SOCReporter, build_host_index, port_fingerprints
+from src.risk_engine import SOCRiskEngine
+
+
+class TestDriftDetection(unittest.TestCase):
+    """Test the baseline host index and the per-host diff."""
+
+    def setUp(self):
+        self.engine = SOCRiskEngine()
+        self.output_dir = tempfile.mkdtemp()
+        self.baseline = [
+            self.engine.assess_exposure("10.0.0.1", [22]),
+            self.engine.assess_exposure("10.0.0.1", [80]),
+            self.engine.assess_exposure("10.0.0.2", [3389], {'final_risk': 'MEDIUM'}),
+            self.engine.assess_exposure("10.0.0.3", [445]),
+        ]
+
+    def write_baseline(self, assessments):
+        writer = BaselineWriter(Path(self.output_dir) / "baseline_20260101_000000.json")
+        for ip, port, risk in port_fingerprints(assessments):
+            writer.add(ip, port, risk)
+        writer.close()
+
+    def test_timestamps_do_not_cause_drift(self):
+        """A rescan with identical exposure but new timestamps is not drift."""
+        self.write_baseline(self.baseline)
+        time.sleep(0.01)
+        rescan = [self.engine.assess_exposure(a['ip'], a['open_ports']) for a in self.baseline]
+        rescan[2] = self.engine.assess_exposure("10.0.0.2", [3389], {'final_risk': 'MEDIUM'})
+        result = SOCReporter(output_dir=self.output_dir).detect_drift(rescan)
+        self.assertFalse(result['drift_detected'])
+        self.assertEqual(result['host_delta'], 0)
+
+    def test_reports_opened_closed_and_risk_changes(self):
+        """Drift lists exactly which ports and risks changed, per host."""
+        self.write_baseline(self.baseline)
+        current = [
+            self.engine.assess_exposure("10.0.0.1", [22]),
+            self.engine.assess_exposure("10.0.0.1", [443]),
+            self.engine.assess_exposure("10.0.0.2", [3389]),
+            self.engine.assess_exposure("10.0.0.9", [21]),
+        ]
+        result = SOCReporter(output_dir=self.output_dir).detect_drift(current)
+        self.assertTrue(result['drift_detected'])
+        self.assertEqual(result['changed_hosts']['10.0.0.1']['opened'], [443])
+        self.assertEqual(result['changed_hosts']['10.0.0.1']['closed'], [80])
+        self.assertEqual(result['changed_hosts']['10.0.0.2']['risk_changed'],
+                         {'3389': {'from': 'MEDIUM', 'to': 'HIGH'}})
+        self.assertEqual(result['new_hosts'], {'10.0.0.9': [21]})
+        self.assertEqual(result['removed_hosts'], {'10.0.0.3': [445]})
+        self.assertEqual((result['ports_opened'], result['ports_closed'], result['risk_changes']), (2, 2, 1))
+
+    def test_own_baseline_is_skipped(self):
+        """Drift after generate_reports compares with the previous run, not itself."""
+        self.write_baseline(self.baseline)
+        reporter = SOCReporter(output_dir=self.output_dir)
+        current = self.baseline[:2]
+        reporter.generate_reports(current)
+        result = reporter.detect_drift(current)
+        self.assertTrue(result['drift_detected'])
+        self.assertIn('10.0.0.3', result['removed_hosts'])
+
+    def test_store_index_matches_list(self):
+        """The index built from FindingStore columns equals the dict-based one."""
+        store = FindingStore()
+        store.extend(self.baseline)
+        self.assertEqual(build_host_index(store), build_host_index(self.baseline))
+        self.assertEqual(build_host_index(self.baseline)['10.0.0.1'], {'22': 'MEDIUM', '80': 'LOW'})
+
+    def test_baseline_is_compact_index(self):
+        """The baseline stores the host index, not the assessments."""
+        self.write_baseline(self.baseline)
+        with open(f"{self.output_dir}/baseline_20260101_000000.json", encoding="utf-8") as f:
+            baseline = json.load(f)
+        self.assertEqual(baseline['host_count'], 3)
+        self.assertEqual(set(baseline['hosts']['10.0.0.1']), {'digest', 'ports'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+﻿"""
+Tests for the columnar finding store.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.finding_store import FindingStore
+from src.reporter import SOCReporter
+from src.risk_engine import SOCRiskEngine
+
+
+class TestFindingStore(unittest.TestCase):
+    """Test that the store round-trips assessments and feeds summary/reporter."""
+
+    def setUp(self):
+        self.engine = SOCRiskEngine()
+        self.assessments = [
+            self.engine.assess_exposure("192.168.10.5", [3389, 445]),
+            self.engine.assess_exposure("10.0.3.7", [22], {'final_risk': 'LOW', 'adjustment_reason': 'test',
+                                                            'details': {'banner': 'SSH-2.0'}}),
+            self.engine.assess_exposure("172.16.0.1", []),
+        ]
+
+    def test_round_trip_matches_assess_exposure(self):
+        """Dict views are identical to the dicts they were built from."""
+        store = FindingStore()
+        store.extend(self.assessments)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(list(store), self.assessments)
+
+    def test_ipv6_rows(self):
+        """IPv6 findings are stored alongside IPv4 ones and sort after them."""
+        store = FindingStore()
+        self.engine.record(store, "2001:db8::1", [22], None)
+        store.extend(self.assessments)
+        self.assertEqual(store[0]['ip'], "2001:db8::1")
+        self.assertEqual([f['ip'] for f in store.in_ip_order()],
+                         ["10.0.3.7", "172.16.0.1", "192.168.10.5", "2001:db8::1"])
+        self.assertEqual(next(store.port_risks())[:2], ("2001:db8::1", 22))
+
+    def test_record_matches_assess_exposure(self):
+        """record() stores the same result assess_exposure would build."""
+        store = FindingStore()
+        row = self.engine.record(store, "192.168.10.5", [3389, 445])
+        expected = self.engine.assess_exposure("192.168.10.5", [3389, 445])
+        view = store[row]
+        view.pop('timestamp'), expected.pop('timestamp')
+        self.assertEqual(view, expected)
+
+    def test_summary_from_columns(self):
+        """Executive summary from columns equals the dict-based one."""
+        store = FindingStore()
+        store.extend(self.assessments)
+        self.assertEqual(self.engine.generate_executive_summary(store),
+                         self.engine.generate_executive_summary(self.assessments))
+        self.assertEqual(store.top(1)[0]['ip'], "192.168.10.5")
+
+    def test_reporter_accepts_store(self):
+        """Reports and baselines are identical for a store and a list."""
+        store = FindingStore()
+        store.extend(self.assessments)
+        reporter = SOCReporter(output_dir=tempfile.mkdtemp())
+        paths = reporter.generate_reports(store)
+        self.assertTrue(Path(paths['json']).exists())
+        self.assertFalse(reporter.detect_drift(self.assessments)['drift_detected'])
+
+    def test_numpy_columns(self):
+        """as_numpy exposes typed columns."""
+        store = FindingStore()
+        store.extend(self.assessments)
+        cols = store.as_numpy()
+        self.assertEqual(str(cols['ip'].dtype), 'uint32')
+        self.assertEqual(cols['ports'].tolist(), [3389, 445, 22])
+
+
+if __name__ == '__main__':
+    unittest.main()
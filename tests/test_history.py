@@ -0,0 +1,87 @@
+﻿"""
+Tests for the SQLite scan history.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.finding_store import FindingStore
+from src.history import ScanHistory
+from src.reporter import SOCReporter
+from src.risk_engine import SOCRiskEngine
+
+
+class TestScanHistory(unittest.TestCase):
+    """Test recording runs and the query API."""
+
+    def setUp(self):
+        self.engine = SOCRiskEngine()
+        self.history = ScanHistory(":memory:")
+        self.history.record_run([
+            self.engine.assess_exposure("10.0.5.7", [22]),
+            self.engine.assess_exposure("10.0.9.1", [3389]),
+        ], run_id="night_1", started_at="2026-01-01T02:00:00+00:00")
+        self.history.record_run([
+            self.engine.assess_exposure("10.0.5.7", [22]),
+            self.engine.assess_exposure("10.0.5.7", [3389], {'final_risk': 'CRITICAL'}),
+            self.engine.assess_exposure("10.0.5.8", [3389]),
+        ], run_id="night_2", started_at="2026-01-02T02:00:00+00:00")
+
+    def tearDown(self):
+        self.history.close()
+
+    def test_first_open_within_cidr(self):
+        """First run where a port opened is found per network."""
+        self.assertEqual(self.history.first_open(3389)['run_id'], "night_1")
+        first = self.history.first_open(3389, "10.0.5.0/24")
+        self.assertEqual((first['ip'], first['run_id']), ("10.0.5.7", "night_2"))
+        self.assertIsNone(self.history.first_open(445))
+
+    def test_runs_follow_start_time(self):
+        """A re-recorded earlier run stays first everywhere, despite its newer row id."""
+        self.history.record_run([self.engine.assess_exposure("10.0.5.9", [22])],
+                                run_id="night_1", started_at="2026-01-01T02:00:00+00:00")
+        first = self.history.first_open(22)
+        self.assertEqual((first['ip'], first['run_id']), ("10.0.5.9", "night_1"))
+        self.assertEqual([r['run_id'] for r in self.history.runs()], ["night_1", "night_2"])
+        self.assertEqual([t['open_count'] for t in self.history.port_trend(port=22)], [1, 1])
+        self.assertEqual([r['ip'] for r in self.history.open_ports(port=3389)], ["10.0.5.7", "10.0.5.8"])
+
+    def test_open_ports_defaults_to_latest_run(self):
+        """open_ports filters the latest run by port, risk and network."""
+        rows = self.history.open_ports(port=3389)
+        self.assertEqual([r['ip'] for r in rows], ["10.0.5.7", "10.0.5.8"])
+        self.assertEqual(self.history.open_ports(risk="CRITICAL"), [{'ip': "10.0.5.7", 'port': 3389, 'risk': "CRITICAL"}])
+        self.assertEqual(len(self.history.open_ports(run_id="night_1", cidr="10.0.9.0/24")), 1)
+
+    def test_trend_and_host_history(self):
+        """Per-run counts and per-host history come from the ports table."""
+        trend = self.history.port_trend(port=3389)
+        self.assertEqual([t['open_count'] for t in trend], [1, 2])
+        history = self.history.host_history("10.0.9.1")
+        self.assertEqual([h['ports'] for h in history], [{3389: 'HIGH'}, {}])
+
+    def test_rerecording_replaces_run(self):
+        """Recording the same run_id twice keeps one copy."""
+        self.history.record_run([self.engine.assess_exposure("10.0.5.7", [80])], run_id="night_2")
+        runs = self.history.runs()
+        self.assertEqual([r['run_id'] for r in runs], ["night_1", "night_2"])
+        self.assertEqual((runs[1]['host_count'], runs[1]['finding_count']), (1, 1))
+
+    def test_reporter_records_run(self):
+        """SOCReporter writes each generated report into the history."""
+        output_dir = tempfile.mkdtemp()
+        store = FindingStore()
+        store.extend([self.engine.assess_exposure("192.168.1.4", [445])])
+        with ScanHistory(str(Path(output_dir) / "history.db")) as history:
+            reporter = SOCReporter(output_dir=output_dir, history=history)
+            reporter.started_at = "2026-01-03T02:00:00+00:00"  # As set from the checkpoint
+            paths = reporter.generate_reports(store)
+            self.assertEqual(history.open_ports()[0]['port'], 445)
+            self.assertEqual(history.runs()[0]['started_at'], "2026-01-03T02:00:00+00:00")
+            self.assertTrue(Path(paths['history']).exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+﻿"""
+Tests for the HTML dashboard report.
+"""
+
+import json
+import re
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.finding_store import FindingStore
+from src.html_dashboard import DashboardWriter, render_charts, write_dashboard
+from src.reporter import SOCReporter
+from src.risk_engine import SOCRiskEngine
+
+
+def embedded_data(page: str) -> dict:
+    return json.loads(re.search(r'id="findings-data">(.*?)</script>', page, re.S).group(1))
+
+
+class TestHTMLDashboard(unittest.TestCase):
+    """Test the embedded data block, charts and fallback table."""
+
+    def setUp(self):
+        self.engine = SOCRiskEngine()
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.assessments = [self.engine.assess_exposure(f"10.0.0.{i}", [22] if i % 2 else [3389, 445])
+                            for i in range(1, 51)]
+
+    def test_all_findings_are_embedded(self):
+        """Every finding is in the data block, not just the top 20."""
+        reporter = SOCReporter(output_dir=str(self.output_dir))
+        writer = DashboardWriter(self.output_dir / "dashboard.html", {"report_id": "r"}, {},
+                                 render_row=reporter._render_row)
+        for assessment in self.assessments:
+            writer.write(assessment)
+        path = writer.close()
+        page = Path(path).read_text(encoding="utf-8")
+        data = embedded_data(page)
+        self.assertEqual(len(data['rows']), 50)
+        self.assertEqual(data['rows'][1], ["10.0.0.2", "3389;445", data['risks'].index("CRITICAL"), 20,
+                                           data['segments'].index("Server_Farm"), 0])
+        self.assertEqual(page.count("<tr>"), 21)  # No-script fallback: header + top 20
+
+    def test_store_and_list_embed_the_same_rows(self):
+        """A FindingStore is rendered from its columns with identical output data."""
+        store = FindingStore()
+        store.extend(self.assessments)
+        pages = []
+        for source in (self.assessments, store):
+            path = self.output_dir / f"{len(pages)}.html"
+            write_dashboard(path, {}, {}, source)
+            pages.append(embedded_data(path.read_text(encoding="utf-8")))
+        self.assertEqual(pages[0], pages[1])
+
+    def test_script_end_tag_is_escaped(self):
+        """Data cannot close the <script> element early."""
+        path = self.output_dir / "x.html"
+        hostile = dict(self.assessments[0], context={"network_segment": "</script><b>"})
+        write_dashboard(path, {}, {}, [hostile])
+        page = path.read_text(encoding="utf-8")
+        self.assertNotIn("</script><b>", page)
+        self.assertEqual(embedded_data(page)['segments'], ["</script><b>"])
+
+    def test_charts_are_pre_aggregated(self):
+        """Charts carry the counts per segment and port."""
+        markup = render_charts({"DMZ": {"HIGH": 3, "LOW": 1}}, {"22": 4, "80": 2})
+        self.assertIn('title="HIGH: 3"', markup)
+        self.assertIn('<span class="label">22</span>', markup)
+        self.assertLess(markup.index(">22<"), markup.index(">80<"))
+
+
+if __name__ == '__main__':
+    unittest.main()
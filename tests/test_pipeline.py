@@ -0,0 +1,158 @@
+﻿"""
+Tests for the streaming sweep pipeline.
+"""
+
+import asyncio
+import socket
+import threading
+import unittest
+
+from src.async_scanner import AsyncScanner
+from src.pipeline import SweepPipeline
+from src.rate_limiter import ProbePacer
+from src.risk_engine import SOCRiskEngine
+from src.scanner import DefenderSafeScanner
+from src.triage_engine import TriageEngine
+
+
+class BannerServer:
+    """Local server that greets every connection with an SSH banner and counts accepts."""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(64)
+        self.port = self.sock.getsockname()[1]
+        self.accepted = 0
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.accepted += 1
+            conn.sendall(b"SSH-2.0-OpenSSH_9.6\r\n")
+            conn.close()
+
+    def close(self):
+        self.sock.close()
+
+
+class StubTriage:
+    """Triage stand-in that never touches the network."""
+
+    def triage_service(self, ip, port):
+        return {'final_risk': 'LOW', 'adjustment_reason': 'stub'}
+
+
+class TestSweepPipeline(unittest.TestCase):
+    """Test the producer -> probe -> triage -> risk stages."""
+
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(64)
+        self.open_port = self.listener.getsockname()[1]
+        self.scanner = AsyncScanner(timeout=0.5, max_concurrency=8, pacer=ProbePacer())
+
+    def tearDown(self):
+        self.listener.close()
+
+    def test_one_assessment_per_open_service(self):
+        """Open services are triaged and assessed; closed ones are dropped."""
+        seen = []
+        pipeline = SweepPipeline(self.scanner, SOCRiskEngine(), StubTriage(),
+                                 queue_size=2, triage_workers=2, on_finding=seen.append)
+        hosts = (f"127.0.0.{i}" for i in range(1, 4))
+
+        assessments = pipeline.run(hosts, [self.open_port, 1])
+
+        self.assertEqual([a['ip'] for a in assessments], ["127.0.0.1"])
+        self.assertEqual(assessments[0]['open_ports'], [self.open_port])
+        self.assertEqual(assessments[0]['true_risk'], 'LOW')
+        self.assertEqual(seen, assessments)
+
+        stats = pipeline.get_stats()
+        self.assertEqual(stats['work_items'], 6)
+        self.assertEqual(stats['ports_checked'], 6)
+        self.assertEqual(stats['hosts_scanned'], 3)
+        self.assertEqual(stats['triaged'], 1)
+
+    def test_triage_ports_filter_and_no_collect(self):
+        """Ports outside triage_ports skip triage; collect=False streams only."""
+        seen = []
+        pipeline = SweepPipeline(self.scanner, SOCRiskEngine(), StubTriage(),
+                                 triage_ports={22}, on_finding=seen.append, collect=False)
+
+        self.assertEqual(pipeline.run(["127.0.0.1"], [self.open_port]), [])
+        self.assertEqual(len(seen), 1)
+        self.assertFalse(seen[0]['risk_adjusted'])
+
+    def test_failing_stage_stops_the_sweep(self):
+        """An error in a downstream stage is raised instead of leaving upstream stages blocked on full queues."""
+        def on_finding(assessment):
+            raise RuntimeError("report stream broke")
+
+        pipeline = SweepPipeline(self.scanner, SOCRiskEngine(), queue_size=2, probe_workers=2, triage_workers=2,
+                                 on_finding=on_finding)
+        with self.assertRaisesRegex(RuntimeError, "report stream broke"):
+            asyncio.run(asyncio.wait_for(pipeline.run_async(["127.0.0.1"] * 50, [self.open_port]), 5))
+
+    def test_hosts_count_once_their_probes_finish(self):
+        """A sweep that stops mid-host does not count that host as scanned."""
+        def on_probe(host, port, is_open):
+            raise RuntimeError("stop")
+
+        pipeline = SweepPipeline(self.scanner, SOCRiskEngine(), probe_workers=1, on_probe=on_probe)
+        with self.assertRaises(RuntimeError):
+            pipeline.run(["127.0.0.1"], [1, self.open_port])
+        self.assertEqual(pipeline.get_stats()['hosts_scanned'], 0)
+        self.assertEqual(SweepPipeline(self.scanner, SOCRiskEngine()).run(["127.0.0.1"] * 3, [1]), [])
+        self.assertEqual(self.scanner.get_stats()['hosts_scanned'], 3)
+
+    def test_one_shot_hosts_with_several_passes(self):
+        """A host generator is swept on every pass, not only the first."""
+        pipeline = SweepPipeline(self.scanner, SOCRiskEngine(), passes=[[1], [self.open_port]])
+        assessments = pipeline.run((f"127.0.0.{i}" for i in range(1, 3)), [1, self.open_port])
+        self.assertEqual([a['ip'] for a in assessments], ["127.0.0.1"])
+        self.assertEqual(pipeline.get_stats()['ports_checked'], 4)
+
+
+class TestConnectionHandoff(unittest.TestCase):
+    """Triage reuses the scanner's connection instead of reconnecting."""
+
+    def setUp(self):
+        self.server = BannerServer()
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_pipeline_connects_once_per_open_port(self):
+        """One accept per open service, with the banner read on that connection."""
+        scanner = AsyncScanner(timeout=0.5, max_concurrency=8, pacer=ProbePacer())
+        pipeline = SweepPipeline(scanner, SOCRiskEngine(), TriageEngine())
+
+        assessments = pipeline.run(["127.0.0.1"], [self.server.port])
+
+        self.assertEqual(self.server.accepted, 1)
+        self.assertEqual(pipeline.get_stats()['triaged'], 1)
+        self.assertIn('SSH-2.0', assessments[0]['verification'])
+
+    def test_sync_scanner_hands_socket_to_triage(self):
+        """keep_connections + take_connection feed triage_service(sock=...)."""
+        scanner = DefenderSafeScanner(timeout=0.5, pacer=ProbePacer(), keep_connections=True)
+        self.assertEqual(scanner.scan_host("127.0.0.1", [self.server.port]), [self.server.port])
+
+        sock = scanner.take_connection("127.0.0.1", self.server.port)
+        result = TriageEngine().triage_service("127.0.0.1", self.server.port, sock=sock)
+
+        self.assertEqual(self.server.accepted, 1)
+        self.assertEqual(result['banner'], "SSH-2.0-OpenSSH_9.6")
+        self.assertIsNone(scanner.take_connection("127.0.0.1", self.server.port))
+
+
+if __name__ == '__main__':
+    unittest.main()
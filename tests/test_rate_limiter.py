@@ -0,0 +1,91 @@
+﻿"""
+Tests for token-bucket probe pacing.
+"""
+
+import asyncio
+import time
+import unittest
+
+from src.rate_limiter import ProbePacer, TokenBucket
+from src.scanner import DefenderSafeScanner
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test the virtual-scheduling token bucket."""
+
+    def test_spacing_without_burst(self):
+        """Consecutive tokens are one interval apart."""
+        bucket = TokenBucket(rate=10)
+        first = bucket.earliest(100.0)
+        bucket.consume(first)
+        second = bucket.earliest(100.0)
+        self.assertAlmostEqual(second - first, 0.1)
+
+    def test_burst_allows_back_to_back(self):
+        """A burst of N tokens is available immediately."""
+        bucket = TokenBucket(rate=10, burst=3)
+        for _ in range(3):
+            at = bucket.earliest(100.0)
+            self.assertEqual(at, 100.0)
+            bucket.consume(at)
+        self.assertGreater(bucket.earliest(100.0), 100.0)
+
+
+class TestProbePacer(unittest.TestCase):
+    """Test combined global/host/subnet pacing."""
+
+    def test_host_rate_only_throttles_same_host(self):
+        """Different hosts do not wait on each other's per-host bucket."""
+        pacer = ProbePacer(host_rate=2)
+        self.assertEqual(pacer.reserve("10.0.0.1"), 0)
+        self.assertEqual(pacer.reserve("10.0.1.1"), 0)
+        self.assertAlmostEqual(pacer.reserve("10.0.0.1"), 0.5, places=2)
+
+    def test_subnet_rate_groups_by_slash_24(self):
+        """Hosts in one /24 share the subnet bucket."""
+        pacer = ProbePacer(subnet_rate=4)
+        pacer.reserve("10.0.0.1")
+        self.assertAlmostEqual(pacer.reserve("10.0.0.2"), 0.25, places=2)
+        self.assertEqual(pacer.reserve("10.0.1.2"), 0)
+
+    def test_stats_report_configured_and_achieved(self):
+        """Achieved rate tracks the configured global rate."""
+        pacer = ProbePacer(rate=50)
+        for _ in range(6):
+            pacer.acquire("10.0.0.1")
+        stats = pacer.get_stats()
+        self.assertEqual(stats['configured_rate'], 50)
+        self.assertAlmostEqual(stats['achieved_rate'], 50, delta=1)
+
+    def test_achieved_rate_uses_actual_send_times(self):
+        """A late release (here a blocked event loop) lowers the achieved rate below the schedule."""
+        pacer = ProbePacer(rate=10)
+
+        async def sweep():
+            async def stall():
+                time.sleep(0.5)
+
+            await asyncio.gather(pacer.acquire_async("10.0.0.1"), pacer.acquire_async("10.0.0.2"), stall())
+
+        asyncio.run(sweep())
+        self.assertLess(pacer.get_stats()['achieved_rate'], 3)  # Scheduled 0.1s apart, released ~0.5s apart
+
+
+class TestScannerPacing(unittest.TestCase):
+    """Test that the scanner paces emission rather than collection."""
+
+    def test_scan_host_is_paced_and_reports_rate(self):
+        """Per-host rate bounds the scan and get_stats exposes it."""
+        scanner = DefenderSafeScanner(timeout=0.1, max_workers=8, pacer=ProbePacer(host_rate=20))
+        start = time.monotonic()
+        scanner.scan_host("127.0.0.1", [9, 9999, 9998, 9997, 9996])
+        elapsed = time.monotonic() - start
+
+        self.assertGreaterEqual(elapsed, 0.19)
+        stats = scanner.get_stats()
+        self.assertEqual(stats['configured_host_rate'], 20)
+        self.assertIn('achieved_rate', stats)
+
+
+if __name__ == '__main__':
+    unittest.main()
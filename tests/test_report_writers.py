@@ -0,0 +1,179 @@
+﻿"""
+Tests for the streaming report writers.
+"""
+
+import csv
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from src.finding_store import FindingStore
+from src.history import ScanHistory
+from src.report_writers import CSV_COLUMNS, CSVWriter, JSONArrayWriter, NDJSONWriter, ReportFanOut
+from src.reporter import SOCReporter
+from src.retention import RunIndex
+from src.risk_engine import SOCRiskEngine
+
+
+class TestReportWriters(unittest.TestCase):
+    """Test NDJSON and streamed JSON output."""
+
+    def setUp(self):
+        self.engine = SOCRiskEngine()
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.assessments = [self.engine.assess_exposure(f"10.0.0.{i}", [22]) for i in range(1, 6)]
+
+    def test_ndjson_is_readable_while_open(self):
+        """Flushed lines can be tailed before the writer is closed."""
+        writer = NDJSONWriter(self.output_dir / "run.ndjson", flush_every=2)
+        for a in self.assessments[:3]:
+            writer.write(a)
+        lines = (self.output_dir / "run.ndjson").read_text(encoding="utf-8").splitlines()
+        self.assertEqual([json.loads(line)['ip'] for line in lines], ["10.0.0.1", "10.0.0.2"])
+        writer.close({"report_id": "run"})
+        meta = json.loads(writer.metadata_path.read_text(encoding="utf-8"))
+        self.assertEqual(meta, {"report_id": "run", "record_count": 3})
+
+    def test_json_array_is_valid_after_close(self):
+        """The streamed JSON document parses and carries metadata written last."""
+        with JSONArrayWriter(self.output_dir / "run.json") as writer:
+            for a in self.assessments:
+                writer.write(a)
+            writer.close({"scan_summary": {"total_hosts": 5}})
+        document = json.loads((self.output_dir / "run.json").read_text(encoding="utf-8"))
+        self.assertEqual(document['assessments'], self.assessments)
+        self.assertEqual(document['metadata']['scan_summary']['total_hosts'], 5)
+        self.assertEqual(document['schema_version'], "3.0")
+
+    def test_empty_stream_is_valid(self):
+        """Closing without findings still produces valid JSON."""
+        JSONArrayWriter(self.output_dir / "empty.json").close()
+        document = json.loads((self.output_dir / "empty.json").read_text(encoding="utf-8"))
+        self.assertEqual(document, {"schema_version": "3.0", "assessments": [], "metadata": {}})
+
+    def test_reporter_finalises_stream(self):
+        """generate_reports closes a stream fed during the run instead of rewriting JSON."""
+        reporter = SOCReporter(output_dir=str(self.output_dir))
+        stream = reporter.open_stream()
+        store = FindingStore()
+        for a in self.assessments:
+            store.add_assessment(a)
+            stream.write(a)
+        paths = reporter.generate_reports(store, stream=stream)
+        self.assertEqual(set(paths), {"json", "ndjson", "csv", "html", "baseline"})
+        document = json.loads(Path(paths['json']).read_text(encoding="utf-8"))
+        self.assertEqual(document['metadata']['scan_summary']['total_hosts'], 5)
+        self.assertEqual(len(Path(paths['ndjson']).read_text(encoding="utf-8").splitlines()), 5)
+
+    def test_csv_columns_and_rows(self):
+        """The stdlib CSV writer keeps the report's columns."""
+        assessments = [self.engine.assess_exposure("10.0.0.1", [3389, 445]),
+                       self.engine.assess_exposure("8.8.8.8", [80], {'final_risk': 'LOW'})]
+        writer = CSVWriter(self.output_dir / "run.csv")
+        for a in assessments:
+            writer.write(a)
+        writer.close()
+        with open(self.output_dir / "run.csv", encoding="utf-8", newline="") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], CSV_COLUMNS)
+        self.assertEqual(rows[1], ["10.0.0.1", "3389;445", "CRITICAL", "CRITICAL", "20", "False",
+                                   "Server_Farm", "T1021.001;T1021.002"])
+        self.assertEqual(rows[2][3:6], ["LOW", "3", "True"])
+
+    def test_reporter_does_not_import_pandas(self):
+        """Generating reports never pulls in pandas."""
+        code = ("import sys, tempfile; from src.reporter import SOCReporter; "
+                "SOCReporter(tempfile.mkdtemp()).generate_reports([]); print('pandas' in sys.modules)")
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip(), "False")
+
+    def test_analytics_dataframe_from_store(self):
+        """The optional DataFrame helper gives the same rows for a store and a list."""
+        try:
+            import pandas  # noqa: F401
+        except ImportError:
+            self.skipTest("pandas not installed")
+        from src.analytics import findings_dataframe
+        store = FindingStore()
+        store.extend(self.assessments)
+        from_store = findings_dataframe(store)
+        from_list = findings_dataframe(self.assessments)
+        self.assertEqual(list(from_store.columns), CSV_COLUMNS)
+        self.assertEqual(from_store.astype(str).values.tolist(), from_list.astype(str).values.tolist())
+
+
+    def test_fan_out_reads_findings_once(self):
+        """generate_reports walks the findings a single time for every writer."""
+        reads = []
+
+        class CountingList(list):
+            def __iter__(inner):
+                reads.append(1)
+                return super().__iter__()
+
+        reporter = SOCReporter(output_dir=str(self.output_dir))
+        paths = reporter.generate_reports(CountingList(self.assessments), summary={"total_hosts": 5})
+        self.assertEqual(len(reads), 1)
+        self.assertEqual(set(paths), {"json", "ndjson", "csv", "html", "baseline"})
+        self.assertEqual(set(reporter.timings), {"json", "ndjson", "csv", "html", "baseline", "total"})
+
+    def test_report_format_selects_writers(self):
+        """Only the configured formats (plus the baseline) are written."""
+        reporter = SOCReporter(output_dir=str(self.output_dir), formats="csv, html,bogus")
+        self.assertEqual(reporter.formats, ["csv", "html"])
+        paths = reporter.generate_reports(self.assessments)
+        self.assertEqual(set(paths), {"csv", "html", "baseline"})
+        written = sorted(p.suffix for p in self.output_dir.iterdir() if p.name != "index.json")
+        self.assertEqual(written, [".csv", ".html", ".json"])
+
+    def test_failing_writer_does_not_hang(self):
+        """A failing writer is released, the others finish, and its error is raised afterwards."""
+
+        class Broken:
+            closed = False
+
+            def write(self, assessment):
+                raise OSError("disk full")
+
+            def close(self, metadata=None):
+                self.closed = True
+                return "never"
+
+        class Truncated(NDJSONWriter):
+            def _write_record(self, assessment):
+                if self.count == 3:
+                    raise OSError("disk full")
+                super()._write_record(assessment)
+
+        broken = Broken()
+        writers = {"broken": broken, "partial": Truncated(self.output_dir / "partial.ndjson"),
+                   "csv": CSVWriter(self.output_dir / "ok.csv")}
+        fan_out = ReportFanOut(writers, batch_size=1, queue_depth=1)
+        with self.assertRaises(OSError):
+            fan_out.run(self.assessments * 20)
+        self.assertTrue(broken.closed)
+        self.assertFalse((self.output_dir / "partial.ndjson").exists())  # Aborted, not left half-written
+        with open(self.output_dir / "ok.csv", newline="") as f:
+            self.assertEqual(len(list(csv.reader(f))), 1 + len(self.assessments) * 20)
+
+    def test_failed_writer_still_indexes_the_finished_reports(self):
+        """When one format fails, the reports that were written are indexed and the run is in history."""
+        history = ScanHistory(":memory:")
+        reporter = SOCReporter(output_dir=str(self.output_dir), formats="csv,ndjson", history=history)
+        with mock.patch.object(CSVWriter, "_write_record", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                reporter.generate_reports(self.assessments)
+        files = RunIndex(self.output_dir).ordered()[0]["files"]
+        self.assertIn(f"sentinel_{reporter.timestamp}.ndjson", files)
+        self.assertIn(f"baseline_{reporter.timestamp}.json", files)
+        self.assertFalse(any(name.endswith(".csv") for name in files))
+        self.assertEqual([run["run_id"] for run in history.runs()], [f"sentinel_{reporter.timestamp}"])
+        history.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
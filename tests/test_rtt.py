@@ -0,0 +1,134 @@
+﻿"""
+Tests for RTT-based adaptive probe timeouts.
+"""
+
+import asyncio
+import socket
+import time
+import unittest
+from unittest import mock
+
+from src.async_scanner import AsyncScanner
+from src.rate_limiter import ProbePacer
+from src.rtt import RTTEstimator
+from src.scanner import DefenderSafeScanner
+
+
+def _closed_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class TestRTTEstimator(unittest.TestCase):
+    """Test deadline derivation from per-subnet samples."""
+
+    def test_unmeasured_subnet_gets_ceiling(self):
+        """Without enough samples a subnet keeps the configured (WAN-safe) timeout."""
+        rtt = RTTEstimator(min_timeout=0.05, max_timeout=1.5, min_samples=3)
+        rtt.observe("10.0.0.1", 0.001)
+        rtt.observe("10.0.0.2", 0.001)
+        self.assertEqual(rtt.deadline("10.0.0.3"), 1.5)
+        self.assertEqual(rtt.deadline("10.0.1.3"), 1.5)
+
+    def test_deadline_tracks_subnet_percentile(self):
+        """Deadlines follow each /24's measured RTTs, clamped to the configured range."""
+        rtt = RTTEstimator(min_timeout=0.05, max_timeout=1.5, multiplier=2.0, margin=0.02)
+        for i in range(10):
+            rtt.observe(f"10.0.0.{i}", 0.0005)
+            rtt.observe(f"10.0.9.{i}", 0.2)
+            rtt.observe(f"10.0.7.{i}", 2.0)
+        self.assertEqual(rtt.deadline("10.0.0.99"), 0.05)
+        self.assertAlmostEqual(rtt.deadline("10.0.9.99"), 0.42)
+        self.assertEqual(rtt.deadline("10.0.7.99"), 1.5)
+
+        for i in range(16):  # The window slides: the subnet got slower
+            rtt.observe("10.0.0.1", 0.1)
+        self.assertAlmostEqual(rtt.deadline("10.0.0.99"), 0.22)
+
+    def test_one_retransmit_with_backoff(self):
+        """A timeout earns one retransmission with a doubled, clamped deadline."""
+        rtt = RTTEstimator(min_timeout=0.05, max_timeout=0.3)
+        self.assertEqual(rtt.on_timeout("10.0.0.1", 1, 0.2), 0.3)
+        self.assertIsNone(rtt.on_timeout("10.0.0.1", 2, 0.3))
+        stats = rtt.get_stats()
+        self.assertEqual((stats['timeouts'], stats['retransmits']), (2, 1))
+
+
+class TestAdaptiveScanning(unittest.TestCase):
+    """Test the scanners against local ports with adaptive timeouts."""
+
+    def setUp(self):
+        # A listener whose backlog is full silently drops SYNs, like a filtered port
+        self.blackhole = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.blackhole.bind(("127.0.0.1", 0))
+        self.blackhole.listen(0)
+        self.filtered_port = self.blackhole.getsockname()[1]
+        self.backlog = []
+        for _ in range(3):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.settimeout(0.1)
+            sock.connect_ex(("127.0.0.1", self.filtered_port))
+            self.backlog.append(sock)
+
+    def tearDown(self):
+        for sock in self.backlog:
+            sock.close()
+        self.blackhole.close()
+
+    def test_async_filtered_port_costs_adaptive_deadline(self):
+        """Once RSTs have been measured, a silent port costs two short attempts, not the full timeout."""
+        rtt = RTTEstimator(min_timeout=0.05, max_timeout=1.5)
+        scanner = AsyncScanner(timeout=1.5, max_concurrency=4, pacer=ProbePacer(), rtt=rtt)
+
+        async def sweep():
+            for _ in range(3):
+                await scanner.probe("127.0.0.1", _closed_port())
+            started = time.monotonic()
+            _, is_open = await scanner.probe("127.0.0.1", self.filtered_port)
+            return is_open, time.monotonic() - started
+
+        is_open, elapsed = asyncio.run(sweep())
+        self.assertFalse(is_open)
+        self.assertLess(elapsed, 0.5)
+        stats = scanner.get_stats()
+        self.assertEqual(stats['samples'], 3)
+        self.assertEqual(stats['retransmits'], 1)
+        self.assertEqual(stats['ports_checked'], 4)
+
+    def test_threaded_scanner_uses_same_estimator(self):
+        """DefenderSafeScanner samples refused connects and retransmits once on timeout."""
+        rtt = RTTEstimator(min_timeout=0.05, max_timeout=1.5)
+        scanner = DefenderSafeScanner(timeout=1.5, pacer=ProbePacer(), rtt=rtt)
+        for _ in range(3):
+            scanner.safe_tcp_connect("127.0.0.1", _closed_port())
+        started = time.monotonic()
+        self.assertEqual(scanner.safe_tcp_connect("127.0.0.1", self.filtered_port), (self.filtered_port, False))
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(rtt.get_stats()['retransmits'], 1)
+
+    def test_threaded_retransmit_closes_socket_on_error(self):
+        """An unexpected error during an attempt does not leak that attempt's socket."""
+        class FailingEstimator(RTTEstimator):
+            def on_timeout(self, ip, attempt, deadline):
+                raise RuntimeError("estimator broke")
+
+        rtt = FailingEstimator(min_timeout=0.05, max_timeout=0.2)
+        scanner = DefenderSafeScanner(timeout=0.2, pacer=ProbePacer(), rtt=rtt)
+        created = []
+
+        def tracking(*args, **kwargs):
+            created.append(real_socket(*args, **kwargs))
+            return created[-1]
+
+        real_socket = socket.socket
+        with mock.patch("src.scanner.socket.socket", side_effect=tracking):
+            self.assertEqual(scanner.safe_tcp_connect("127.0.0.1", self.filtered_port), (self.filtered_port, False))
+        self.assertEqual(len(created), 1)
+        self.assertEqual(created[0].fileno(), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+﻿"""
+Tests for risk-weighted, port-major probe scheduling.
+"""
+
+import json
+import socket
+import tempfile
+import unittest
+
+from src.async_scanner import AsyncScanner
+from src.checkpoint import ScanCheckpoint
+from src.discovery import HostDiscovery
+from src.finding_store import FindingStore
+from src.pipeline import SweepPipeline
+from src.rate_limiter import ProbePacer
+from src.risk_engine import SOCRiskEngine
+from src.scheduler import port_weight, probe_passes
+
+
+class CountingScanner(AsyncScanner):
+    """AsyncScanner that records every (host, port) it probes."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.probed = []
+
+    async def probe(self, host, port):
+        self.probed.append((host, port))
+        return await super().probe(host, port)
+
+
+class Interrupted(Exception):
+    pass
+
+
+class TestProbePasses(unittest.TestCase):
+    """Test grouping ports into passes by risk weight."""
+
+    def test_highest_risk_first(self):
+        """SMB and RDP come first, unmapped ports last, configured order kept within a pass."""
+        self.assertEqual(probe_passes([22, 80, 443, 3389, 8080, 445, 9999]),
+                         [[3389, 445], [22], [80, 443, 8080], [9999]])
+        self.assertEqual(port_weight(445), 10)
+        self.assertEqual(port_weight(9999), 0)
+
+    def test_custom_weights(self):
+        """The risk engine's weights decide the order."""
+        weights = {'LOW': 1, 'MEDIUM': 20, 'HIGH': 6, 'CRITICAL': 10}
+        self.assertEqual(probe_passes([22, 80, 445], weights), [[80], [445], [22]])
+
+
+class TestPortMajorSweep(unittest.TestCase):
+    """Test that the pipeline sweeps pass by pass and resumes mid-pass."""
+
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(64)
+        self.open_port = self.listener.getsockname()[1]
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(("127.0.0.1", 0))
+        self.closed_port = closed.getsockname()[1]
+        closed.close()
+        self.passes = [[self.open_port], [self.closed_port]]
+
+    def tearDown(self):
+        self.listener.close()
+
+    def test_every_host_gets_a_pass_before_the_next(self):
+        """All hosts are probed on the first pass's ports before any host sees the second pass."""
+        scanner = CountingScanner(timeout=0.5, max_concurrency=4, pacer=ProbePacer())
+        hosts = [f"127.0.0.{i}" for i in range(1, 6)]
+        pipeline = SweepPipeline(scanner, SOCRiskEngine(), probe_workers=1, passes=self.passes)
+        findings = pipeline.run(hosts, [self.closed_port, self.open_port])
+        self.assertEqual([port for _, port in scanner.probed], [self.open_port] * 5 + [self.closed_port] * 5)
+        self.assertEqual([f['ip'] for f in findings], ["127.0.0.1"])  # The listener is bound to .1 only
+        self.assertEqual(pipeline.get_stats()['hosts_scanned'], 5)
+
+    def test_resume_inside_a_later_pass(self):
+        """A checkpoint counts positions through the passes and keeps them for the resumed run."""
+        directory = tempfile.mkdtemp()
+        checkpoint = ScanCheckpoint.create(directory, "sentinel_20260101_020000", "127.0.0.1-127.0.0.30",
+                                           [self.closed_port, self.open_port], passes=self.passes)
+
+        def sweep(checkpoint, stop_after=None):
+            scanner = CountingScanner(timeout=0.5, max_concurrency=4, pacer=ProbePacer())
+
+            def on_probe(host, port, is_open):
+                if stop_after is not None and len(scanner.probed) >= stop_after:
+                    raise Interrupted()
+
+            pipeline = SweepPipeline(scanner, SOCRiskEngine(), store=FindingStore(), checkpoint=checkpoint,
+                                     on_probe=on_probe)
+            try:
+                pipeline.run(checkpoint.targets(scanner), checkpoint.ports)
+            except Interrupted:
+                pass
+            checkpoint.close()
+            return scanner.probed
+
+        first = sweep(checkpoint, stop_after=45)
+        state = json.loads((checkpoint.path / "state.json").read_text())
+        self.assertEqual(state["passes"], self.passes)
+        self.assertGreaterEqual(state["next_host"], 30)
+        self.assertLess(state["next_host"], 60)
+
+        second = sweep(ScanCheckpoint.load(directory, "sentinel_20260101_020000"))
+        self.assertTrue(all(port == self.closed_port for _, port in second))
+        everything = {(f"127.0.0.{i}", port) for i in range(1, 31) for port in (self.open_port, self.closed_port)}
+        self.assertEqual(set(first) | set(second), everything)
+        self.assertLessEqual(len(set(first) & set(second)), 4)
+
+    def test_discovery_pings_each_host_once(self):
+        """Later passes reuse the discovery verdict of the first."""
+        scanner = AsyncScanner(timeout=0.5, max_concurrency=8, pacer=ProbePacer())
+        discovery = HostDiscovery(scanner, [self.closed_port])
+        pipeline = SweepPipeline(scanner, SOCRiskEngine(), discovery=discovery, passes=self.passes)
+        findings = pipeline.run([f"127.0.0.{i}" for i in range(1, 4)], [self.open_port, self.closed_port])
+        self.assertEqual([f['ip'] for f in findings], ["127.0.0.1"])
+        stats = pipeline.get_stats()
+        self.assertEqual((stats['hosts_pinged'], stats['hosts_alive']), (3, 3))
+        self.assertEqual(stats['probes_skipped'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+﻿"""
+Tests for multi-process sharded sweeps.
+"""
+
+import socket
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.async_scanner import AsyncScanner
+from src.checkpoint import open_checkpoint
+from src.rate_limiter import ProbePacer
+from src.sharding import ShardedSweep, scanner_options, shard_count
+
+
+class TestShardedSweep(unittest.TestCase):
+    """Test sweeping in worker processes and merging their findings."""
+
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(64)
+        self.open_port = self.listener.getsockname()[1]
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(("127.0.0.1", 0))
+        self.closed_port = closed.getsockname()[1]
+        closed.close()
+        scanner = AsyncScanner(timeout=0.5, max_concurrency=32, pacer=ProbePacer())
+        self.options = scanner_options(scanner, triage_concurrency=4)
+
+    def tearDown(self):
+        self.listener.close()
+
+    def test_shards_merge_into_one_store(self):
+        """Every shard's findings and probe counts come back to the parent."""
+        progress = []
+        sweep = ShardedSweep(2, "127.0.0.0/25", [self.open_port, self.closed_port], seed=3, **self.options)
+        store = sweep.run(on_progress=progress.append)
+        self.assertEqual([(a['ip'], a['open_ports']) for a in store], [("127.0.0.1", [self.open_port])])
+        stats = sweep.get_stats()
+        self.assertEqual(stats['shards'], 2)
+        self.assertEqual(stats['ports_checked'], 126 * 2)
+        self.assertEqual(sum(progress), 126 * 2)
+        self.assertEqual(sweep.triage_stats['services_triaged'], 1)
+
+    def test_resumed_shards_restore_instead_of_probing(self):
+        """Each shard checkpoints separately; resuming restores findings and keeps the shard layout."""
+        directory = tempfile.mkdtemp()
+        ports = [self.open_port, self.closed_port]
+        checkpoint = open_checkpoint(directory, None, "20260101_020000", "127.0.0.0/28", ports)
+        ShardedSweep(2, checkpoint=checkpoint, **self.options).run()
+        checkpoint.close()
+        self.assertEqual(sorted(p.name for p in checkpoint.path.glob("shard-*")), ["shard-0", "shard-1"])
+
+        resumed = open_checkpoint(directory, "sentinel_20260101_020000", "20260102_020000", "ignored", ports)
+        self.assertEqual(shard_count(8, resumed), 2)
+        new, restored = [], []
+        sweep = ShardedSweep(shard_count(8, resumed), checkpoint=resumed, **self.options)
+        store = sweep.run(on_finding=new.append, on_restored=restored.append)
+        self.assertEqual(new, [])
+        self.assertEqual([a['ip'] for a in restored], ["127.0.0.1"])
+        self.assertEqual(len(store), 1)
+        self.assertEqual(sweep.get_stats()['ports_checked'], 0)
+
+        resumed.finish()
+        self.assertFalse(Path(directory, "sentinel_20260101_020000").exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+﻿"""
+Tests for the SIEM forwarder, against the local mock SIEM.
+"""
+
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import requests
+
+from src.risk_engine import SOCRiskEngine
+from src.siem_forwarder import (ElasticTarget, LogAnalyticsTarget, SIEMForwarder, SplunkHECTarget,
+                                create_forwarder)
+from src.siem_mock import MockSIEM
+
+
+class BrokenSession(requests.Session):
+    """Session whose responses break off mid-body."""
+
+    def post(self, *args, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError("connection broken")
+
+
+class TestSIEMForwarder(unittest.TestCase):
+    """Test batching, wire formats, retries and the disk spool."""
+
+    def setUp(self):
+        self.engine = SOCRiskEngine()
+        self.mock = MockSIEM().start()
+        self.spool = tempfile.mkdtemp()
+        self.findings = [self.engine.assess_exposure(f"10.0.0.{i}", [3389]) for i in range(1, 26)]
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def forwarder(self, target, **options):
+        options = dict(dict(batch_size=10, flush_interval=0.2, backoff=0.01, max_backoff=0.05,
+                            spool_dir=self.spool), **options)
+        return SIEMForwarder(target, **options)
+
+    def test_elastic_bulk_batches_over_one_connection(self):
+        """Findings arrive as _bulk documents in gzip batches over a kept-alive connection."""
+        with self.forwarder(ElasticTarget(self.mock.url, "test-key")) as forwarder:
+            for finding in self.findings:
+                forwarder.write(finding)
+        stats = forwarder.get_stats()
+        self.assertEqual(stats['events_sent'], 25)
+        self.assertEqual(stats['batches_sent'], 3)
+        self.assertLess(stats['bytes_sent'], stats['bytes_raw'])
+        self.assertEqual(len(self.mock.connections), 1)
+        self.assertTrue(all(r['encoding'] == 'gzip' for r in self.mock.requests))
+        doc = self.mock.events['elastic'][0]
+        self.assertEqual((doc['ip'], doc['risk_level'], doc['open_ports']), ("10.0.0.1", "HIGH", [3389]))
+        self.assertEqual(doc['@timestamp'], doc['timestamp'])
+
+    def test_flush_interval_bounds_latency(self):
+        """A partial batch is sent once flush_interval passes, without closing."""
+        forwarder = self.forwarder(SplunkHECTarget(self.mock.url, "test-key"), batch_size=100)
+        forwarder.write(self.findings[0])
+        forwarder.flush()
+        self.assertEqual(len(self.mock.events['splunk']), 1)
+        event = self.mock.events['splunk'][0]
+        self.assertEqual(event['sourcetype'], "sentinel_sweep")
+        self.assertEqual(event['event']['ip'], "10.0.0.1")
+        forwarder.close()
+
+    def test_log_analytics_requests_are_signed(self):
+        """Data Collector requests carry a valid SharedKey signature and flat columns."""
+        target = LogAnalyticsTarget(self.mock.url, self.mock.shared_key, workspace_id="test-workspace")
+        with self.forwarder(target) as forwarder:
+            for finding in self.findings[:3]:
+                forwarder.write(finding)
+        self.assertEqual(len(self.mock.events['log_analytics']), 3)
+        record = self.mock.events['log_analytics'][0]
+        self.assertEqual(record['_log_type'], "SentinelSweep")
+        self.assertEqual(record['open_ports'], "3389")
+        self.assertIsNone(self.mock.requests[0]['encoding'])
+
+    def test_transient_failures_are_retried(self):
+        """503s and per-document 429s are retried until every event is delivered."""
+        self.mock.fail_next(2, status=503)
+        self.mock.throttle_next(4)
+        with self.forwarder(ElasticTarget(self.mock.url, "test-key")) as forwarder:
+            for finding in self.findings[:10]:
+                forwarder.write(finding)
+        self.assertEqual(len(self.mock.events['elastic']), 10)
+        self.assertEqual(sorted(d['ip'] for d in self.mock.events['elastic']),
+                         sorted(f['ip'] for f in self.findings[:10]))
+        self.assertGreaterEqual(forwarder.get_stats()['retries'], 3)
+
+    def test_outage_spools_and_replays(self):
+        """Batches that exhaust their retries are spooled and replayed by the next forwarder."""
+        self.mock.fail_next(100, status=503)
+        with self.forwarder(SplunkHECTarget(self.mock.url, "test-key"), max_retries=1) as forwarder:
+            for finding in self.findings[:10]:
+                forwarder.write(finding)
+        self.assertEqual(forwarder.get_stats()['events_spooled'], 10)
+        self.assertEqual(len(list(Path(self.spool, "splunk").glob("*.json.gz"))), 1)
+
+        self.mock.recover()
+        with self.forwarder(SplunkHECTarget(self.mock.url, "test-key")) as forwarder:
+            forwarder.write(self.findings[10])
+        self.assertEqual(forwarder.get_stats()['events_replayed'], 10)
+        self.assertEqual(len(self.mock.events['splunk']), 11)
+        self.assertEqual(forwarder.get_stats()['spool_files'], 0)
+
+    def test_bad_credentials_are_spooled_not_dropped(self):
+        """A 401 keeps the data on disk until the key is fixed."""
+        with self.forwarder(ElasticTarget(self.mock.url, "wrong-key"), max_retries=0) as forwarder:
+            forwarder.write(self.findings[0])
+        self.assertEqual(forwarder.get_stats()['events_spooled'], 1)
+
+    def test_unexpected_errors_spool_and_keep_the_sender_alive(self):
+        """Broken responses and unreadable 200s are spooled; the sender thread keeps running."""
+        forwarder = self.forwarder(ElasticTarget(self.mock.url, "test-key"), max_retries=0,
+                                   session=BrokenSession(), queue_size=2)
+        for finding in self.findings[:10]:
+            forwarder.write(finding)  # Would block forever once the sender thread died
+        forwarder.flush()
+        self.assertTrue(forwarder._thread.is_alive())
+        self.assertEqual(forwarder.close()['events_spooled'], 10)
+
+        target = ElasticTarget(self.mock.url, "test-key")
+        target.retry_indices = lambda response, count: json.loads("<html>proxy error</html>")  # A non-JSON 200
+        with self.forwarder(target, max_retries=0) as forwarder:
+            forwarder.write(self.findings[10])
+        self.assertEqual(forwarder.get_stats()['events_spooled'], 1)
+
+    def test_write_never_blocks_on_a_down_endpoint(self):
+        """With the sender stuck in retries, findings past queue_size are spooled instead of blocking write()."""
+        self.mock.fail_next(1000, status=503)
+        forwarder = self.forwarder(SplunkHECTarget(self.mock.url, "test-key"), max_retries=20, queue_size=2)
+        started = time.monotonic()
+        for finding in self.findings:
+            forwarder.write(finding)
+        self.assertLess(time.monotonic() - started, 0.5)
+        stats = forwarder.close()
+        self.assertGreater(stats['events_overflowed'], 0)
+        self.assertEqual(stats['events_spooled'], len(self.findings))  # Nothing lost
+
+    def test_create_forwarder_validates_config(self):
+        """SIEM_TYPE values map to targets; unknown types and missing keys fail early."""
+        with self.assertRaises(ValueError):
+            create_forwarder("qradar", self.mock.url, "test-key")
+        with self.assertRaises(ValueError):
+            create_forwarder("splunk", self.mock.url, "")
+        forwarder = create_forwarder("azure_sentinel", "https://abc123.ods.opinsights.azure.com",
+                                     self.mock.shared_key, spool_dir=self.spool)
+        self.assertEqual(forwarder.target.workspace_id, "abc123")
+        forwarder.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+﻿"""
+Tests for the durable spool queue.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.risk_engine import SOCRiskEngine
+from src.siem_forwarder import SIEMForwarder, SplunkHECTarget
+from src.siem_mock import MockSIEM
+from src.spool_queue import SpoolQueue
+
+
+class TestSpoolQueue(unittest.TestCase):
+    """Test segments, offsets, recovery and delivery through the queue."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def segments(self):
+        return sorted(p.name for p in Path(self.directory).glob("*.seg"))
+
+    def test_consumer_resumes_from_committed_offset(self):
+        """A reopened queue hands a consumer the records after its last commit."""
+        with SpoolQueue(self.directory) as spool:
+            spool.extend({"n": i} for i in range(10))
+            consumer = spool.consumer("siem")
+            batch = consumer.poll(4)
+            self.assertEqual([offset for offset, _ in batch], [0, 1, 2, 3])
+            consumer.commit()
+            consumer.poll(3)  # Read but not committed
+
+        with SpoolQueue(self.directory) as spool:
+            records = spool.consumer("siem").poll(100)
+            self.assertEqual([r["n"] for _, r in records], list(range(4, 10)))
+            self.assertEqual(spool.get_stats()['lag'], {"siem": 6})
+
+    def test_segments_roll_and_are_collected(self):
+        """Segments passed by every consumer are deleted; the slowest consumer holds the rest."""
+        with SpoolQueue(self.directory, segment_bytes=200) as spool:
+            fast, slow = spool.consumer("fast"), spool.consumer("slow")
+            spool.extend({"n": i, "pad": "x" * 40} for i in range(20))
+            self.assertGreater(len(self.segments()), 4)
+            before = len(self.segments())
+
+            fast.poll(100)
+            fast.commit()
+            self.assertEqual(len(self.segments()), before)
+            slow.poll(15)
+            slow.commit()
+            self.assertLess(len(self.segments()), before)
+            self.assertEqual([r["n"] for _, r in slow.poll(100)], list(range(15, 20)))
+
+    def test_torn_tail_is_truncated(self):
+        """A partially written record from a crash is cut off on open; appends continue after it."""
+        with SpoolQueue(self.directory) as spool:
+            spool.extend({"n": i} for i in range(3))
+        segment = Path(self.directory) / self.segments()[-1]
+        with open(segment, "ab") as f:
+            f.write(b"\x40\x00\x00\x00\x00\x00\x00\x00{\"n\": 3")
+
+        with SpoolQueue(self.directory) as spool:
+            self.assertGreater(spool.get_stats()['truncated_bytes'], 0)
+            self.assertEqual(spool.end_offset, 3)
+            spool.append({"n": 3})
+            self.assertEqual([r["n"] for _, r in spool.consumer("siem").poll(10)], [0, 1, 2, 3])
+
+    def test_offsets_survive_lost_tail(self):
+        """If committed offsets outran what was on disk, numbering continues after them."""
+        with SpoolQueue(self.directory) as spool:
+            spool.extend({"n": i} for i in range(5))
+            consumer = spool.consumer("siem")
+            consumer.poll(5)
+            consumer.commit()
+        for name in self.segments():
+            (Path(self.directory) / name).write_bytes(b"")
+
+        with SpoolQueue(self.directory) as spool:
+            self.assertEqual(spool.append({"n": "new"}), 5)
+            self.assertEqual([r["n"] for _, r in spool.consumer("siem").poll(10)], ["new"])
+
+    def test_forwarder_delivers_backlog_after_restart(self):
+        """Findings queued during an outage stay on disk and are delivered by the next run."""
+        engine = SOCRiskEngine()
+        findings = [engine.assess_exposure(f"10.0.0.{i}", [22]) for i in range(1, 21)]
+        options = dict(batch_size=8, flush_interval=0.05, backoff=0.01, max_backoff=0.05, max_retries=1,
+                       spool_dir=None, drain_timeout=0.5)
+        with MockSIEM() as mock:
+            mock.fail_next(1000, status=503)
+            spool = SpoolQueue(self.directory)
+            forwarder = SIEMForwarder(SplunkHECTarget(mock.url, "test-key"), spool_queue=spool, **options)
+            for finding in findings:
+                forwarder.write(finding)
+            stats = forwarder.close()
+            spool.close()
+            self.assertEqual(stats['events_sent'], 0)
+            self.assertEqual(stats['queue_backlog'], 20)
+
+            mock.recover()
+            spool = SpoolQueue(self.directory)
+            forwarder = SIEMForwarder(SplunkHECTarget(mock.url, "test-key"), spool_queue=spool, **options)
+            forwarder.flush()
+            stats = forwarder.close()
+            spool.close()
+        self.assertEqual(stats['events_sent'], 20)
+        self.assertEqual(stats['queue_backlog'], 0)
+        self.assertEqual(sorted(e['event']['ip'] for e in mock.events['splunk']),
+                         sorted(f['ip'] for f in findings))
+
+
+if __name__ == '__main__':
+    unittest.main()
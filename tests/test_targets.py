@@ -0,0 +1,88 @@
+﻿"""
+Tests for lazy target expansion.
+"""
+
+import ipaddress
+import unittest
+
+from src.scanner import DefenderSafeScanner
+from src.targets import TargetSpace, int_to_ip, ip_to_int
+
+
+class TestTargetSpace(unittest.TestCase):
+    """Test CIDR/range/exclusion handling without materialisation."""
+
+    def test_matches_ipaddress_hosts(self):
+        """A single CIDR yields exactly ip_network().hosts()."""
+        for cidr in ("192.168.1.0/30", "10.0.0.0/29", "10.0.0.4/31", "10.0.0.9/32"):
+            expected = [int(ip) for ip in ipaddress.ip_network(cidr).hosts()]
+            self.assertEqual(list(TargetSpace(cidr)), expected, cidr)
+
+    def test_len_is_lazy_for_huge_ranges(self):
+        """len() of a /8 does not build anything."""
+        space = TargetSpace("10.0.0.0/8")
+        self.assertEqual(len(space), 2 ** 24 - 2)
+        self.assertEqual(int_to_ip(space[-1]), "10.255.255.254")
+
+    def test_multiple_specs_ranges_and_exclusions(self):
+        """Specs are merged and exclusions punched out."""
+        space = TargetSpace("10.0.0.1-10.0.0.10, 10.0.0.8-12, 10.0.1.5", exclude="10.0.0.3-4,10.0.0.0/30")
+        hosts = [int_to_ip(a) for a in space]
+        self.assertEqual(hosts[:3], ["10.0.0.5", "10.0.0.6", "10.0.0.7"])
+        self.assertEqual(hosts[-1], "10.0.1.5")
+        self.assertEqual(len(space), len(hosts))
+        self.assertIn("10.0.0.12", space)
+        self.assertNotIn("10.0.0.3", space)
+        self.assertEqual([space[i] for i in range(len(space))], list(space))
+
+    def test_permutation_covers_every_address_once(self):
+        """permuted() is a bijection and interleaves subnets."""
+        space = TargetSpace("10.0.0.0/22")
+        order = list(space.permuted(seed=7))
+        self.assertEqual(sorted(order), list(space))
+        first = [a >> 8 for a in order[:4]]
+        self.assertGreater(len(set(first)), 1)
+
+    def test_shards_partition_whole_subnets(self):
+        """Shards are disjoint, cover every address and never split a /24."""
+        space = TargetSpace("10.0.0.0/20", exclude="10.0.3.0/24")
+        shards = [space.shard(i, 3) for i in range(3)]
+        self.assertEqual(sorted(a for shard in shards for a in shard), list(space))
+        owners = {}
+        for i, shard in enumerate(shards):
+            for address in shard:
+                self.assertEqual(owners.setdefault(address >> 8, i), i)
+        self.assertLessEqual(max(map(len, shards)) - min(map(len, shards)), 256)
+
+        small = [TargetSpace("192.168.1.0/24").shard(i, 4) for i in range(4)]
+        self.assertTrue(all(len(shard) >= 60 for shard in small))
+
+    def test_invalid_and_mixed_specs(self):
+        """Bad specs raise ValueError."""
+        with self.assertRaises(ValueError):
+            TargetSpace("not-a-network")
+        with self.assertRaises(ValueError):
+            TargetSpace("10.0.0.0/30,::1")
+        self.assertEqual(ip_to_int("0.0.1.1"), 257)
+
+    def test_short_range_stays_in_its_subnet(self):
+        """A last-octet range above 255 is rejected rather than spilling into the next /24."""
+        with self.assertRaises(ValueError):
+            TargetSpace("10.0.0.250-300")
+        self.assertEqual(len(TargetSpace("10.0.0.250-255")), 6)
+
+
+class TestValidateCidr(unittest.TestCase):
+    """Test the scanner's validate_cidr view."""
+
+    def test_behaves_like_list_of_strings(self):
+        """Length, slicing and iteration match the old list."""
+        hosts = DefenderSafeScanner().validate_cidr("192.168.1.0/30")
+        self.assertEqual(len(hosts), 2)
+        self.assertEqual(hosts[:5], ["192.168.1.1", "192.168.1.2"])
+        self.assertEqual(sorted(hosts.permuted(seed=1)), ["192.168.1.1", "192.168.1.2"])
+        self.assertEqual(DefenderSafeScanner().validate_cidr("invalid"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()